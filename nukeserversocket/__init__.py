@@ -1,5 +1,19 @@
 from __future__ import annotations
 
-from .main import NukeServerSocket
+from typing import Any
+
 from .version import __version__
-from .controllers.nuke import install_nuke
+
+
+def __getattr__(name: str) -> Any:
+    # The UI modules are imported lazily so that the headless server (e.g. in
+    # `nuke -t` or `hython`) can import the package without loading any widgets.
+    if name == 'NukeServerSocket':
+        from .main import NukeServerSocket
+        return NukeServerSocket
+
+    if name == 'install_nuke':
+        from .controllers.nuke import install_nuke
+        return install_nuke
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
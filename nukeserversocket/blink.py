@@ -0,0 +1,112 @@
+"""BlinkScript kernels pushed by the clients.
+
+Recompiling a kernel is slow, so the cache remembers the hash of the source
+last compiled on each BlinkScript node and skips the recompile when the same
+source is pushed again. Nodes are looked up once and kept until they are
+deleted or renamed.
+
+Sending a `.blink` or `.cpp` file pushes one kernel. The `blink` Nuke command
+pushes several at once:
+
+    {"command": "blink", "args": {"kernels": [
+        {"file": "path/to/Blur.blink", "text": "kernel Blur ..."},
+        {"name": "Sharpen", "text": "kernel Sharpen ..."}
+    ]}}
+
+"""
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+from typing import Any, Dict, List, Optional
+from dataclasses import asdict, dataclass
+
+from .utils import cache
+
+
+@dataclass
+class CompileResult:
+    name: str
+    compiled: bool
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        if self.compiled:
+            return f'{self.name}: compiled in {self.seconds * 1000:.1f} ms'
+        return f'{self.name}: unchanged, recompile skipped'
+
+
+def kernel_name(file: str) -> str:
+    """Return the BlinkScript node name of a kernel file."""
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+class KernelCache:
+    def __init__(self):
+        self._digests: Dict[str, str] = {}
+        self._nodes: Dict[str, Any] = {}
+
+    def clear(self) -> None:
+        self._digests.clear()
+        self._nodes.clear()
+
+    def _node(self, name: str) -> Any:
+        node = self._nodes.get(name)
+        if node is not None:
+            try:
+                if node.name() == name:
+                    return node
+            except ValueError:
+                # the node was deleted
+                pass
+
+        import nuke
+
+        node = nuke.toNode(name) or nuke.createNode('BlinkScript', f'name {name}')
+        self._nodes[name] = node
+        # a different node: its compiled source is unknown
+        self._digests.pop(name, None)
+        return node
+
+    def push(self, name: str, source: str, file: str = '') -> CompileResult:
+        """Set the kernel source of the node and recompile it if it changed."""
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        knobs = self._node(name).knobs()
+
+        # the source could also have been edited in the node since
+        if self._digests.get(name) == digest and knobs['kernelSource'].getText() == source:
+            return CompileResult(name, compiled=False)
+
+        if file:
+            knobs['kernelSourceFile'].setValue(file)
+        knobs['kernelSource'].setText(source)
+
+        start = time.perf_counter()
+        knobs['recompile'].execute()
+        seconds = time.perf_counter() - start
+
+        self._digests[name] = digest
+        return CompileResult(name, compiled=True, seconds=seconds)
+
+
+@cache('blink')
+def get_kernel_cache() -> KernelCache:
+    return KernelCache()
+
+
+def push_kernel(name: str, source: str, file: str = '') -> CompileResult:
+    return get_kernel_cache().push(name, source, file)
+
+
+def push_kernels(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Handler of the `blink` command: push several kernels in one request."""
+    results: List[CompileResult] = []
+    for kernel in args['kernels']:
+        file: Optional[str] = kernel.get('file')
+        name = kernel.get('name') or kernel_name(file or '')
+        if not name:
+            raise ValueError('Each kernel needs a name or a file.')
+        results.append(push_kernel(str(name), str(kernel['text']), file or ''))
+
+    return {'kernels': [asdict(result) for result in results]}
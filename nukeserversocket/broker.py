@@ -0,0 +1,469 @@
+"""Broker dispatching requests across several NukeServerSocket servers.
+
+The broker is a standalone asyncio process: clients connect to it as if it
+were a server (framed or legacy requests) and it forwards each request to one
+of its backends, the servers of the running Nuke/Houdini sessions:
+
+    python -m nukeserversocket.broker --port 54400 \\
+        --backend 127.0.0.1:54321 --backend 127.0.0.1:54322
+
+Requests go to the healthy backend with the fewest outstanding requests.
+Requests of the same client stick to the backend that served it first, so
+that a script can rely on the state left by its previous requests. The client
+is the `session` request key, or the client address when it is missing.
+
+Backends are health-checked with the `ping` command and can be added and
+removed at runtime with the broker commands:
+
+    {"command": "broker.register", "args": {"host": "127.0.0.1", "port": 54323}}
+    {"command": "broker.unregister", "args": {"host": "127.0.0.1", "port": 54323}}
+    {"command": "broker.backends"}
+
+and the same request can be sent to every backend at once:
+
+    {"command": "broker.broadcast", "args": {"request": {"text": "..."}, "timeout": 10}}
+
+Like the client, the broker does not import Qt.
+
+"""
+from __future__ import annotations
+
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from typing import Any, Set, Dict, List, Tuple, Iterable, Optional
+from collections import OrderedDict
+from dataclasses import field, dataclass
+
+from .client import AsyncNssClient, parse_address, gather_responses
+from .logger import get_logger, log_to_stderr
+from .version import __version__
+from .protocol import (FLAG_ACCEPT_COMPRESSED, Response, FrameDecoder,
+                       FrameTooLarge, ProtocolError, is_framed, encode_frame)
+
+LOGGER = get_logger()
+
+DEFAULT_PORT = 54400
+
+RECV_SIZE = 64 * 1024
+
+# Sticky assignments are forgotten, least recently used first, above this number.
+MAX_STICKY_CLIENTS = 4096
+
+
+@dataclass(eq=False)
+class Backend:
+    """A server the broker forwards requests to."""
+    host: str
+    port: int
+    healthy: bool = True
+    outstanding: int = 0
+    served: int = 0
+    failures: int = 0
+    client: AsyncNssClient = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.client = AsyncNssClient(self.host, self.port)
+
+    @property
+    def address(self) -> str:
+        return f'{self.host}:{self.port}'
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'address': self.address,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'served': self.served,
+            'failures': self.failures,
+        }
+
+
+class Broker:
+    """Load balance requests across backends.
+
+    Args:
+        backends: `host:port` addresses of the initial backends.
+        sticky: Send the requests of a client to the same backend.
+        health_interval: Seconds between health checks.
+        health_timeout: Seconds to wait for a `ping` reply.
+        max_payload_size: Maximum request size in bytes, 0 disables the limit.
+
+    """
+
+    def __init__(
+        self,
+        backends: Iterable[str] = (),
+        *,
+        sticky: bool = True,
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+        max_payload_size: int = 50 * 1024 * 1024
+    ):
+        self.sticky = sticky
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_payload_size = max_payload_size
+
+        self.backends: List[Backend] = []
+        for address in backends:
+            self.add_backend(*parse_address(address))
+
+        self._sticky: OrderedDict[str, Backend] = OrderedDict()
+        # client request id -> backend and id of the forwarded request
+        self._running: Dict[str, Tuple[Backend, str]] = {}
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._health_task: Optional[asyncio.Future[None]] = None
+
+    def add_backend(self, host: str, port: int) -> Backend:
+        for backend in self.backends:
+            if (backend.host, backend.port) == (host, port):
+                return backend
+
+        backend = Backend(host, port)
+        self.backends.append(backend)
+        LOGGER.info('Registered backend %s.', backend.address)
+        return backend
+
+    async def remove_backend(self, host: str, port: int) -> bool:
+        for backend in self.backends:
+            if (backend.host, backend.port) == (host, port):
+                break
+        else:
+            return False
+
+        self.backends.remove(backend)
+        for client in [c for c, b in self._sticky.items() if b is backend]:
+            del self._sticky[client]
+
+        await backend.client.close()
+        LOGGER.info('Unregistered backend %s.', backend.address)
+        return True
+
+    def choose(self, client: str) -> Optional[Backend]:
+        """Return the backend for the next request of the client."""
+        backend = self._sticky.get(client)
+        if backend and backend.healthy:
+            self._sticky.move_to_end(client)
+            return backend
+
+        healthy = [b for b in self.backends if b.healthy]
+        if not healthy:
+            return None
+
+        backend = min(healthy, key=lambda b: (b.outstanding, b.served))
+
+        if self.sticky:
+            self._sticky[client] = backend
+            self._sticky.move_to_end(client)
+            if len(self._sticky) > MAX_STICKY_CLIENTS:
+                self._sticky.popitem(last=False)
+
+        return backend
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self._check(backend) for backend in list(self.backends)))
+
+    async def _check(self, backend: Backend) -> None:
+        # a backend runs one script at a time and answers the ping only after
+        # it: a busy backend is not checked, failed requests mark it unhealthy.
+        if backend.outstanding:
+            return
+
+        try:
+            response = await asyncio.wait_for(
+                backend.client.command('ping'), self.health_timeout
+            )
+            healthy = response.ok
+        except (OSError, ProtocolError, asyncio.TimeoutError):
+            healthy = False
+
+        if healthy != backend.healthy:
+            LOGGER.warning('Backend %s is %s.', backend.address,
+                           'healthy' if healthy else 'unhealthy')
+        if not healthy:
+            await backend.client.close()
+
+        backend.healthy = healthy
+
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def forward(self, request: Dict[str, Any], client: str) -> Response:
+        """Forward the request to a backend and return its response."""
+        request_id = str(request.get('id') or uuid.uuid4().hex)
+        command = request.get('command', '')
+        args = request.get('args') or {}
+
+        if command == 'cancel':
+            return Response(request_id, json.dumps(await self._cancel(str(args.get('id', '')))))
+
+        if command == 'ping' or command.startswith('broker.'):
+            return Response(request_id, json.dumps(await self._run_command(command, args)))
+
+        backend = self.choose(str(request.get('session') or client))
+        if not backend:
+            return Response(request_id, error='NoBackendAvailable: No healthy backend.')
+
+        # ids are rewritten so that requests of different clients cannot clash
+        backend_id = uuid.uuid4().hex
+        self._running[request_id] = (backend, backend_id)
+        backend.outstanding += 1
+        start = time.perf_counter()
+
+        try:
+            response = await backend.client.send(dict(request, id=backend_id))
+        except (OSError, ProtocolError) as e:
+            LOGGER.warning('Backend %s failed: %s', backend.address, e)
+            backend.failures += 1
+            backend.healthy = False
+            return Response(request_id, error=f'BackendUnavailable: {backend.address}: {e}')
+        finally:
+            backend.outstanding -= 1
+            self._running.pop(request_id, None)
+
+        backend.served += 1
+        response.id = request_id
+        response.elapsed = time.perf_counter() - start
+        return response
+
+    async def _cancel(self, request_id: str) -> Dict[str, Any]:
+        target = self._running.get(request_id)
+        if not target:
+            return {'id': request_id, 'cancelled': False}
+
+        backend, backend_id = target
+        try:
+            response = await backend.client.command('cancel', id=backend_id)
+            cancelled = bool(response.json().get('cancelled'))
+        except (OSError, ProtocolError, ValueError):
+            cancelled = False
+
+        return {'id': request_id, 'cancelled': cancelled}
+
+    async def _run_command(self, command: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if command == 'ping':
+                healthy = sum(b.healthy for b in self.backends)
+                return {'version': __version__, 'broker': True, 'healthy_backends': healthy}
+
+            if command == 'broker.backends':
+                return {'backends': [b.status() for b in self.backends]}
+
+            if command == 'broker.register':
+                backend = self.add_backend(str(args.get('host') or '127.0.0.1'), int(args['port']))
+                return {'registered': backend.address}
+
+            if command == 'broker.broadcast':
+                return await self._broadcast(args['request'], args.get('timeout'))
+
+            if command == 'broker.unregister':
+                host, port = str(args.get('host') or '127.0.0.1'), int(args['port'])
+                return {'unregistered': await self.remove_backend(host, port)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+        return {'error': f'Unknown command: {command}'}
+
+    async def _broadcast(self, request: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        if not isinstance(request, dict):
+            raise TypeError('request must be a json object.')
+
+        backends = list(self.backends)
+        for backend in backends:
+            backend.outstanding += 1
+        try:
+            result = await gather_responses(
+                {b.address: b.client for b in backends}, request, float(timeout or 0) or None
+            )
+        finally:
+            for backend in backends:
+                backend.outstanding -= 1
+
+        return result.to_dict()
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        peer = writer.get_extra_info('peername')
+        client = str(peer[0]) if peer else 'local'
+
+        try:
+            data = await reader.read(RECV_SIZE)
+            framed = is_framed(data)
+            while data and framed is None:
+                chunk = await reader.read(RECV_SIZE)
+                if not chunk:
+                    return
+                data += chunk
+                framed = is_framed(data)
+
+            if framed:
+                await self._serve_framed(reader, writer, client, data)
+            elif data:
+                await self._serve_legacy(reader, writer, client, data)
+        except OSError as e:
+            LOGGER.debug('Client %s error: %s', client, e)
+        finally:
+            writer.close()
+
+    async def _serve_framed(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        client: str,
+        data: bytes
+    ) -> None:
+        decoder = FrameDecoder(self.max_payload_size)
+        tasks: Set[asyncio.Future[None]] = set()
+
+        try:
+            while data:
+                try:
+                    frames = decoder.feed(data)
+                except ProtocolError as e:
+                    name = 'PayloadTooLarge' if isinstance(e, FrameTooLarge) else 'ProtocolError'
+                    writer.write(encode_frame(Response('', error=f'{name}: {e}').to_bytes()))
+                    await writer.drain()
+                    return
+
+                # pipelined requests are forwarded concurrently
+                for flags, body in frames:
+                    task = asyncio.ensure_future(self._reply_frame(writer, client, flags, body))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                data = await reader.read(RECV_SIZE)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _reply_frame(
+        self, writer: asyncio.StreamWriter, client: str, flags: int, body: bytes
+    ) -> None:
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a json object.')
+        except ValueError as e:
+            response = Response('', error=f'ProtocolError: {e}')
+        else:
+            response = await self.forward(request, client)
+
+        writer.write(encode_frame(
+            response.to_bytes(), compress=bool(flags & FLAG_ACCEPT_COMPRESSED)
+        ))
+        await writer.drain()
+
+    async def _serve_legacy(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        client: str,
+        data: bytes
+    ) -> None:
+        # legacy requests have no length: read until the json is complete
+        request: Any = None
+        while True:
+            if data.rstrip().endswith(b'}'):
+                try:
+                    request = json.loads(data)
+                    break
+                except ValueError:
+                    pass
+
+            if self.max_payload_size and len(data) > self.max_payload_size:
+                writer.write(f'PayloadTooLarge: Request exceeds {self.max_payload_size} bytes.\n'
+                             .encode('utf-8'))
+                await writer.drain()
+                return
+
+            chunk = await reader.read(RECV_SIZE)
+            if not chunk:
+                break
+            data += chunk
+
+        if not isinstance(request, dict):
+            writer.write(b'InvalidRequest: Request must be a json object.\n')
+        else:
+            response = await self.forward(request, client)
+            writer.write(response.legacy_text().encode('utf-8'))
+        await writer.drain()
+
+    async def start(self, host: str = '0.0.0.0', port: int = DEFAULT_PORT) -> None:
+        """Start listening and health-checking the backends."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        self._health_task = asyncio.ensure_future(self._health_loop())
+        LOGGER.info('Broker listening on %s:%s with %s backends.', host, port, len(self.backends))
+
+    async def serve_forever(self) -> None:
+        assert self._server, 'Broker not started.'
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for backend in self.backends:
+            await backend.client.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='nukeserversocket-broker',
+        description='Dispatch requests across several NukeServerSocket servers.'
+    )
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                        help='Address to listen on. Default is 0.0.0.0.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on. Default is {DEFAULT_PORT}.')
+    parser.add_argument('--backend', action='append', default=[], metavar='HOST:PORT',
+                        help='Address of a backend server. Can be repeated.')
+    parser.add_argument('--no-sticky', action='store_true',
+                        help='Do not send the requests of a client to the same backend.')
+    parser.add_argument('--health-interval', type=float, default=5.0,
+                        help='Seconds between health checks. Default is 5.')
+    args = parser.parse_args(argv)
+
+    log_to_stderr()
+
+    try:
+        broker = Broker(
+            args.backend, sticky=not args.no_sticky, health_interval=args.health_interval
+        )
+    except ValueError as e:
+        LOGGER.error('Invalid backend address: %s', e)
+        return 2
+
+    async def run() -> None:
+        await broker.start(args.host, args.port)
+        try:
+            await broker.serve_forever()
+        finally:
+            await broker.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        LOGGER.error('Broker error: %s', e)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
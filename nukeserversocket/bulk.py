@@ -0,0 +1,74 @@
+"""Packed arrays returned by the bulk-read commands.
+
+Bulk-read commands (e.g. `knobs` and `sample` in Nuke, `parms` and `points`
+in Houdini) return their values as one packed, NumPy-compatible buffer
+instead of text:
+
+    {"dtype": "<f4", "shape": [height, width, channels], "data": "<base64>"}
+
+With `"shm": true` in the command args, the buffer is placed in shared memory
+(see `nukeserversocket.shm`) and the reply carries its handle instead of
+`data`. Read it with `load` or `to_numpy`, which also unlink the segment:
+
+    response = client.command('sample', node='Read1', width=512, height=512, shm=True)
+    pixels = to_numpy(response.json())
+
+"""
+from __future__ import annotations
+
+import sys
+import array
+import base64
+from typing import Any, Dict, List, Union, Iterable
+
+from .shm import SharedBuffer
+
+# array typecode -> numpy dtype name
+_DTYPES = {'f': 'f4', 'd': 'f8', 'i': 'i4', 'q': 'i8'}
+
+_BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+NAN = float('nan')
+
+
+def pack(
+    values: Union[array.array, Iterable[float]],
+    shape: List[int],
+    typecode: str = 'd',
+    use_shm: bool = False
+) -> Dict[str, Any]:
+    """Pack the values in a buffer of `typecode` items and return its description."""
+    if not isinstance(values, array.array):
+        values = array.array(typecode, values)
+
+    result: Dict[str, Any] = {
+        'dtype': _BYTE_ORDER + _DTYPES[values.typecode],
+        'shape': list(shape),
+    }
+
+    if use_shm:
+        result['shm'] = SharedBuffer.create(values).handle()
+    else:
+        result['data'] = base64.b64encode(values).decode('ascii')
+
+    return result
+
+
+def load(result: Dict[str, Any]) -> bytes:
+    """Return the packed buffer of a bulk-read reply, unlinking its shared memory."""
+    if 'shm' not in result:
+        return base64.b64decode(result.get('data', ''))
+
+    buffer = SharedBuffer.from_handle(result['shm'])
+    try:
+        with buffer as view:
+            return bytes(view)
+    finally:
+        buffer.unlink()
+
+
+def to_numpy(result: Dict[str, Any]) -> Any:
+    """Return the values of a bulk-read reply as a NumPy array. Requires numpy."""
+    import numpy
+
+    return numpy.frombuffer(load(result), result['dtype']).reshape(result['shape'])
@@ -0,0 +1,116 @@
+"""Cancellation of the running request from a background thread.
+
+User code runs on the main thread, which also reads the sockets: a `cancel`
+command sent over a connection is only read once the running script is done.
+The server therefore also listens for cancel datagrams (UDP, on the same port
+number as the TCP server), read by a thread of their own:
+
+    {"command": "cancel", "args": {"id": "<request id>"}}
+
+The running request with that id is interrupted right away (see
+`cancel_execution`) and the reply datagram is `{"id": "<request id>",
+"cancelled": true}`. Queued requests are not running: they are cancelled
+with the `cancel` command. `NssClient.cancel` sends both.
+
+This module has no Qt dependency.
+
+"""
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import contextlib
+from typing import Any, Dict, Optional
+
+from .logger import get_logger
+from .utils.watchdog import cancel_execution
+
+LOGGER = get_logger()
+
+# seconds between two checks of the stop flag
+POLL_INTERVAL = 0.2
+
+MAX_DATAGRAM_SIZE = 64 * 1024
+
+
+def _parse(datagram: bytes) -> Optional[str]:
+    """Return the request id of a cancel datagram, None if it is not one."""
+    try:
+        message: Dict[str, Any] = json.loads(datagram)
+        if message.get('command') != 'cancel':
+            return None
+        return str((message.get('args') or {})['id'])
+    except (ValueError, TypeError, AttributeError, KeyError):
+        return None
+
+
+class CancelListener:
+    """Thread reading cancel datagrams and interrupting the running request."""
+
+    def __init__(self):
+        self._socket: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, host: str, port: int) -> bool:
+        """Listen on the UDP port. Return False if it cannot be bound."""
+        self.stop()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((host, port))
+        except OSError as e:
+            sock.close()
+            LOGGER.warning('Cannot listen for cancel messages on UDP port %s: %s', port, e)
+            return False
+        sock.settimeout(POLL_INTERVAL)
+
+        self._socket = sock
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._serve, name='nss-cancel', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            assert self._socket
+            # wake up the thread instead of waiting for its poll timeout
+            port = self._socket.getsockname()[1]
+            with contextlib.suppress(OSError):
+                self._socket.sendto(b'', ('127.0.0.1', port))
+            self._thread.join()
+            self._thread = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+    def _serve(self) -> None:
+        assert self._socket
+        while not self._stop.is_set():
+            try:
+                datagram, address = self._socket.recvfrom(MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                # e.g. the previous reply was not delivered (Windows)
+                continue
+            if self._stop.is_set():
+                break
+
+            request_id = _parse(datagram)
+            if request_id is None:
+                LOGGER.warning('Ignored invalid cancel message from %s.', address[0])
+                continue
+
+            cancelled = cancel_execution(request_id)
+            LOGGER.info('Cancel message for %s: cancelled=%s', request_id, cancelled)
+            reply = json.dumps({'id': request_id, 'cancelled': cancelled})
+            try:
+                self._socket.sendto(reply.encode('utf-8'), address)
+            except OSError as e:
+                LOGGER.debug('Cannot reply to the cancel message: %s', e)
@@ -0,0 +1,713 @@
+"""Python client for the NukeServerSocket server.
+
+Both clients speak the framed protocol (see `nukeserversocket.protocol`): they
+keep their connections open between requests, pipeline several requests on
+one connection, compress large bodies and return structured `Response`
+objects instead of raw text.
+
+    from nukeserversocket.client import NssClient
+
+    with NssClient(port=54321) as client:
+        response = client.execute('print(nuke.allNodes())')
+        print(response.output)
+
+        responses = client.pipeline([
+            {'text': 'print(1)'},
+            {'text': 'print(2)', 'priority': 'interactive'},
+        ])
+
+    async with AsyncNssClient(port=54321) as client:
+        response = await client.execute('print(1)')
+
+Send the same request to several servers at once with `broadcast`:
+
+    result = broadcast(['host1:54321', 'host2:54321'], 'import tools; reload(tools)', timeout=10)
+    print(result.summary())
+
+The module does not import Qt, so it can be used by any Python 3 tool.
+
+"""
+from __future__ import annotations
+
+import os
+import json
+import uuid
+import socket
+import asyncio
+import threading
+from typing import Any, Dict, List, Tuple, Union, Mapping, Iterable, Optional
+from dataclasses import field, asdict, replace, dataclass
+
+from .shm import Buffer, SharedBuffer
+from .delta import text_hash, make_delta, apply_delta
+from .protocol import (FLAG_ACCEPT_COMPRESSED, Response, FrameDecoder,
+                       ProtocolError, encode_frame)
+
+Request = Dict[str, Any]
+
+RECV_SIZE = 64 * 1024
+
+
+class ConnectionClosed(ConnectionError):
+    """The server closed the connection before replying."""
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Split a `host:port` address. The host defaults to 127.0.0.1."""
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def make_request(
+    text: str = '',
+    file: str = '',
+    *,
+    id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    priority: Optional[str] = None,
+    format_text: bool = False,
+    command: Optional[str] = None,
+    args: Optional[Dict[str, Any]] = None,
+    shm: Optional[Dict[str, Any]] = None,
+    path: Optional[str] = None,
+    mtime: Optional[float] = None,
+    digest: Optional[str] = None,
+    session: Optional[str] = None,
+    delta: Optional[Dict[str, Any]] = None,
+    worker: bool = False,
+    coalesce: bool = False,
+    if_none_match: Optional[str] = None,
+    delta_reply: bool = False,
+    batch: Union[bool, str] = False
+) -> Request:
+    """Return a request dictionary. See the request options in the README."""
+    request: Request = {'id': id or uuid.uuid4().hex, 'formatText': '1' if format_text else '0'}
+    if text:
+        request['text'] = text
+    if file:
+        request['file'] = file
+    if timeout:
+        request['timeout'] = timeout
+    if priority:
+        request['priority'] = priority
+    if command:
+        request['command'] = command
+        request['args'] = args or {}
+    if shm:
+        request['shm'] = shm
+    if path:
+        request['path'] = path
+    if mtime is not None:
+        request['mtime'] = mtime
+    if digest:
+        request['hash'] = digest
+    if session:
+        request['session'] = session
+    if delta:
+        request['delta'] = delta
+    if worker:
+        request['worker'] = True
+    if coalesce:
+        request['coalesce'] = True
+    if if_none_match:
+        request['if_none_match'] = if_none_match
+    if delta_reply:
+        request['delta_reply'] = True
+    if batch:
+        request['batch'] = batch
+    return request
+
+
+def file_request(path: str, **options: Any) -> Request:
+    """Return a request that makes the server read the script from `path`.
+
+    When the file exists locally, its modification time is sent along so that
+    the server refuses to run a different version of it (`SourceMismatch`).
+
+    """
+    if 'mtime' not in options and os.path.isfile(path):
+        options['mtime'] = os.stat(path).st_mtime
+    return make_request(path=path, **options)
+
+
+def _delta_request(
+    session: str, base: Optional[str], text: str, file: str, options: Dict[str, Any]
+) -> Request:
+    """Return a delta request against `base`, or a full one when the delta is not smaller."""
+    if base is not None:
+        ops = make_delta(base, text)
+        if len(json.dumps(ops)) < len(text):
+            delta = {'base': text_hash(base), 'ops': ops, 'hash': text_hash(text)}
+            return make_request(file=file, session=session, delta=delta, **options)
+    return make_request(text, file, session=session, **options)
+
+
+def _poll_request(
+    previous: Optional[str], text: str, file: str, delta: bool, options: Dict[str, Any]
+) -> Request:
+    return make_request(
+        text, file,
+        if_none_match=text_hash(previous) if previous is not None else None,
+        delta_reply=delta,
+        **options
+    )
+
+
+def _poll_response(response: Response, previous: Optional[str]) -> Response:
+    """Restore the full output of an `unchanged` or delta reply."""
+    if previous is None:
+        return response
+    if response.unchanged:
+        return replace(response, output=previous)
+    if response.delta is not None:
+        return replace(response, output=apply_delta(previous, response.delta))
+    return response
+
+
+def _job_id(response: Response) -> str:
+    reply = response.json() if response.ok else {'error': response.error}
+    if 'error' in reply:
+        raise RuntimeError(f'Cannot submit the job: {reply["error"]}')
+    return str(reply['job'])
+
+
+def send_cancel(host: str, port: int, request_id: str, timeout: float = 1.0) -> bool:
+    """Interrupt the running request through a cancel datagram, see `nukeserversocket.cancel`.
+
+    Return False if the request is not running or the server did not reply.
+
+    """
+    message = json.dumps({'command': 'cancel', 'args': {'id': request_id}}).encode('utf-8')
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(message, (host, port))
+            reply = json.loads(sock.recv(RECV_SIZE))
+        except (OSError, ValueError):
+            return False
+    return reply.get('id') == request_id and bool(reply.get('cancelled'))
+
+
+def _prepare(requests: Iterable[Request]) -> List[Request]:
+    prepared = [dict(request) for request in requests]
+    for request in prepared:
+        request['id'] = str(request.get('id') or uuid.uuid4().hex)
+
+    if len({request['id'] for request in prepared}) != len(prepared):
+        raise ValueError('Pipelined requests must have unique ids.')
+
+    return prepared
+
+
+def _encode(requests: List[Request], compress: bool) -> bytes:
+    flags = FLAG_ACCEPT_COMPRESSED if compress else 0
+    return b''.join(
+        encode_frame(json.dumps(request).encode('utf-8'), flags, compress)
+        for request in requests
+    )
+
+
+def _check_connection_error(response: Response) -> None:
+    # the server replies with an id-less error before closing on a bad frame
+    if not response.id and response.error:
+        raise ProtocolError(response.error)
+
+
+class _Connection:
+    def __init__(self, host: str, port: int, timeout: Optional[float]):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.decoder = FrameDecoder()
+        self.reused = False
+        # bytes received for the current requests
+        self.received = 0
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def request(self, requests: List[Request], compress: bool) -> Dict[str, Response]:
+        self.received = 0
+        self.sock.sendall(_encode(requests, compress))
+
+        responses: Dict[str, Response] = {}
+        while len(responses) < len(requests):
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionClosed('Connection closed by the server.')
+            self.received += len(data)
+
+            for _, body in self.decoder.feed(data):
+                response = Response.from_bytes(body)
+                _check_connection_error(response)
+                responses[response.id] = response
+
+        return responses
+
+
+class NssClient:
+    """Thread-safe client with a pool of keep-alive connections.
+
+    Each call checks out a connection from the pool, so up to `pool_size`
+    threads can wait for their replies at once. A pooled connection that
+    turns out to be closed before any reply (e.g. the server restarted) is
+    replaced and the request is sent again once.
+
+    Args:
+        host: The server address.
+        port: The server port.
+        pool_size: Maximum number of open connections.
+        timeout: Socket timeout in seconds, None blocks until the reply.
+        compress: Compress large requests and accept compressed replies.
+
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 54321,
+        *,
+        pool_size: int = 4,
+        timeout: Optional[float] = None,
+        compress: bool = True
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.compress = compress
+        self.session = uuid.uuid4().hex
+
+        # last text sent per file, base of the delta requests
+        self._sent: Dict[str, str] = {}
+        # last output of each polled code
+        self._outputs: Dict[Tuple[str, str], str] = {}
+
+        self._idle: List[_Connection] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(pool_size, 1))
+
+    def __enter__(self) -> NssClient:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the idle connections. Connections in use are closed when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self) -> _Connection:
+        self._slots.acquire()
+        with self._lock:
+            self._closed = False
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Connection(self.host, self.port, self.timeout)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection: _Connection, reuse: bool) -> None:
+        with self._lock:
+            reuse = reuse and not self._closed
+            if reuse:
+                connection.reused = True
+                self._idle.append(connection)
+        if not reuse:
+            connection.close()
+        self._slots.release()
+
+    def pipeline(self, requests: Iterable[Request]) -> List[Response]:
+        """Send the requests on one connection without waiting for each reply.
+
+        Return the responses in the order of the requests.
+
+        """
+        prepared = _prepare(requests)
+        if not prepared:
+            return []
+
+        while True:
+            connection = self._acquire()
+            try:
+                responses = connection.request(prepared, self.compress)
+            except (ConnectionClosed, ConnectionResetError, BrokenPipeError):
+                self._release(connection, reuse=False)
+                # a pooled connection closed while idle: retry on a new one
+                if connection.reused and not connection.received:
+                    continue
+                raise
+            except BaseException:
+                self._release(connection, reuse=False)
+                raise
+
+            self._release(connection, reuse=True)
+            return [responses[request['id']] for request in prepared]
+
+    def send(self, request: Request) -> Response:
+        """Send a request dictionary and return its response."""
+        return self.pipeline([request])[0]
+
+    def execute(
+        self, text: str, file: str = '', *, data: Optional[Buffer] = None, **options: Any
+    ) -> Response:
+        """Execute the code. `options` are the keyword arguments of `make_request`.
+
+        `data` is passed to the code through shared memory (same host only),
+        see `nukeserversocket.shm`.
+
+        """
+        if data is None:
+            return self.send(make_request(text, file, **options))
+
+        buffer = SharedBuffer.create(data)
+        try:
+            return self.send(make_request(text, file, shm=buffer.handle(), **options))
+        finally:
+            buffer.unlink()
+
+    def execute_delta(self, text: str, file: str, **options: Any) -> Response:
+        """Execute the code of `file`, sending only a diff against the text last sent for it.
+
+        The full text is sent again when the server does not have the base,
+        see `nukeserversocket.delta`.
+
+        """
+        request = _delta_request(self.session, self._sent.get(file), text, file, options)
+        response = self.send(request)
+        if 'delta' in request and (response.error or '').startswith('DeltaMismatch'):
+            response = self.send(make_request(text, file, session=self.session, **options))
+        self._sent[file] = text
+        return response
+
+    def poll(self, text: str, file: str = '', *, delta: bool = False, **options: Any) -> Response:
+        """Execute the code, without receiving the output again when it did not change.
+
+        The hash of the last output of the same code is sent along: when the
+        new output is identical, the reply is a tiny `unchanged` one. With
+        `delta`, a different output is sent as a line diff of the last one.
+        The returned response always has the full output.
+
+        """
+        key = (text, file)
+        previous = self._outputs.get(key)
+        response = _poll_response(
+            self.send(_poll_request(previous, text, file, delta, options)), previous
+        )
+        if response.ok:
+            self._outputs[key] = response.output
+        return response
+
+    def execute_file(self, path: str, **options: Any) -> Response:
+        """Execute a script the server can read from shared storage. See `file_request`."""
+        return self.send(file_request(path, **options))
+
+    def command(self, name: str, **args: Any) -> Response:
+        """Run a built-in server command. Its reply is available with `Response.json()`."""
+        return self.send(make_request(command=name, args=args))
+
+    def submit(self, text: str, file: str = '', **options: Any) -> str:
+        """Queue the code as a job and return its id, see `nukeserversocket.jobs`.
+
+        Collect the result with the `status`, `result` and `wait` commands.
+
+        """
+        return _job_id(self.command('submit', request=make_request(text, file, **options)))
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a queued or running request. Return False if it is neither.
+
+        A running request is interrupted with a cancel datagram, as the
+        server does not read its connections while a script runs.
+
+        """
+        if send_cancel(self.host, self.port, request_id, self.timeout or 1.0):
+            return True
+        return bool(self.command('cancel', id=request_id).json().get('cancelled'))
+
+
+class _AsyncConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._futures: Dict[str, asyncio.Future[Response]] = {}
+        self.closed = False
+        self._task = asyncio.ensure_future(self._read_replies())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._futures)
+
+    async def request(self, requests: List[Request], compress: bool) -> List[Response]:
+        if self.closed:
+            raise ConnectionClosed('Connection closed by the server.')
+
+        if any(request['id'] in self._futures for request in requests):
+            raise ValueError('A request with the same id is already in flight.')
+
+        loop = asyncio.get_event_loop()
+        futures: List[asyncio.Future[Response]] = []
+        for request in requests:
+            future: asyncio.Future[Response] = loop.create_future()
+            self._futures[request['id']] = future
+            futures.append(future)
+
+        self._writer.write(_encode(requests, compress))
+        await self._writer.drain()
+
+        return list(await asyncio.gather(*futures))
+
+    async def _read_replies(self) -> None:
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await self._reader.read(RECV_SIZE)
+                if not data:
+                    raise ConnectionClosed('Connection closed by the server.')
+
+                for _, body in decoder.feed(data):
+                    response = Response.from_bytes(body)
+                    _check_connection_error(response)
+                    future = self._futures.pop(response.id, None)
+                    if future and not future.done():
+                        future.set_result(response)
+        except asyncio.CancelledError:
+            self._fail(ConnectionClosed('Connection closed by the client.'))
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error: Exception) -> None:
+        self.closed = True
+        futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        self._task.cancel()
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+
+
+class AsyncNssClient:
+    """asyncio client multiplexing requests over a few keep-alive connections.
+
+    Each call is sent on the open connection with the fewest requests in
+    flight, opening a new one while there are less than `pool_size`.
+
+    Args:
+        host: The server address.
+        port: The server port.
+        pool_size: Maximum number of open connections.
+        compress: Compress large requests and accept compressed replies.
+
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 54321,
+        *,
+        pool_size: int = 4,
+        compress: bool = True
+    ):
+        self.host = host
+        self.port = port
+        self.pool_size = max(pool_size, 1)
+        self.compress = compress
+        self.session = uuid.uuid4().hex
+
+        self._sent: Dict[str, str] = {}
+        self._outputs: Dict[Tuple[str, str], str] = {}
+
+        self._connections: List[_AsyncConnection] = []
+
+    async def __aenter__(self) -> AsyncNssClient:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            await connection.close()
+
+    async def _connection(self) -> _AsyncConnection:
+        self._connections = [c for c in self._connections if not c.closed]
+
+        connection = min(self._connections, key=lambda c: c.in_flight, default=None)
+        if connection and (not connection.in_flight or len(self._connections) >= self.pool_size):
+            return connection
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = _AsyncConnection(reader, writer)
+        self._connections.append(connection)
+        return connection
+
+    async def pipeline(self, requests: Iterable[Request]) -> List[Response]:
+        """Send the requests on one connection and return their responses in order."""
+        prepared = _prepare(requests)
+        if not prepared:
+            return []
+        connection = await self._connection()
+        return await connection.request(prepared, self.compress)
+
+    async def send(self, request: Request) -> Response:
+        """Send a request dictionary and return its response."""
+        return (await self.pipeline([request]))[0]
+
+    async def execute(
+        self, text: str, file: str = '', *, data: Optional[Buffer] = None, **options: Any
+    ) -> Response:
+        """Execute the code. See `NssClient.execute`."""
+        if data is None:
+            return await self.send(make_request(text, file, **options))
+
+        buffer = SharedBuffer.create(data)
+        try:
+            return await self.send(make_request(text, file, shm=buffer.handle(), **options))
+        finally:
+            buffer.unlink()
+
+    async def execute_delta(self, text: str, file: str, **options: Any) -> Response:
+        """Execute the code of `file` as a diff. See `NssClient.execute_delta`."""
+        request = _delta_request(self.session, self._sent.get(file), text, file, options)
+        response = await self.send(request)
+        if 'delta' in request and (response.error or '').startswith('DeltaMismatch'):
+            response = await self.send(make_request(text, file, session=self.session, **options))
+        self._sent[file] = text
+        return response
+
+    async def poll(
+        self, text: str, file: str = '', *, delta: bool = False, **options: Any
+    ) -> Response:
+        """Execute the code, without receiving an unchanged output. See `NssClient.poll`."""
+        key = (text, file)
+        previous = self._outputs.get(key)
+        response = _poll_response(
+            await self.send(_poll_request(previous, text, file, delta, options)), previous
+        )
+        if response.ok:
+            self._outputs[key] = response.output
+        return response
+
+    async def execute_file(self, path: str, **options: Any) -> Response:
+        """Execute a script the server can read from shared storage. See `file_request`."""
+        return await self.send(file_request(path, **options))
+
+    async def command(self, name: str, **args: Any) -> Response:
+        """Run a built-in server command. Its reply is available with `Response.json()`."""
+        return await self.send(make_request(command=name, args=args))
+
+    async def submit(self, text: str, file: str = '', **options: Any) -> str:
+        """Queue the code as a job and return its id. See `NssClient.submit`."""
+        return _job_id(await self.command('submit', request=make_request(text, file, **options)))
+
+
+@dataclass
+class BroadcastResult:
+    """Responses of a broadcast, by target address.
+
+    The status of a target is `ok`, `error` (the request failed on the
+    server), `timeout` (no reply in time) or `unreachable`.
+
+    """
+    responses: Dict[str, Response] = field(default_factory=dict)
+    status: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(status == 'ok' for status in self.status.values())
+
+    def summary(self) -> Dict[str, int]:
+        summary = {'targets': len(self.status), 'ok': 0, 'error': 0, 'timeout': 0, 'unreachable': 0}
+        for status in self.status.values():
+            summary[status] += 1
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'summary': self.summary(),
+            'results': {
+                address: dict(asdict(response), status=self.status[address])
+                for address, response in self.responses.items()
+            }
+        }
+
+
+async def gather_responses(
+    clients: Mapping[str, AsyncNssClient],
+    request: Request,
+    timeout: Optional[float] = None
+) -> BroadcastResult:
+    """Send the request to all the clients concurrently and gather the responses.
+
+    A target that does not reply within `timeout` seconds is sent a `cancel`.
+
+    """
+    request = _prepare([request])[0]
+    result = BroadcastResult()
+
+    async def send(address: str, client: AsyncNssClient) -> None:
+        try:
+            response = await asyncio.wait_for(client.send(request), timeout)
+            status = 'ok' if response.ok else 'error'
+        except asyncio.TimeoutError:
+            response = Response(
+                request['id'], error=f'BroadcastTimeout: No reply after {timeout}s.'
+            )
+            status = 'timeout'
+            try:
+                # the datagram interrupts the script, the command a queued request
+                await asyncio.get_event_loop().run_in_executor(
+                    None, send_cancel, client.host, client.port, request['id']
+                )
+                await asyncio.wait_for(client.command('cancel', id=request['id']), 1.0)
+            except (OSError, ProtocolError, asyncio.TimeoutError):
+                pass
+        except (OSError, ProtocolError) as e:
+            response = Response(request['id'], error=f'{type(e).__name__}: {e}')
+            status = 'unreachable'
+
+        result.responses[address] = response
+        result.status[address] = status
+
+    await asyncio.gather(*(send(address, client) for address, client in clients.items()))
+    return result
+
+
+async def broadcast_async(
+    targets: Iterable[str],
+    request: Union[str, Request],
+    *,
+    timeout: Optional[float] = None
+) -> BroadcastResult:
+    """Send the request (or code) to every `host:port` target and gather the responses."""
+    if isinstance(request, str):
+        request = make_request(request)
+
+    clients = {address: AsyncNssClient(*parse_address(address)) for address in targets}
+    try:
+        return await gather_responses(clients, request, timeout)
+    finally:
+        for client in clients.values():
+            await client.close()
+
+
+def broadcast(
+    targets: Iterable[str],
+    request: Union[str, Request],
+    *,
+    timeout: Optional[float] = None
+) -> BroadcastResult:
+    """Blocking version of `broadcast_async`."""
+    return asyncio.run(broadcast_async(targets, request, timeout=timeout))
@@ -0,0 +1,135 @@
+"""Built-in server commands.
+
+A request with a `command` key is handled by the server itself instead of
+being executed by the editor. The reply is a json string.
+
+Commands registered here are available everywhere; commands specific to a
+host application (e.g. reading Nuke knobs) are returned by the `commands`
+method of its controller. Controller commands run host code: they are always
+queued like scripts.
+
+    {"command": "cancel", "args": {"id": "<request id>"}}
+
+"""
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any, Set, Dict, Callable
+
+from .jobs import job_ids, job_reply
+from .logger import get_logger
+from .version import __version__
+from .reloader import get_reloader
+from .procedures import get_procedures
+
+if TYPE_CHECKING:
+    from .server import NssServer
+    from .received_data import ReceivedData
+
+LOGGER = get_logger()
+
+CommandHandler = Callable[['NssServer', 'ReceivedData'], Dict[str, Any]]
+
+COMMANDS: Dict[str, CommandHandler] = {}
+
+# commands that run user code: they wait in the queue and run under the watchdog
+QUEUED_COMMANDS: Set[str] = set()
+
+
+def command(name: str, queued: bool = False) -> Callable[[CommandHandler], CommandHandler]:
+    """Register a function as the handler of a built-in command."""
+    def inner(func: CommandHandler) -> CommandHandler:
+        COMMANDS[name] = func
+        if queued:
+            QUEUED_COMMANDS.add(name)
+        return func
+    return inner
+
+
+def is_queued(server: NssServer, name: str) -> bool:
+    """Return True if the command must be scheduled like a script."""
+    return name in QUEUED_COMMANDS or name in server.editor.commands()
+
+
+def run_command(server: NssServer, data: ReceivedData) -> str:
+    """Run the command of the request and return its json reply."""
+    handler = COMMANDS.get(data.command)
+    controller_handler = server.editor.commands().get(data.command)
+    if not handler and not controller_handler:
+        LOGGER.error('Unknown command: %s', data.command)
+        return json.dumps({'error': f'Unknown command: {data.command}'})
+
+    LOGGER.debug('Running command: %s %s', data.command, data.args)
+    try:
+        if handler:
+            return json.dumps(handler(server, data))
+        assert controller_handler
+        return json.dumps(controller_handler(data.args))
+    except Exception as e:
+        LOGGER.exception('Command %s failed.', data.command)
+        return json.dumps({'error': f'{type(e).__name__}: {e}'})
+
+
+@command('cancel')
+def _cancel(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    request_id = str(data.args.get('id', ''))
+    return {'id': request_id, 'cancelled': server.cancel(request_id)}
+
+
+@command('ping')
+def _ping(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return {'version': __version__, 'queued': len(server.scheduler)}
+
+
+@command('register')
+def _register(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    procedure = get_procedures().register(str(data.args.get('name', '')), str(data.args['text']))
+    return {'name': procedure.name, 'registered': True, 'digest': procedure.digest}
+
+
+@command('unregister')
+def _unregister(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    name = str(data.args.get('name', ''))
+    return {'name': name, 'unregistered': get_procedures().unregister(name)}
+
+
+@command('procedures')
+def _procedures(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return {'procedures': get_procedures().names()}
+
+
+@command('invoke', queued=True)
+def _invoke(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return get_procedures().invoke(str(data.args.get('name', '')), data.args.get('args'))
+
+
+@command('reload', queued=True)
+def _reload(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return get_reloader().reload(
+        data.args.get('packages') or (),
+        data.args.get('modules') or (),
+        bool(data.args.get('dry_run'))
+    )
+
+
+@command('submit')
+def _submit(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    request = data.args.get('request')
+    if not isinstance(request, dict):
+        raise ValueError('The request of the job must be an object.')
+    return server.submit_job(request).to_dict()
+
+
+@command('status')
+def _status(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return job_reply(data.args, server.jobs.report(job_ids(data.args), output=False))
+
+
+@command('result')
+def _result(server: NssServer, data: ReceivedData) -> Dict[str, Any]:
+    return job_reply(data.args, server.jobs.report(job_ids(data.args), output=True))
+
+
+# Requests from the sockets are deferred by the server until the jobs finish:
+# this handler only serves direct calls, and replies right away.
+COMMANDS['wait'] = _result
@@ -0,0 +1,258 @@
+"""Client connection handling for the NukeServerSocket server."""
+from __future__ import annotations
+
+import json
+import time
+from typing import Deque, Union, Optional
+from collections import deque
+
+from PySide2.QtCore import Slot, QTimer, Signal, QObject
+from PySide2.QtNetwork import QTcpSocket, QLocalSocket, QAbstractSocket
+
+from .logger import get_logger
+from .metrics import get_metrics
+from .protocol import FrameDecoder
+
+LOGGER = get_logger()
+
+Socket = Union[QTcpSocket, QLocalSocket]
+
+# Size of each write call. Large replies are split so that the socket write
+# buffer never holds more than `WRITE_BUFFER_LIMIT` bytes at once.
+WRITE_CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_LIMIT = 4 * WRITE_CHUNK_SIZE
+
+# Time in ms to wait for the write buffer to drain before aborting the socket.
+DRAIN_TIMEOUT = 30000
+
+# Time in ms to wait for the rest of an incomplete legacy request.
+READ_TIMEOUT = 30000
+
+
+def _is_complete(request: bytes) -> bool:
+    """Return True if the legacy request is a complete json document."""
+    if not request.rstrip().endswith(b'}'):
+        return False
+    try:
+        json.loads(request)
+    except ValueError:
+        return False
+    return True
+
+
+class NssConnection(QObject):
+    """A single client connection.
+
+    The connection owns the socket and takes care of writing the replies back:
+    payloads are written in chunks as the socket reports `bytesWritten`. A
+    legacy connection is closed only after its write buffer has drained (or
+    aborted after `DRAIN_TIMEOUT`), while a framed connection (see
+    `nukeserversocket.protocol`) stays open for the next requests.
+
+    Legacy requests have no length: they are buffered until their json is
+    complete, which can take several `readyRead` for a large request.
+
+    Signals:
+        read_timed_out (): Emitted when a legacy request is still incomplete
+            after `READ_TIMEOUT`.
+
+    """
+
+    read_timed_out = Signal()
+
+    def __init__(self, socket: Socket, parent: Optional[QObject] = None):
+        super().__init__(parent)
+
+        self.socket = socket
+        self.socket.setParent(self)
+
+        if isinstance(socket, QTcpSocket):
+            # replies are small and latency sensitive: disable Nagle
+            socket.setSocketOption(QAbstractSocket.LowDelayOption, 1)
+
+        # True while a legacy connection has a request waiting for its reply
+        self.busy = False
+        # True once the connection and its socket are scheduled for deletion
+        self.deleted = False
+
+        # None until the first bytes tell which protocol the client speaks
+        self.framed: Optional[bool] = None
+        self.decoder = FrameDecoder()
+        # framed requests waiting for their reply
+        self.pending = 0
+
+        # bytes of the legacy request received so far
+        self._input = bytearray()
+        self._read_timer = QTimer(self)
+        self._read_timer.setSingleShot(True)
+        self._read_timer.timeout.connect(self._on_read_timeout)
+
+        self._outgoing: Deque[memoryview] = deque()
+        self._offset = 0
+        self._writing = False
+        self._close_when_drained = False
+        self._write_start = 0.0
+        self._write_size = 0
+        self._write_count = 0
+
+        self._drain_timer = QTimer(self)
+        self._drain_timer.setSingleShot(True)
+        self._drain_timer.timeout.connect(self._on_drain_timeout)
+
+        self.socket.disconnected.connect(self._on_disconnected)
+
+    @property
+    def peer(self) -> str:
+        """Return an identifier of the client used for logging."""
+        if isinstance(self.socket, QTcpSocket):
+            return self.socket.peerAddress().toString()
+        return 'local'
+
+    def is_connected(self) -> bool:
+        if isinstance(self.socket, QTcpSocket):
+            return self.socket.state() == QAbstractSocket.ConnectedState
+        return self.socket.state() == QLocalSocket.ConnectedState
+
+    def _delete(self) -> None:
+        """Schedule the deletion of the connection. Replies written later are dropped."""
+        self.deleted = True
+        self.deleteLater()
+
+    @Slot()
+    def _on_disconnected(self) -> None:
+        # a queued request still needs the connection to reply, even if the
+        # client went away: it is deleted once the reply is handled.
+        if not self.busy and not self.pending:
+            self._delete()
+
+    def bytes_available(self) -> int:
+        return self.socket.bytesAvailable()
+
+    def peek(self, size: int) -> bytes:
+        return self.socket.peek(size).data()
+
+    def read_all(self) -> bytes:
+        return self.socket.readAll().data()
+
+    def buffered(self) -> int:
+        """Return the size of the incomplete legacy request received so far."""
+        return len(self._input)
+
+    def read_request(self) -> Optional[bytes]:
+        """Buffer the available bytes and return the legacy request once complete.
+
+        Return None while the json is incomplete. `read_timed_out` is emitted
+        if no more bytes arrive within `READ_TIMEOUT`.
+
+        """
+        self._input += self.read_all()
+        if not _is_complete(self._input):
+            self._read_timer.start(READ_TIMEOUT)
+            return None
+
+        self._read_timer.stop()
+        request = bytes(self._input)
+        self._input.clear()
+        return request
+
+    @Slot()
+    def _on_read_timeout(self) -> None:
+        self._input.clear()
+        self.read_timed_out.emit()
+
+    def write(self, payload: bytes, timeout: int = DRAIN_TIMEOUT) -> None:
+        """Queue the payload to be written back to the client."""
+        if self.deleted:
+            LOGGER.debug('Connection already closed: reply dropped.')
+            return
+
+        if not self.is_connected():
+            LOGGER.debug('Client %s disconnected before the reply.', self.peer)
+            if not self.pending:
+                self.busy = False
+                self._delete()
+            return
+
+        if not self._writing:
+            self._writing = True
+            self._write_start = time.perf_counter()
+            self._write_size = 0
+            self._write_count = 0
+            self.socket.bytesWritten.connect(self._on_bytes_written)
+
+        self._outgoing.append(memoryview(payload))
+        self._write_size += len(payload)
+        self._write_count += 1
+        self._drain_timer.start(timeout)
+
+        self._on_bytes_written()
+
+    def write_and_close(self, payload: bytes, timeout: int = DRAIN_TIMEOUT) -> None:
+        """Write the payload back to the client and close the socket once sent."""
+        self._close_when_drained = True
+        self.write(payload, timeout)
+
+    def _write_chunks(self) -> None:
+        while self._outgoing and self.socket.bytesToWrite() < WRITE_BUFFER_LIMIT:
+            payload = self._outgoing[0]
+            chunk = payload[self._offset:self._offset + WRITE_CHUNK_SIZE]
+            written = self.socket.write(chunk.tobytes())
+            if written < 0:
+                LOGGER.error('Failed to write to socket: %s', self.socket.errorString())
+                self._abort()
+                return
+            self._offset += written
+            if self._offset >= len(payload):
+                self._outgoing.popleft()
+                self._offset = 0
+
+    @Slot()
+    def _on_bytes_written(self) -> None:
+        self._write_chunks()
+
+        if self._writing and not self._outgoing and not self.socket.bytesToWrite():
+            self._finish()
+
+    def _finish(self) -> None:
+        self._drain_timer.stop()
+        self.socket.bytesWritten.disconnect(self._on_bytes_written)
+        self._writing = False
+
+        elapsed = time.perf_counter() - self._write_start
+        size = self._write_size
+
+        metrics = get_metrics()
+        metrics.increment('responses_written', self._write_count)
+        metrics.increment('bytes_written', size)
+        metrics.increment('write_seconds', elapsed)
+
+        LOGGER.debug(
+            'Wrote %s bytes to %s in %.2f ms (%.2f MB/s).',
+            size, self.peer, elapsed * 1000, size / max(elapsed, 1e-9) / 1e6
+        )
+
+        if self._close_when_drained:
+            self.busy = False
+            self.socket.close()
+            LOGGER.debug('Socket closed.')
+        elif not self.pending and not self.is_connected():
+            self._delete()
+
+    @Slot()
+    def _on_drain_timeout(self) -> None:
+        LOGGER.error(
+            'Timed out writing to %s: %s of %s bytes pending.',
+            self.peer, sum(len(p) for p in self._outgoing) - self._offset +
+            self.socket.bytesToWrite(), self._write_size
+        )
+        get_metrics().increment('write_timeouts')
+        self._abort()
+
+    def _abort(self) -> None:
+        self.busy = False
+        self.pending = 0
+        self._writing = False
+        self._outgoing.clear()
+        self._drain_timer.stop()
+        self.socket.abort()
+        self._delete()
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 import os
+import contextlib
 from abc import ABC, abstractmethod
-from typing import List
+from typing import TYPE_CHECKING, Any, Dict, List, Callable, ContextManager
 from datetime import datetime
 
-from PySide2.QtWidgets import QTextEdit, QPlainTextEdit
-
 from ..logger import get_logger
 from ..settings import _NssSettings
 from ..received_data import ReceivedData
+from ..utils.watchdog import ExecutionInterrupted
+
+if TYPE_CHECKING:
+    # Only needed for type hints: keep this module free of widgets imports so
+    # controllers can be used by the headless server.
+    from PySide2.QtWidgets import QTextEdit, QPlainTextEdit
 
 LOGGER = get_logger()
 
+# A built-in command handled by a controller: receives the command args.
+ControllerCommand = Callable[[Dict[str, Any]], Dict[str, Any]]
+
 
 def format_output(file: str, text: str, string_format: str) -> str:
     """Format the output sent to the Editor.
@@ -60,6 +68,25 @@ def settings(self, settings: _NssSettings) -> None:
     @abstractmethod
     def execute(self, data: ReceivedData) -> str: ...
 
+    def commands(self) -> Dict[str, ControllerCommand]:
+        """Return the built-in commands specific to the host application.
+
+        They are queued and run like scripts: under the watchdog, with the
+        request priority and `batch` mode.
+
+        """
+        return {}
+
+    def batch(self, mode: str) -> ContextManager[None]:
+        """Return the context of a request with the `batch` key.
+
+        `mode` is "group" (the request is one undo step) or "no_undo" (the
+        request cannot be undone). Host applications also suspend their UI
+        updates until the request finishes. Does nothing by default.
+
+        """
+        return contextlib.nullcontext()
+
 
 class EditorController(BaseController):
     history: List[str] = []
@@ -119,7 +146,12 @@ def execute(self, data: ReceivedData) -> str:
         initial_output = self.output_editor.toPlainText()
 
         self.set_input(data)
-        self.execute_code()
+        try:
+            self.execute_code()
+        except ExecutionInterrupted:
+            self.input_editor.setPlainText(initial_input)
+            self.output_editor.setPlainText(initial_output)
+            raise
 
         result = self.get_output()
 
@@ -1,19 +1,114 @@
 """Nuke-specific plugin for the NukeServerSocket."""
 from __future__ import annotations
 
-from typing import Optional
+import array
+import contextlib
+from typing import Any, Dict, Iterator, Optional, ContextManager
 
 from PySide2.QtWidgets import QWidget
 
+from nukeserversocket.bulk import NAN, pack
 from nukeserversocket.main import NukeServerSocket
 from nukeserversocket.utils import exec_code
 from nukeserversocket.received_data import ReceivedData
-from nukeserversocket.controllers.base import BaseController
+from nukeserversocket.controllers.base import BaseController, ControllerCommand
+
+
+def read_parms(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Read numeric parameter values of many nodes in one call.
+
+    Args:
+        nodes: Node paths.
+        parms: Parameter names.
+        frame: Evaluate at this frame. Defaults to the current frame.
+        shm: Return the values in shared memory.
+
+    The reply is a float64 array of shape (nodes, parms). Missing or non
+    numeric parameters are NaN.
+
+    """
+    import hou
+
+    paths = [str(p) for p in args['nodes']]
+    names = [str(p) for p in args['parms']]
+    frame = float(args['frame']) if args.get('frame') is not None else None
+
+    values = array.array('d')
+    for path in paths:
+        node = hou.node(path)
+        for name in names:
+            parm = node.parm(name) if node else None
+            try:
+                values.append(float(parm.eval() if frame is None else parm.evalAtFrame(frame)))
+            except (AttributeError, TypeError, ValueError):
+                values.append(NAN)
+
+    result = pack(values, [len(paths), len(names)], use_shm=bool(args.get('shm')))
+    result.update(nodes=paths, parms=names)
+    return result
+
+
+def read_points(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Read a point attribute of a SOP geometry in one call.
+
+    Args:
+        node: SOP node path.
+        attrib: Point attribute name. Defaults to P.
+        shm: Return the values in shared memory.
+
+    The reply is a float32 (or int32) array of shape (points, attribute size).
+
+    """
+    import hou
+
+    node = hou.node(str(args['node']))
+    if node is None:
+        raise ValueError(f'Node not found: {args["node"]}')
+
+    geometry = node.geometry()
+    name = str(args.get('attrib') or 'P')
+    attrib = geometry.findPointAttrib(name)
+    if attrib is None:
+        raise ValueError(f'Point attribute not found: {name}')
+
+    # Houdini returns the values already packed
+    if attrib.dataType() == hou.attribData.Int:
+        values = array.array('i', geometry.pointIntAttribValuesAsString(name))
+    else:
+        values = array.array('f', geometry.pointFloatAttribValuesAsString(name))
+
+    size = attrib.size()
+    return pack(values, [len(values) // size, size], use_shm=bool(args.get('shm')))
+
+
+@contextlib.contextmanager
+def batch_context(mode: str) -> Iterator[None]:
+    """Run the block as one undo step (or without undo) with cooking on manual.
+
+    The undo and update mode are restored even if the block raises.
+
+    """
+    import hou
+
+    undo = hou.undos.disabler() if mode == 'no_undo' else hou.undos.group('NukeServerSocket')
+    update_mode = hou.updateModeSetting()
+    hou.setUpdateMode(hou.updateMode.Manual)
+    try:
+        with undo:
+            yield
+    finally:
+        hou.setUpdateMode(update_mode)
 
 
 class HoudiniController(BaseController):
     def execute(self, data: ReceivedData) -> str:
-        return exec_code(data.text, data.file)
+        return exec_code(data.text, data.file, data.code)
+
+    def commands(self) -> Dict[str, ControllerCommand]:
+        return {'parms': read_parms, 'points': read_points}
+
+    def batch(self, mode: str) -> ContextManager[None]:
+        return batch_context(mode)
 
 
 class HoudiniEditor(NukeServerSocket):
@@ -3,15 +3,19 @@
 
 import os
 import json
+import array
 import logging
-from typing import Optional
+import contextlib
+from typing import Any, Dict, List, Iterator, Optional, ContextManager
 from textwrap import dedent
 
 from PySide2.QtWidgets import (QWidget, QSplitter, QTextEdit, QPushButton,
                                QApplication, QPlainTextEdit)
 
-from .base import EditorController
+from .base import EditorController, ControllerCommand
+from ..bulk import NAN, pack
 from ..main import NukeServerSocket
+from ..blink import kernel_name, push_kernels
 from ..utils import cache
 from ..received_data import ReceivedData
 
@@ -63,6 +67,133 @@ def get_run_button(self) -> QPushButton:
         return btn
 
 
+def _knob_value(knob: Any, index: int, frame: Optional[float]) -> float:
+    if knob is None:
+        return NAN
+    try:
+        if frame is None:
+            return float(knob.getValue(index))
+        return float(knob.getValueAt(frame, index))
+    except (AttributeError, TypeError, ValueError, IndexError):
+        pass
+    try:
+        return float(knob.value())
+    except (AttributeError, TypeError, ValueError):
+        return NAN
+
+
+def read_knobs(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Read numeric knob values of many nodes in one call.
+
+    Args:
+        nodes: Node names. Defaults to all the nodes of the root.
+        knobs: Knob names.
+        index: Component of array knobs (e.g. 1 for the y of an XY knob). Defaults to 0.
+        frame: Read the values at this frame. Defaults to the current frame.
+        shm: Return the values in shared memory.
+
+    The reply is a float64 array of shape (nodes, knobs). Missing or non
+    numeric knobs are NaN.
+
+    """
+    import nuke
+
+    names = [str(n) for n in args.get('nodes') or [n.fullName() for n in nuke.allNodes()]]
+    knob_names = [str(k) for k in args['knobs']]
+    index = int(args.get('index', 0))
+    frame = float(args['frame']) if args.get('frame') is not None else None
+
+    values = array.array('d')
+    for name in names:
+        node = nuke.toNode(name)
+        for knob_name in knob_names:
+            values.append(_knob_value(node.knob(knob_name) if node else None, index, frame))
+
+    result = pack(values, [len(names), len(knob_names)], use_shm=bool(args.get('shm')))
+    result.update(nodes=names, knobs=knob_names)
+    return result
+
+
+def sample_pixels(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Sample a region of the image of a node in one call.
+
+    Args:
+        node: Node name.
+        channels: Channel names. Defaults to rgba.
+        x, y: Bottom left corner of the region. Defaults to 0.
+        width, height: Size of the region. Defaults to the node format.
+        frame: Sample at this frame. Defaults to the current frame.
+        shm: Return the pixels in shared memory.
+
+    The reply is a float32 array of shape (height, width, channels), rows
+    going from bottom to top as in Nuke.
+
+    """
+    import nuke
+
+    node = nuke.toNode(str(args['node']))
+    if node is None:
+        raise ValueError(f'Node not found: {args["node"]}')
+
+    channels = [str(c) for c in args.get('channels') or
+                ('rgba.red', 'rgba.green', 'rgba.blue', 'rgba.alpha')]
+    x0, y0 = int(args.get('x', 0)), int(args.get('y', 0))
+    width = int(args.get('width') or node.width())
+    height = int(args.get('height') or node.height())
+    extra = (1.0, 1.0, float(args['frame'])) if args.get('frame') is not None else ()
+
+    # Nuke has no bulk read: keep the per pixel loop tight and avoid any text
+    sample = node.sample
+    values = array.array('f')
+    append = values.append
+    for y in range(y0, y0 + height):
+        for x in range(x0, x0 + width):
+            for channel in channels:
+                append(sample(channel, x + 0.5, y + 0.5, *extra))
+
+    return pack(values, [height, width, len(channels)], use_shm=bool(args.get('shm')))
+
+
+def _node_graphs() -> List[QWidget]:
+    return [w for w in QApplication.allWidgets() if w.objectName().startswith('DAG')]
+
+
+@contextlib.contextmanager
+def batch_context(mode: str) -> Iterator[None]:
+    """Run the block as one undo step (or without undo) and without repainting the node graphs.
+
+    The undo and repaint states are restored even if the block, or the setup
+    itself, raises. Undo stays disabled if it already was.
+
+    """
+    import nuke
+
+    graphs: List[QWidget] = []
+    disabled = grouped = False
+    try:
+        for widget in _node_graphs():
+            if widget.updatesEnabled():
+                widget.setUpdatesEnabled(False)
+                graphs.append(widget)
+
+        if mode == 'no_undo':
+            if not nuke.Undo.disabled():
+                nuke.Undo.disable()
+                disabled = True
+        else:
+            nuke.Undo.begin('NukeServerSocket')
+            grouped = True
+
+        yield
+    finally:
+        if disabled:
+            nuke.Undo.enable()
+        if grouped:
+            nuke.Undo.end()
+        for widget in graphs:
+            widget.setUpdatesEnabled(True)
+
+
 class NukeController(EditorController):
     def __init__(self, editor: NukeScriptEditor):
         self.editor = editor
@@ -70,6 +201,12 @@ def __init__(self, editor: NukeScriptEditor):
     def execute_code(self):
         self.editor.run_button.click()
 
+    def commands(self) -> Dict[str, ControllerCommand]:
+        return {'knobs': read_knobs, 'sample': sample_pixels, 'blink': push_kernels}
+
+    def batch(self, mode: str) -> ContextManager[None]:
+        return batch_context(mode)
+
     @property
     def input_editor(self) -> QPlainTextEdit:
         return self.editor.input_editor
@@ -85,14 +222,11 @@ def get_output(self) -> str:
 
     def _blink_wrapper(self, data: ReceivedData) -> str:
         return dedent("""
-            node = nuke.toNode("{filename}") or nuke.createNode('BlinkScript', 'name {filename}')
-            knobs = node.knobs()
-            knobs['kernelSourceFile'].setValue('{file}')
-            knobs['kernelSource'].setText({text})
-            knobs['recompile'].execute()
+            from nukeserversocket.blink import push_kernel
+            print(push_kernel({name}, {text}, {file}))
             """).format(
-            filename=os.path.splitext(os.path.basename(data.file))[0],
-            file=data.file,
+            name=json.dumps(kernel_name(data.file)),
+            file=json.dumps(data.file),
             text=json.dumps(data.text)
         ).strip()
 
@@ -0,0 +1,191 @@
+"""Delta transfer of scripts that are sent again after small edits.
+
+The server remembers the last source received for each (session, file) pair
+of the requests with a `session` key. The next request for the same file can
+send only a line diff against it instead of the full text:
+
+    {"session": "<id>", "file": "tool.py", "delta": {
+        "base": "<sha1 of the previous text>",
+        "ops": [1200, -1, ["x = 2\\n"], 799],
+        "hash": "<sha1 of the new text (optional)>"
+    }}
+
+Each op is a number of lines to copy from the base (positive), a number of
+lines to skip (negative), or a list of lines to insert. When the server does
+not have the base (e.g. it was restarted) or its hash differs, the request
+fails with `DeltaMismatch` and the client sends the full text again.
+`NssClient.execute_delta` does it automatically.
+
+Replies can be sent as deltas too: a request with `if_none_match` (sha1 of
+the output the client already has) and `delta_reply` receives the ops that
+turn that output into the new one, see `OutputCache`.
+
+This module has no Qt dependency.
+
+"""
+from __future__ import annotations
+
+import json
+import difflib
+import hashlib
+from typing import Any, Dict, List, Tuple, Union, Optional
+from collections import OrderedDict
+
+from .utils import cache
+from .metrics import get_metrics
+
+DeltaOp = Union[int, List[str]]
+
+
+class DeltaMismatch(Exception):
+    """The base of the delta is not the source remembered by the server."""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def make_delta(base: str, text: str) -> List[DeltaOp]:
+    """Return the ops that turn `base` into `text`."""
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+
+    ops: List[DeltaOp] = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(lines[j1:j2])
+    return ops
+
+
+def apply_delta(base: str, ops: List[Any]) -> str:
+    """Return the text obtained by applying the ops to `base`.
+
+    Raises:
+        ValueError: if the ops are malformed or do not fit the base.
+
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines: List[str] = []
+    position = 0
+    for op in ops:
+        if isinstance(op, list):
+            lines.extend(str(line) for line in op)
+        elif isinstance(op, int) and not isinstance(op, bool):
+            end = position + abs(op)
+            if end > len(base_lines):
+                raise ValueError('The delta does not fit the base text.')
+            if op > 0:
+                lines.extend(base_lines[position:end])
+            position = end
+        else:
+            raise ValueError(f'Invalid delta op: {op!r}')
+
+    if position != len(base_lines):
+        raise ValueError('The delta does not fit the base text.')
+
+    return ''.join(lines)
+
+
+class DeltaStore:
+    """Last source received per (session, file), least recently used first out."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._sources: OrderedDict[Tuple[str, str], Tuple[str, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def clear(self) -> None:
+        self._sources.clear()
+
+    def remember(self, session: str, file: str, text: str) -> None:
+        key = (session, file)
+        self._sources[key] = (text_hash(text), text)
+        self._sources.move_to_end(key)
+        while len(self._sources) > self.max_entries:
+            self._sources.popitem(last=False)
+
+    def apply(self, session: str, file: str, delta: Dict[str, Any]) -> str:
+        """Rebuild the full text of a delta request and remember it.
+
+        Raises:
+            DeltaMismatch: if the base or the rebuilt text do not match the hashes.
+            ValueError: if the delta is malformed.
+
+        """
+        digest, base = self._sources.get((session, file), ('', ''))
+        if not digest or digest != delta.get('base'):
+            get_metrics().increment('delta_mismatches')
+            raise DeltaMismatch(f'No matching base for {file}: send the full text.')
+
+        ops = delta.get('ops')
+        if not isinstance(ops, list):
+            raise ValueError('The delta has no ops.')
+
+        text = apply_delta(base, ops)
+        if delta.get('hash') and delta['hash'] != text_hash(text):
+            get_metrics().increment('delta_mismatches')
+            raise DeltaMismatch(
+                f'The rebuilt {file} does not match its hash: send the full text.'
+            )
+
+        get_metrics().increment('delta_requests')
+        self.remember(session, file, text)
+        return text
+
+
+class OutputCache:
+    """Recent outputs by hash, the bases of the delta replies.
+
+    Bounded by the total size of the outputs, least recently used first out.
+
+    """
+
+    def __init__(self, max_size: int = 32 * 1024 * 1024):
+        self.max_size = max_size
+        self._outputs: OrderedDict[str, str] = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    def clear(self) -> None:
+        self._outputs.clear()
+        self._size = 0
+
+    def add(self, digest: str, output: str) -> None:
+        if len(output) > self.max_size:
+            return
+        if digest not in self._outputs:
+            self._outputs[digest] = output
+            self._size += len(output)
+        self._outputs.move_to_end(digest)
+        while self._size > self.max_size:
+            self._size -= len(self._outputs.popitem(last=False)[1])
+
+    def delta(self, digest: str, output: str) -> Optional[List[DeltaOp]]:
+        """Return the ops from the output with `digest` to `output`, if smaller than it."""
+        base = self._outputs.get(digest)
+        if base is None:
+            return None
+        self._outputs.move_to_end(digest)
+
+        ops = make_delta(base, output)
+        return ops if len(json.dumps(ops)) < len(output) else None
+
+
+@cache('delta')
+def get_delta_store() -> DeltaStore:
+    return DeltaStore()
+
+
+@cache('delta')
+def get_output_cache() -> OutputCache:
+    return OutputCache()
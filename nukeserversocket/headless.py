@@ -0,0 +1,120 @@
+"""Headless server for NukeServerSocket.
+
+Runs the server without any widget, using a `QCoreApplication` event loop and
+executing the code directly with `exec`. Meant for machines where Nuke or
+Houdini run without a GUI (`nuke -t`, `hython`) or for a plain Python
+interpreter:
+
+    python -m nukeserversocket.headless --port 54321
+
+Inside `nuke -t` or `hython`, call `main()` from a startup script:
+
+    from nukeserversocket.headless import main
+    main(['--port', '54321'])
+
+"""
+from __future__ import annotations
+
+import sys
+import signal
+import argparse
+from typing import List, Optional
+
+from PySide2.QtCore import QTimer, QCoreApplication
+
+from .utils import exec_code
+from .logger import get_logger, log_to_stderr
+from .server import TRANSPORTS, NssServer
+from .settings import get_settings
+from .received_data import ReceivedData
+from .controllers.base import BaseController
+
+LOGGER = get_logger()
+
+
+class HeadlessController(BaseController):
+    """Controller that executes the code directly, without a Script Editor."""
+
+    def execute(self, data: ReceivedData) -> str:
+        return exec_code(data.text, data.file or '<nss_headless>', data.code)
+
+
+def start_server(
+    port: Optional[int] = None,
+    transport: Optional[str] = None,
+    controller: Optional[BaseController] = None
+) -> NssServer:
+    """Create a server and start listening.
+
+    Port and transport default to the values in the settings file.
+
+    Raises:
+        RuntimeError: If the server could not start listening.
+
+    """
+    settings = get_settings()
+
+    controller = controller or HeadlessController()
+    controller.settings = settings
+
+    port = port or settings.get('port')
+    transport = transport or settings.get('transport')
+
+    server = NssServer(controller)
+    if not server.try_connect(port, transport):
+        raise RuntimeError(f'Failed to establish connection. {server.errorString()}.')
+
+    LOGGER.info('Listening on %s (%s)...', port, transport)
+    return server
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='nukeserversocket-headless',
+        description='Run the NukeServerSocket server without a GUI.'
+    )
+    parser.add_argument('--port', type=int, help='Port to listen on. Defaults to the settings.')
+    parser.add_argument(
+        '--transport', choices=TRANSPORTS, help='Transport to use. Defaults to the settings.'
+    )
+    parser.add_argument(
+        '--timeout', type=float, default=0,
+        help='Quit after this many minutes without requests. Defaults to 0 (never).'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function for the headless NukeServerSocket server."""
+    args = _parse_args(argv)
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    log_to_stderr()
+
+    try:
+        server = start_server(args.port, args.transport)
+    except RuntimeError as e:
+        LOGGER.error(str(e))
+        return 1
+
+    if args.timeout:
+        timeout = int(args.timeout * 60000)
+
+        timer = QTimer(server)
+        timer.setSingleShot(True)
+        timer.timeout.connect(app.quit)
+        timer.timeout.connect(lambda: LOGGER.info('Server Timeout.'))
+        server.on_data_received.connect(lambda: timer.start(timeout))
+        timer.start(timeout)
+
+    # let Ctrl+C stop the event loop
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    code = app.exec_()
+    server.close()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
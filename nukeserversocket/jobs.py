@@ -0,0 +1,166 @@
+"""Asynchronous jobs: requests whose result is collected later.
+
+A long request does not need to hold its connection open: `submit` queues
+it and replies right away with the job id, then the client can disconnect
+and collect the result later, from any connection.
+
+    {"command": "submit", "args": {"request": {"text": "...", "priority": "bulk"}}}
+    -> {"job": "<id>", "status": "pending"}
+
+    {"command": "status", "args": {"job": "<id>"}}
+    {"command": "result", "args": {"jobs": ["<id>", ...]}}
+    {"command": "wait", "args": {"jobs": ["<id>", ...], "timeout": 30}}
+
+`status` replies without the output, `result` with it (for finished jobs),
+and `wait` like `result` once all the jobs finished or the timeout expired.
+With `jobs` the reply is `{"jobs": [...]}`, with `job` the single job.
+
+The job id is the id of the submitted request, so `cancel` works on jobs
+too. Finished jobs are kept for `job_ttl` seconds; at most `max_jobs` jobs
+are stored, the oldest finished ones being dropped first; outputs larger
+than `max_job_result_size` bytes are replaced by a `ResultTooLarge` error.
+
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Iterable, Optional
+from collections import OrderedDict
+from dataclasses import field, dataclass
+
+from .protocol import Response
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+UNKNOWN = 'unknown'
+
+
+class JobLimitExceeded(Exception):
+    """Too many jobs are pending."""
+
+
+@dataclass
+class Job:
+    id: str
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    response: Optional[Response] = None
+
+    @property
+    def status(self) -> str:
+        if not self.response:
+            return PENDING
+        return DONE if self.response.ok else FAILED
+
+    def to_dict(self, output: bool = False) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            'job': self.id,
+            'status': self.status,
+            'created': self.created,
+            'finished': self.finished,
+        }
+        if output and self.response:
+            result.update(
+                output=self.response.output,
+                error=self.response.error,
+                elapsed=self.response.elapsed,
+                data=self.response.data,
+            )
+        return result
+
+
+class JobStore:
+    def __init__(self, ttl: float = 3600, max_jobs: int = 1000, max_result_size: int = 0):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_result_size = max_result_size
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def configure(self, ttl: float, max_jobs: int, max_result_size: int) -> None:
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_result_size = max_result_size
+
+    def purge(self) -> None:
+        """Drop the finished jobs older than the ttl."""
+        if not self.ttl:
+            return
+        expired = time.time() - self.ttl
+        for job in list(self._jobs.values()):
+            if job.finished is not None and job.finished < expired:
+                del self._jobs[job.id]
+
+    def create(self, job_id: str) -> Job:
+        """Store a new pending job.
+
+        Raises:
+            JobLimitExceeded: if `max_jobs` jobs are pending.
+
+        """
+        self.purge()
+        if job_id in self._jobs:
+            raise ValueError(f'A job with id {job_id} already exists.')
+
+        if self.max_jobs and len(self._jobs) >= self.max_jobs:
+            finished = [job for job in self._jobs.values() if job.finished is not None]
+            if not finished:
+                raise JobLimitExceeded(f'{len(self._jobs)} jobs are pending.')
+            # the oldest finished job makes room
+            del self._jobs[min(finished, key=lambda job: job.finished or 0).id]
+
+        job = Job(job_id)
+        self._jobs[job_id] = job
+        return job
+
+    def finish(self, job_id: str, response: Response) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+
+        size = len(response.output) + len(response.error or '')
+        if self.max_result_size and size > self.max_result_size:
+            response = Response(
+                response.id,
+                error=f'ResultTooLarge: {size} bytes, the limit is {self.max_result_size}.',
+                elapsed=response.elapsed,
+            )
+
+        job.response = response
+        job.finished = time.time()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.purge()
+        return self._jobs.get(job_id)
+
+    def done(self, job_ids: Iterable[str]) -> bool:
+        """Return True if none of the jobs is pending."""
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            if job and job.status == PENDING:
+                return False
+        return True
+
+    def report(self, job_ids: List[str], output: bool) -> List[Dict[str, Any]]:
+        self.purge()
+        reports = []
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            reports.append(job.to_dict(output) if job else {'job': job_id, 'status': UNKNOWN})
+        return reports
+
+
+def job_ids(args: Dict[str, Any]) -> List[str]:
+    """Return the ids of the `job` or `jobs` command arg."""
+    if 'jobs' in args:
+        return [str(job_id) for job_id in args['jobs'] or []]
+    return [str(args.get('job', ''))]
+
+
+def job_reply(args: Dict[str, Any], reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the reply of a `status`/`result`/`wait` command."""
+    return {'jobs': reports} if 'jobs' in args else reports[0]
@@ -0,0 +1,73 @@
+"""Limits protecting the host application from misbehaving clients."""
+from __future__ import annotations
+
+import time
+from typing import Dict, Callable
+
+Clock = Callable[[], float]
+
+# Buckets of clients that are not sending requests are dropped when there
+# are more than this number of them.
+MAX_IDLE_BUCKETS = 1024
+
+
+class TokenBucket:
+    """A token bucket refilled at `rate` tokens per second, up to `burst` tokens."""
+
+    def __init__(self, rate: float, burst: float, clock: Clock = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    @property
+    def tokens(self) -> float:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self._tokens
+
+    def consume(self, tokens: float = 1) -> bool:
+        """Take tokens from the bucket. Return False if there are not enough."""
+        if self.tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+
+class RateLimiter:
+    """Rate limit requests with a token bucket per client.
+
+    A rate of 0 disables the limit.
+
+    """
+
+    def __init__(self, rate: float = 0, burst: float = 1, clock: Clock = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def configure(self, rate: float, burst: float) -> None:
+        if (rate, burst) != (self.rate, self.burst):
+            self.rate = rate
+            self.burst = burst
+            self._buckets.clear()
+
+    def allow(self, client: str) -> bool:
+        if self.rate <= 0:
+            return True
+
+        if client not in self._buckets:
+            if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                self._drop_idle_buckets()
+            self._buckets[client] = TokenBucket(self.rate, max(self.burst, 1), self._clock)
+
+        return self._buckets[client].consume()
+
+    def _drop_idle_buckets(self) -> None:
+        # a full bucket is indistinguishable from a new one
+        for client, bucket in list(self._buckets.items()):
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[client]
@@ -32,10 +32,12 @@ def emit(self, record: logging.LogRecord) -> None:
 
 def _file_handler() -> TimedRotatingFileHandler:
 
+    # delay: the file is opened on the first record instead of at import time
     handler = TimedRotatingFileHandler(
         filename=PACKAGE_LOG,
         when='midnight',
-        backupCount=7
+        backupCount=7,
+        delay=True
     )
     handler.setLevel(logging.DEBUG)
     handler.set_name('file')
@@ -67,3 +69,13 @@ def console(self, handler: logging.Handler) -> None:
 @cache('logger')
 def get_logger() -> NssLogger:
     return NssLogger()
+
+
+def log_to_stderr() -> None:
+    """Use stderr as the console of the logger, for the command line tools."""
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(
+        logging.Formatter('[%(asctime)s] %(levelname)-8s - %(message)s', '%H:%M:%S')
+    )
+    get_logger().console = handler
@@ -2,22 +2,24 @@
 from __future__ import annotations
 
 import socket
+import threading
 from typing import TYPE_CHECKING, Optional
 
-from PySide2.QtCore import Qt, Slot, QTimer
+from PySide2.QtCore import Qt, Slot, QTimer, Signal, QObject
 from PySide2.QtWidgets import (QLabel, QWidget, QSpinBox, QFormLayout,
                                QMainWindow, QPushButton, QVBoxLayout)
 
+from .utils import Stopwatch
 from .logger import ConsoleHandler, get_logger
 from .server import NssServer
 from .console import NssConsole
 from .toolbar import ToolBar
 from .version import __version__
 from .settings import get_settings
-from .settings_ui import NssSettingsUI
 
 if TYPE_CHECKING:
     from .settings import _NssSettings
+    from .settings_ui import NssSettingsUI
     from .controllers.base import BaseController
 
 LOGGER = get_logger()
@@ -45,10 +47,23 @@ def get_port(self):
     def set_port(self, port: int):
         return self._settings.set('port', port)
 
+    def get_transport(self):
+        return self._settings.get('transport')
+
     def get_server_timeout(self):
         return self._settings.get('server_timeout')
 
 
+class _IpLookup(QObject):
+    """Look up the machine IP in a background thread."""
+    found = Signal(str)
+
+    def start(self, model: MainModel) -> None:
+        threading.Thread(
+            target=lambda: self.found.emit(model.get_ip()), name='nss-ip-lookup', daemon=True
+        ).start()
+
+
 class MainView(QWidget):
     def __init__(self, parent: Optional[QWidget] = None):
         """Init method for MainWindowWidget."""
@@ -101,7 +116,12 @@ def __init__(self, view: MainView, model: MainModel, server: NssServer):
         self._server = server
         self._server.on_data_received.connect(self._on_data_received)
 
-        self._view.ip_label.setText(self._model.get_ip())
+        # the IP lookup can be slow on some networks, don't block the startup for it
+        self._view.ip_label.setText('...')
+        self._ip_lookup = _IpLookup()
+        self._ip_lookup.found.connect(self._view.ip_label.setText)
+        self._ip_lookup.start(self._model)
+
         self._view.port_input.setValue(self._model.get_port())
         self._view.port_input.valueChanged.connect(self._on_port_change)
         self._view.connect_btn.clicked.connect(self._on_connect)
@@ -127,8 +147,9 @@ def _on_port_change(self):
     def _on_connect(self, should_connect: bool):
         port = self._view.port_input.value()
         if should_connect and not self._server.isListening():
-            if self._server.try_connect(port):
-                LOGGER.info('Listening on %s...', port)
+            transport = self._model.get_transport()
+            if self._server.try_connect(port, transport):
+                LOGGER.info('Listening on %s (%s)...', port, transport)
 
                 self._timer.start(self._model.get_server_timeout())
                 self._view.port_input.setEnabled(False)
@@ -157,23 +178,42 @@ def __init__(self, editor: BaseController, parent: Optional[QWidget] = None):
 
         # NOTE: Most variables are bound to the class only to avoid garbage collection.
 
-        self.settings = get_settings()
+        stopwatch = Stopwatch()
 
-        self.editor = editor
-        self.editor.settings = self.settings
+        with stopwatch.measure('settings'):
+            self.settings = get_settings()
 
-        self.view = MainView()
-        self.model = MainModel(self.settings)
-        self.controller = MainController(self.view, self.model, NssServer(editor))
+            self.editor = editor
+            self.editor.settings = self.settings
+
+        with stopwatch.measure('view'):
+            self.view = MainView()
+
+        with stopwatch.measure('controller'):
+            self.model = MainModel(self.settings)
+            self.controller = MainController(self.view, self.model, NssServer(editor))
 
         # I don't like this but anywheres else I put it, it creates problems with
         # the tests.
         LOGGER.console = ConsoleHandler(self.view.console)
 
-        self.settings_ui = NssSettingsUI(self.settings)
+        # the settings dialog is built the first time it is opened
+        self._settings_ui: Optional[NssSettingsUI] = None
+
+        with stopwatch.measure('toolbar'):
+            self.toolbar = ToolBar(self.view)
+            self.toolbar.add_widget(title='Settings', widget=lambda: self.settings_ui.view)
+
+            self.addToolBar(self.toolbar)
+            self.setCentralWidget(self.view)
 
-        self.toolbar = ToolBar(self.view)
-        self.toolbar.add_widget(title='Settings', widget=self.settings_ui.view)
+        LOGGER.info(
+            'NukeServerSocket loaded in %.1f ms (%s).', stopwatch.total * 1000, stopwatch.summary()
+        )
 
-        self.addToolBar(self.toolbar)
-        self.setCentralWidget(self.view)
+    @property
+    def settings_ui(self) -> NssSettingsUI:
+        if self._settings_ui is None:
+            from .settings_ui import NssSettingsUI
+            self._settings_ui = NssSettingsUI(self.settings)
+        return self._settings_ui
@@ -0,0 +1,50 @@
+"""Runtime counters for the server.
+
+The counters are kept in memory only and are meant for logging and debugging
+performance issues (e.g. how much data was written back to clients).
+
+"""
+from __future__ import annotations
+
+import threading
+from pprint import pformat
+from typing import Dict, Union
+
+from .utils import cache
+
+Number = Union[int, float]
+
+
+class NssMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.data: Dict[str, Number] = {}
+
+    def __str__(self) -> str:
+        return pformat(self.snapshot())
+
+    def increment(self, key: str, value: Number = 1) -> None:
+        with self._lock:
+            self.data[key] = self.data.get(key, 0) + value
+
+    def get(self, key: str, default: Number = 0) -> Number:
+        with self._lock:
+            return self.data.get(key, default)
+
+    def snapshot(self) -> Dict[str, Number]:
+        with self._lock:
+            return dict(self.data)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.data.clear()
+
+
+@cache('metrics')
+def get_metrics() -> NssMetrics:
+    """A singleton instance of the metrics.
+
+    Always use this function to get the metrics.
+
+    """
+    return NssMetrics()
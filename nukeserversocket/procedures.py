@@ -0,0 +1,107 @@
+"""Stored procedures: named scripts compiled once and invoked with json args.
+
+A parametrized tool would otherwise resend the same code with different
+literals baked in. Instead, register the script once:
+
+    {"command": "register", "args": {"name": "rename", "text": "..."}}
+
+and invoke it with only its name and arguments:
+
+    {"command": "invoke", "args": {"name": "rename", "args": {"node": "Blur1"}}}
+
+The script reads its arguments from the `args` dict and can set `result` to
+any json value. Each invocation runs in a fresh namespace, so no state leaks
+between calls. The reply holds the printed output and the result:
+
+    {"name": "rename", "output": "...", "result": ...}
+
+Procedures live in memory until the server process exits.
+
+"""
+from __future__ import annotations
+
+import time
+import hashlib
+import builtins
+from types import CodeType
+from typing import Any, Dict, List, Optional
+from dataclasses import field, dataclass
+
+from .utils import cache
+from .utils.exec_code import stdoutIO
+
+
+@dataclass
+class Procedure:
+    name: str
+    code: CodeType
+    digest: str
+    registered_at: float = field(default_factory=time.time)
+    calls: int = 0
+
+
+class ProcedureRegistry:
+    def __init__(self):
+        self._procedures: Dict[str, Procedure] = {}
+
+    def __len__(self) -> int:
+        return len(self._procedures)
+
+    def clear(self) -> None:
+        self._procedures.clear()
+
+    def names(self) -> List[str]:
+        return sorted(self._procedures)
+
+    def get(self, name: str) -> Optional[Procedure]:
+        return self._procedures.get(name)
+
+    def register(self, name: str, text: str) -> Procedure:
+        """Compile the script and store it under `name`, replacing any previous one.
+
+        Raises:
+            SyntaxError: if the script does not compile.
+
+        """
+        if not name:
+            raise ValueError('A procedure needs a name.')
+
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        procedure = self._procedures.get(name)
+        if procedure and procedure.digest == digest:
+            return procedure
+
+        procedure = Procedure(name, compile(text, f'<procedure {name}>', 'exec'), digest)
+        self._procedures[name] = procedure
+        return procedure
+
+    def unregister(self, name: str) -> bool:
+        return self._procedures.pop(name, None) is not None
+
+    def invoke(self, name: str, args: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the procedure with the arguments and return its output and result.
+
+        Exceptions raised by the procedure propagate to the caller.
+
+        """
+        procedure = self._procedures.get(name)
+        if not procedure:
+            raise ValueError(f'Unknown procedure: {name}')
+
+        namespace: Dict[str, Any] = {
+            '__builtins__': builtins,
+            '__name__': '__main__',
+            'args': dict(args or {}),
+            'result': None,
+        }
+
+        procedure.calls += 1
+        with stdoutIO() as s:
+            exec(procedure.code, namespace)
+
+        return {'name': name, 'output': s.getvalue(), 'result': namespace['result']}
+
+
+@cache('procedures')
+def get_procedures() -> ProcedureRegistry:
+    return ProcedureRegistry()
@@ -0,0 +1,189 @@
+"""Framed wire protocol shared by the server, the client and the tools.
+
+Legacy clients send a single json request and read the raw output until the
+server closes the socket. A client opts in to the framed protocol by starting
+the connection with a frame:
+
+    <magic: b'NSS1'> <flags: uint8> <body length: uint32 big-endian> <body>
+
+The body of a request frame is the same json object a legacy client sends, and
+the body of a reply frame is a json `Response`. A framed connection stays open
+after the reply, so a client can reuse it and pipeline several requests:
+replies carry the id of their request and can arrive out of order (e.g. an
+interactive request served before a queued bulk one).
+
+Bodies are optionally zlib compressed (`FLAG_COMPRESSED`). The server
+compresses large replies only when the request frame has `FLAG_ACCEPT_COMPRESSED`.
+
+This module has no Qt dependency so that it can be used by clients outside of
+the host application.
+
+"""
+from __future__ import annotations
+
+import json
+import zlib
+import struct
+from typing import Any, Dict, List, Tuple, Optional
+from dataclasses import asdict, dataclass
+
+MAGIC = b'NSS1'
+
+HEADER = struct.Struct('>4sBI')
+
+FLAG_COMPRESSED = 0x01
+FLAG_ACCEPT_COMPRESSED = 0x02
+
+# Bodies smaller than this are not worth compressing.
+COMPRESS_THRESHOLD = 1024
+
+Frame = Tuple[int, bytes]
+
+
+class ProtocolError(Exception):
+    """The peer sent data that is not a valid frame."""
+
+
+class FrameTooLarge(ProtocolError):
+    """The body of a frame exceeds the maximum size."""
+
+
+@dataclass
+class Response:
+    """Structured reply of a framed request.
+
+    Attributes:
+        id: The id of the request.
+        output: The output of the code, or the json reply of a command.
+        error: `<ErrorName>: <message>` when the request did not run to
+            completion (e.g. `ExecutionTimeout`, `RateLimitExceeded`).
+        elapsed: Seconds between receiving the request and replying.
+        data: Handle of the shared-memory reply data, if any (see
+            `nukeserversocket.shm`).
+        unchanged: The output is the same as the one whose hash was sent in
+            `if_none_match`, and is not repeated.
+        delta: Line ops turning the output whose hash was sent in
+            `if_none_match` into the new output, sent in place of the output
+            (see `nukeserversocket.delta`).
+
+    """
+    id: str
+    output: str = ''
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    data: Optional[Dict[str, Any]] = None
+    unchanged: bool = False
+    delta: Optional[List[Any]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def legacy_text(self) -> str:
+        """Return the reply of a legacy client: the output, or the error if any."""
+        return self.output if self.error is None else f'{self.error}\n'
+
+    def json(self) -> Any:
+        """Decode the output of a built-in command."""
+        return json.loads(self.output)
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(asdict(self)).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> Response:
+        try:
+            data: Dict[str, Any] = json.loads(body)
+            return cls(
+                id=str(data['id']),
+                output=data.get('output') or '',
+                error=data.get('error'),
+                elapsed=float(data.get('elapsed') or 0.0),
+                data=data.get('data'),
+                unchanged=bool(data.get('unchanged')),
+                delta=data.get('delta'),
+            )
+        except (ValueError, TypeError, KeyError) as e:
+            raise ProtocolError(f'Invalid response: {e}') from e
+
+
+def encode_frame(body: bytes, flags: int = 0, compress: bool = False) -> bytes:
+    """Return the frame of the body, compressing it if asked and worth it."""
+    if compress and len(body) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(body, 1)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_COMPRESSED
+    return HEADER.pack(MAGIC, flags, len(body)) + body
+
+
+def is_framed(head: bytes) -> Optional[bool]:
+    """Tell whether a connection starting with `head` uses the framed protocol.
+
+    Return None when there are not enough bytes to decide yet.
+
+    """
+    if head[:len(MAGIC)] == MAGIC:
+        return True
+    if MAGIC.startswith(head):
+        return None
+    return False
+
+
+class FrameDecoder:
+    """Incrementally split a byte stream into frames.
+
+    Args:
+        max_size: Maximum body size, compressed and decompressed. 0 disables
+            the limit.
+
+    """
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[Frame]:
+        """Add the data to the buffer and return the frames it completes.
+
+        Raises:
+            ProtocolError: on a bad magic, a body over `max_size` or a body
+                that cannot be decompressed.
+
+        """
+        self._buffer += data
+        frames: List[Frame] = []
+
+        while len(self._buffer) >= HEADER.size:
+            magic, flags, size = HEADER.unpack_from(self._buffer)
+            if magic != MAGIC:
+                raise ProtocolError('Invalid frame header.')
+            if self.max_size and size > self.max_size:
+                raise FrameTooLarge(f'Frame exceeds {self.max_size} bytes.')
+
+            end = HEADER.size + size
+            if len(self._buffer) < end:
+                break
+
+            body = bytes(self._buffer[HEADER.size:end])
+            del self._buffer[:end]
+
+            if flags & FLAG_COMPRESSED:
+                body = self._decompress(body)
+            frames.append((flags, body))
+
+        return frames
+
+    def _decompress(self, body: bytes) -> bytes:
+        # bound the output so that a small compressed body cannot blow up memory
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(body, self.max_size + 1 if self.max_size else 0)
+        except zlib.error as e:
+            raise ProtocolError(f'Invalid compressed frame: {e}') from e
+        if self.max_size and (len(data) > self.max_size or decompressor.unconsumed_tail):
+            raise FrameTooLarge(f'Frame exceeds {self.max_size} bytes.')
+        return data
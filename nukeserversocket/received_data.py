@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import json
-from typing import Dict
+import uuid
+from types import CodeType
+from typing import Any, Dict, Optional
 from dataclasses import field, dataclass
 
 from .logger import get_logger
+from .scheduler import PRIORITIES, DEFAULT_PRIORITY
 
 LOGGER = get_logger()
 
+# `batch` modes: one undo step for the whole request, or no undo at all
+BATCH_MODES = ('group', 'no_undo')
+
 
 @dataclass
 class ReceivedData:
@@ -19,16 +25,51 @@ class ReceivedData:
         "text": "Text to run in the script editor",
         "file": "File name to show in the output (optional))"
         "formatText": "0" or "1" To format the text or not. Defaults to "1" (True) (optional)
+        "id": "Request id, used to cancel the request (optional)",
+        "timeout": Execution time limit in seconds. Defaults to the settings (optional),
+        "priority": "interactive", "normal" or "bulk". Defaults to "normal" (optional),
+        "command": "Name of a built-in server command to run instead of the text (optional)",
+        "args": {"Arguments": "of the command (optional)"},
+        "shm": {"name": "...", "size": 0} Handle of shared-memory data (optional),
+        "path": "Script read by the server instead of the text (optional)",
+        "mtime": Modification time of the script on the client (optional),
+        "hash": "sha1 of the script on the client (optional)",
+        "session": "Client session id, needed by delta requests (optional)",
+        "delta": {"base": "...", "ops": [...]} Diff against the previous text (optional),
+        "worker": true to run the code in a worker process (optional),
+        "coalesce": true to share the response of an identical request in flight (optional),
+        "if_none_match": "sha1 of the output the client has, not sent again (optional)",
+        "delta_reply": true to receive the output as a delta of that one (optional),
+        "batch": true, "group" or "no_undo" to run as one undo step without UI updates (optional)
     }
 
     """
 
     raw: str
 
-    data: Dict[str, str] = field(init=False)
+    data: Dict[str, Any] = field(init=False)
     file: str = field(init=False)
     text: str = field(init=False)
     format_text: bool = field(init=False)
+    id: str = field(init=False)
+    timeout: float = field(init=False)
+    priority: str = field(init=False)
+    command: str = field(init=False)
+    args: Dict[str, Any] = field(init=False)
+    shm: Optional[Dict[str, Any]] = field(init=False)
+    path: str = field(init=False)
+    mtime: Optional[float] = field(init=False)
+    digest: str = field(init=False)
+    session: str = field(init=False)
+    delta: Optional[Dict[str, Any]] = field(init=False)
+    worker: bool = field(init=False)
+    coalesce: bool = field(init=False)
+    if_none_match: str = field(init=False)
+    delta_reply: bool = field(init=False)
+    batch: str = field(init=False)
+
+    # compiled text, set by the server when the source is cached
+    code: Optional[CodeType] = field(init=False, default=None)
 
     def __post_init__(self):
 
@@ -42,11 +83,61 @@ def __post_init__(self):
 
         LOGGER.debug('Received data: %s', self.data)
 
+        self.command = self.data.get('command', '')
+        self.args = self.data.get('args') or {}
+
+        shm = self.data.get('shm')
+        self.shm = shm if isinstance(shm, dict) else None
+
+        self.path = str(self.data.get('path') or '')
+        self.digest = str(self.data.get('hash') or '')
+
+        try:
+            mtime = self.data.get('mtime')
+            self.mtime = None if mtime is None else float(mtime)
+        except (TypeError, ValueError):
+            LOGGER.error('mtime must be a number. Got "%s". Ignored.', self.data['mtime'])
+            self.mtime = None
+
+        self.session = str(self.data.get('session') or '')
+        delta = self.data.get('delta')
+        self.delta = delta if isinstance(delta, dict) else None
+
+        self.worker = bool(self.data.get('worker'))
+        self.coalesce = bool(self.data.get('coalesce'))
+        self.if_none_match = str(self.data.get('if_none_match') or '')
+        self.delta_reply = bool(self.data.get('delta_reply'))
+
+        batch = self.data.get('batch') or ''
+        self.batch = 'group' if batch is True else str(batch)
+        if self.batch and self.batch not in BATCH_MODES:
+            LOGGER.error(
+                'batch must be true or one of %s. Got "%s". Fallback to "group".',
+                BATCH_MODES, batch
+            )
+            self.batch = 'group'
+
         self.text = self.data.get('text', '')
-        if not self.text:
+        if not self.text and not self.command and not self.path and not self.delta:
             LOGGER.critical('Data has invalid text.')
 
-        self.file = self.data['file']
+        self.id = str(self.data.get('id') or uuid.uuid4().hex)
+
+        try:
+            self.timeout = max(float(self.data.get('timeout') or 0), 0)
+        except (TypeError, ValueError):
+            LOGGER.error('timeout must be a number. Got "%s". Fallback to 0.', self.data['timeout'])
+            self.timeout = 0
+
+        self.priority = self.data.get('priority') or DEFAULT_PRIORITY
+        if self.priority not in PRIORITIES:
+            LOGGER.error(
+                'priority must be one of %s. Got "%s". Fallback to "%s".',
+                PRIORITIES, self.priority, DEFAULT_PRIORITY
+            )
+            self.priority = DEFAULT_PRIORITY
+
+        self.file = self.data['file'] or self.path
 
         try:
             self.format_text = bool(int(self.data['formatText']))
@@ -0,0 +1,85 @@
+"""Record the incoming requests to an append-only file.
+
+Each record stores when the request was received, how long the server took to
+reply, the client address and the raw payload. The file can be replayed
+against a server with `nukeserversocket.replay`.
+
+File format: a magic header followed by records of
+
+    <received timestamp: float64> <latency: float64>
+    <client length: uint16> <payload length: uint32> <client> <payload>
+
+"""
+from __future__ import annotations
+
+import struct
+import pathlib
+import threading
+from typing import BinaryIO, Iterator, Optional
+from dataclasses import dataclass
+
+from .logger import PACKAGE_LOG
+
+MAGIC = b'NSSREC1\n'
+
+HEADER = struct.Struct('<ddHI')
+
+DEFAULT_RECORD_FILE = PACKAGE_LOG.parent / 'traffic.nssrec'
+
+
+@dataclass
+class Record:
+    timestamp: float
+    latency: float
+    client: str
+    payload: bytes
+
+
+class TrafficRecorder:
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open('ab')
+        if not self._file.tell():
+            self._file.write(MAGIC)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def record(self, timestamp: float, latency: float, client: str, payload: bytes) -> None:
+        client_bytes = client.encode('utf-8')[:0xFFFF]
+        with self._lock:
+            if not self._file:
+                self.open()
+            assert self._file
+            self._file.write(HEADER.pack(timestamp, latency, len(client_bytes), len(payload)))
+            self._file.write(client_bytes)
+            self._file.write(payload)
+            self._file.flush()
+
+
+def read_records(path: pathlib.Path) -> Iterator[Record]:
+    """Read the records of a file. A truncated last record is ignored."""
+    with path.open('rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'Not a traffic record file: {path}')
+
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+
+            timestamp, latency, client_size, payload_size = HEADER.unpack(header)
+            client = f.read(client_size)
+            payload = f.read(payload_size)
+            if len(payload) < payload_size:
+                return
+
+            yield Record(timestamp, latency, client.decode('utf-8'), payload)
@@ -0,0 +1,135 @@
+"""Replay recorded traffic against a server.
+
+Sends the requests of a traffic record file (see `nukeserversocket.recorder`)
+to a server with their original spacing, and compares the replayed latencies
+with the recorded ones:
+
+    python -m nukeserversocket.replay traffic.nssrec --port 54321 --speed 2
+
+A speed of 0 sends the requests as fast as possible.
+
+"""
+from __future__ import annotations
+
+import sys
+import time
+import socket
+import pathlib
+import argparse
+from typing import Dict, List, Iterable, Optional
+from dataclasses import field, dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from .recorder import Record, read_records
+from .utils.stats import percentile
+
+
+@dataclass
+class ReplayResult:
+    original: List[float] = field(default_factory=list)
+    replayed: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return the original and replayed latency statistics in milliseconds."""
+        summary: Dict[str, Dict[str, float]] = {}
+        for name, values in (('original', self.original), ('replayed', self.replayed)):
+            summary[name] = {
+                'mean_ms': sum(values) / len(values) * 1000 if values else 0.0,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+        return summary
+
+    def report(self) -> str:
+        summary = self.summary()
+        lines = [f'{"":<8} {"original":>12} {"replayed":>12} {"diff":>12}']
+        for key in summary['original']:
+            before, after = summary['original'][key], summary['replayed'][key]
+            lines.append(f'{key:<8} {before:>12.2f} {after:>12.2f} {after - before:>+12.2f}')
+        lines.append(f'requests: {len(self.replayed)}, errors: {self.errors}')
+        return '\n'.join(lines)
+
+
+def send_payload(host: str, port: int, payload: bytes, timeout: float = 60.0) -> float:
+    """Send a raw request, read the reply until the server closes and return the latency."""
+    start = time.perf_counter()
+    with socket.create_connection((host, port), timeout=timeout) as s:
+        s.sendall(payload)
+        while s.recv(65536):
+            pass
+    return time.perf_counter() - start
+
+
+def replay(
+    records: Iterable[Record],
+    host: str = '127.0.0.1',
+    port: int = 54321,
+    speed: float = 1.0,
+    workers: int = 8
+) -> ReplayResult:
+    """Replay the records and return their original and replayed latencies.
+
+    The requests are sent keeping their original spacing divided by `speed`,
+    or as fast as possible when `speed` is 0. Up to `workers` requests are in
+    flight at once. Records are written when their reply is sent, so they are
+    replayed sorted by receive time.
+
+    """
+    records = sorted(records, key=lambda record: record.timestamp)
+    result = ReplayResult()
+    if not records:
+        return result
+
+    first = records[0].timestamp
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = []
+        for record in records:
+            if speed > 0:
+                delay = (record.timestamp - first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append((record, executor.submit(send_payload, host, port, record.payload)))
+
+        for record, future in futures:
+            try:
+                latency = future.result()
+            except OSError:
+                result.errors += 1
+                continue
+            result.original.append(record.latency)
+            result.replayed.append(latency)
+
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='NukeServerSocket - Traffic replay')
+    parser.add_argument('file', type=pathlib.Path, help='Traffic record file.')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Host of the server. Default is 127.0.0.1.')
+    parser.add_argument('--port', type=int, default=54321,
+                        help='Port of the server. Default is 54321.')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Replay speed multiplier, 0 sends as fast as possible. Default is 1.')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Maximum number of requests in flight. Default is 8.')
+    args = parser.parse_args(argv)
+
+    try:
+        records = list(read_records(args.file))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    result = replay(records, args.host, args.port, args.speed, args.workers)
+    print(result.report())
+
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
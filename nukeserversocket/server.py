@@ -1,75 +1,767 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Union, Optional
+import json
+import time
+import hashlib
+import pathlib
+import contextlib
+from typing import TYPE_CHECKING, Any, Set, Dict, List, Iterator, Optional
+from dataclasses import field, replace, dataclass
+from concurrent.futures import Future
 
-from PySide2.QtCore import Slot, Signal
-from PySide2.QtNetwork import QTcpServer, QTcpSocket, QHostAddress
-from PySide2.QtWidgets import QWidget
+from PySide2.QtCore import Slot, QTimer, Signal, QObject
+from PySide2.QtNetwork import QTcpServer, QHostAddress, QLocalServer
 
+from .shm import SharedBuffer, RequestChannel, SharedMemoryError
+from .jobs import Job, JobStore, job_ids, job_reply
+from .delta import DeltaMismatch, text_hash, get_delta_store, get_output_cache
+from .cancel import CancelListener
+from .limits import RateLimiter
 from .logger import get_logger
+from .stalls import StallDetector
+from .metrics import get_metrics
+from .sources import SourceMismatch, get_source_cache
+from .workers import WorkerPool, WorkerError, default_executable
+from .commands import is_queued, run_command
+from .protocol import (MAGIC, FLAG_ACCEPT_COMPRESSED, Response, FrameTooLarge,
+                       ProtocolError, is_framed, encode_frame)
+from .recorder import DEFAULT_RECORD_FILE, TrafficRecorder
+from .scheduler import RequestScheduler
+from .connection import Socket, NssConnection
 from .received_data import ReceivedData
+from .utils.watchdog import (ExecutionWatchdog, ExecutionCancelled,
+                             ExecutionInterrupted, cancel_execution)
 
 if TYPE_CHECKING:
     from .controllers.base import BaseController
 
 LOGGER = get_logger()
 
+TRANSPORTS = ('tcp', 'local', 'both')
+
+# upper bound of the `timeout` of the `wait` command, in seconds
+MAX_JOB_WAIT = 600
+
+# request keys that make two requests identical for coalescing. The keys of
+# conditional replies are not: they are applied to the response of each client.
+_COALESCE_KEYS = (
+    'text', 'file', 'path', 'mtime', 'hash', 'session', 'delta', 'command', 'args',
+    'worker', 'timeout', 'formatText', 'batch'
+)
+
+# errors of the requests whose text cannot be read, rebuilt or compiled
+_TEXT_ERRORS = (
+    SharedMemoryError, SourceMismatch, DeltaMismatch, OSError, ValueError, SyntaxError
+)
+
+
+def local_server_name(port: int) -> str:
+    """Return the name of the local socket (Unix socket or named pipe) for a port.
+
+    The name is derived from the port so that multiple sessions listening on
+    different ports do not clash, and clients only need to know the port.
+
+    """
+    return f'nukeserversocket-{port}'
+
+
+@dataclass
+class _QueuedRequest:
+    connection: Optional[NssConnection]
+    data: ReceivedData
+    client: str
+    flags: int = 0
+    received_at: float = field(default_factory=time.time)
+    queued_at: float = field(default_factory=time.perf_counter)
+    # the response is stored as the result of a job instead of being sent
+    job: bool = False
+    # identical requests waiting for the response of this one
+    coalesce_key: str = ''
+    followers: List[_QueuedRequest] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class _JobWaiter:
+    request: _QueuedRequest
+    job_ids: List[str]
+
 
 class NssServer(QTcpServer):
     """NukeServerSocket server.
 
     This class is responsible for receiving data from the client, and sending the output back.
 
+    Besides the TCP listener, the server can optionally listen on a local socket
+    (Unix domain socket on Linux/macOS, named pipe on Windows) for same-host
+    clients. Both listeners are served by the same request pipeline.
+
+    Requests are queued by priority and executed one at a time, one per event
+    loop iteration, so requests arriving while others are queued are read
+    right away and an interactive request can jump ahead of queued bulk ones.
+
+    Clients speaking the framed protocol (see `nukeserversocket.protocol`)
+    keep their connection open and receive structured responses; legacy
+    clients send one json request and receive the raw output.
+
+    Requests marked `worker` skip the queue: they run in a pool of worker
+    processes (see `nukeserversocket.workers`) and are replied to when done.
+
+    Identical requests marked `coalesce` that arrive while one of them is
+    queued or running are not executed again: they receive its response.
+
+    Requests submitted as jobs (see `nukeserversocket.jobs`) have no
+    connection: their response is stored until the client collects it.
+
     Signals:
         on_data_received (): Signal emitted when data is received from the client.
 
     """
     on_data_received = Signal()
 
-    def __init__(self, editor: BaseController, parent: Optional[QWidget] = None):
+    # (request, future) of a worker request, emitted from a pool thread
+    _worker_finished = Signal(object, object)
+
+    def __init__(self, editor: BaseController, parent: Optional[QObject] = None):
         super().__init__(parent)
 
         self._editor = editor
-        self._socket: Optional[QTcpSocket] = None
+        self._local_server: Optional[QLocalServer] = None
+        self._error = ''
+
+        self._scheduler: RequestScheduler[_QueuedRequest] = RequestScheduler()
+        self._next_scheduled = False
+
+        self._connections: Set[NssConnection] = set()
+        self._rate_limiter = RateLimiter()
+        self._recorder: Optional[TrafficRecorder] = None
+
+        self._workers: Optional[WorkerPool] = None
+        self._worker_futures: Dict[str, Future[str]] = {}
+        self._worker_finished.connect(self._on_worker_finished)
+
+        self._inflight: Dict[str, _QueuedRequest] = {}
+
+        self._jobs = JobStore()
+        self._job_waiters: List[_JobWaiter] = []
+
+        self._cancel_listener = CancelListener()
+
+        # request being executed, reported by the stall detector
+        self._executing: Optional[ReceivedData] = None
+        self._stall_detector: Optional[StallDetector] = None
 
         self.newConnection.connect(self._on_new_connection)
         self.acceptError.connect(lambda err: LOGGER.error('Server error: %s', self.errorString()))
 
-    @Slot()
-    def _on_socket_ready(self):
+    @property
+    def editor(self) -> BaseController:
+        return self._editor
+
+    @property
+    def local_server(self) -> Optional[QLocalServer]:
+        return self._local_server
+
+    @property
+    def scheduler(self) -> RequestScheduler[_QueuedRequest]:
+        return self._scheduler
+
+    @property
+    def jobs(self) -> JobStore:
+        settings = self._editor.settings
+        self._jobs.configure(
+            settings.get('job_ttl', 3600),
+            settings.get('max_jobs', 1000),
+            settings.get('max_job_result_size', 0)
+        )
+        return self._jobs
+
+    @property
+    def workers(self) -> WorkerPool:
+        """The pool of worker processes, started on first use."""
+        if not self._workers:
+            settings = self._editor.settings
+            self._workers = WorkerPool(
+                settings.get('worker_processes', 0),
+                settings.get('worker_executable') or default_executable()
+            )
+        return self._workers
+
+    def _reject(self, connection: NssConnection, reason: str, message: str) -> None:
+        LOGGER.warning('Rejected %s: %s', connection.peer, message)
+        get_metrics().increment(f'rejected_{reason}')
+        connection.busy = True
+        connection.write_and_close(f'{message}\n'.encode('utf-8'))
+
+    def _allow_rate(self, connection: NssConnection) -> bool:
+        settings = self._editor.settings
+        self._rate_limiter.configure(
+            settings.get('rate_limit', 0), settings.get('rate_limit_burst', 1)
+        )
+        return self._rate_limiter.allow(connection.peer)
+
+    def _check_request_limits(self, connection: NssConnection) -> bool:
+        """Check the rate and size limits of a legacy request before parsing it."""
+        # the rate is checked once per request, on its first bytes
+        if not connection.buffered() and not self._allow_rate(connection):
+            self._reject(connection, 'rate_limit', 'RateLimitExceeded: Too many requests.')
+            return False
+
+        max_size = self._editor.settings.get('max_payload_size', 0)
+        if max_size and connection.buffered() + connection.bytes_available() > max_size:
+            self._reject(
+                connection, 'payload_size',
+                f'PayloadTooLarge: Request exceeds {max_size} bytes.'
+            )
+            return False
+
+        return True
+
+    def _on_socket_ready(self, connection: NssConnection) -> None:
         LOGGER.info('Received data from client.')
         LOGGER.debug('Socket ready.')
 
-        if not self._socket:
-            LOGGER.error('Socket is not set.')
-            raise RuntimeError('Socket is not set.')
+        if connection.framed is None:
+            connection.framed = is_framed(connection.peek(len(MAGIC)))
+            if connection.framed is None:
+                return
+
+        if connection.framed:
+            self._read_frames(connection)
+            return
+
+        if connection.busy:
+            # a legacy connection carries a single request, already received
+            return
+
+        if not self._check_request_limits(connection):
+            return
+
+        raw = connection.read_request()
+        if raw is None:
+            LOGGER.debug('Incomplete request: waiting for more data.')
+            return
 
         # parse the incoming data
-        data = ReceivedData(self._socket.readAll().data())
+        data = ReceivedData(raw)
+        connection.busy = True
+
+        self._dispatch(_QueuedRequest(connection, data, connection.peer))
+
+    def _read_frames(self, connection: NssConnection) -> None:
+        connection.decoder.max_size = self._editor.settings.get('max_payload_size', 0)
 
-        output = self._editor.execute(data)
+        try:
+            frames = connection.decoder.feed(connection.read_all())
+        except ProtocolError as e:
+            reason = 'payload_size' if isinstance(e, FrameTooLarge) else 'protocol'
+            name = 'PayloadTooLarge' if isinstance(e, FrameTooLarge) else 'ProtocolError'
+            LOGGER.warning('Rejected %s: %s', connection.peer, e)
+            get_metrics().increment(f'rejected_{reason}')
+            connection.write_and_close(encode_frame(Response('', error=f'{name}: {e}').to_bytes()))
+            return
 
+        for flags, body in frames:
+            data = ReceivedData(body)
+            request = _QueuedRequest(connection, data, connection.peer, flags)
+            connection.pending += 1
+
+            if not self._allow_rate(connection):
+                LOGGER.warning('Rejected %s: too many requests.', connection.peer)
+                get_metrics().increment('rejected_rate_limit')
+                self._respond(
+                    request, Response(data.id, error='RateLimitExceeded: Too many requests.')
+                )
+                continue
+
+            self._dispatch(request)
+
+    def _dispatch(self, request: _QueuedRequest) -> None:
+        data = request.data
         self.on_data_received.emit()
 
-        LOGGER.info('Writing output to back socket...')
+        if data.command == 'wait':
+            # replied to once the jobs finish, without blocking the other requests
+            self._wait_jobs(request)
+            return
+
+        if data.command and not is_queued(self, data.command):
+            # commands are cheap and must not wait behind the queue (e.g. cancel)
+            self._handle(request)
+            return
+
+        if data.coalesce and not data.shm and self._coalesce(request):
+            return
+
+        self._enqueue(request)
+
+    def _enqueue(self, request: _QueuedRequest) -> None:
+        """Queue the request, or run it in a worker process."""
+        data = request.data
+        if data.worker and not data.command:
+            self._offload(request)
+            return
+
+        self._scheduler.push(data.id, request, data.priority)
+        get_metrics().increment(f'requests_{data.priority}')
+        LOGGER.debug('Queued request %s. Pending: %s', data.id, self._scheduler.pending())
+
+        self._schedule_next()
+
+    def _schedule_next(self) -> None:
+        if len(self._scheduler) and not self._next_scheduled:
+            self._next_scheduled = True
+            QTimer.singleShot(0, self._run_next)
+
+    @Slot()
+    def _run_next(self) -> None:
+        self._next_scheduled = False
+
+        request = self._scheduler.pop()
+        if request:
+            wait = time.perf_counter() - request.queued_at
+            get_metrics().increment('queue_wait_seconds', wait)
+            LOGGER.debug('Running request %s after %.2f ms in queue.', request.data.id, wait * 1000)
+
+            self._handle(request)
+
+        self._schedule_next()
+
+    def _coalesce(self, request: _QueuedRequest) -> bool:
+        """Attach the request to an identical one in flight. Return False if there is none."""
+        values = {key: request.data.data.get(key) for key in _COALESCE_KEYS}
+        key = hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+        leader = self._inflight.get(key)
+        if leader is None:
+            request.coalesce_key = key
+            self._inflight[key] = request
+            return False
+
+        LOGGER.debug('Request %s coalesced with %s.', request.data.id, leader.data.id)
+        get_metrics().increment('requests_coalesced')
+        leader.followers.append(request)
+        return True
+
+    def _promote(self, request: _QueuedRequest) -> None:
+        """Queue the first follower of a cancelled request in its place."""
+        leader, *followers = request.followers
+        leader.coalesce_key = request.coalesce_key
+        leader.followers = followers
+        self._inflight[leader.coalesce_key] = leader
+
+        LOGGER.debug('Request %s cancelled: %s runs instead.', request.data.id, leader.data.id)
+        self._enqueue(leader)
+
+    def _respond_followers(self, request: _QueuedRequest, response: Response) -> None:
+        self._inflight.pop(request.coalesce_key, None)
+        for follower in request.followers:
+            shared = replace(
+                response,
+                id=follower.data.id,
+                elapsed=time.perf_counter() - follower.queued_at
+            )
+            if response.data:
+                # each client unlinks its own copy of the reply data
+                with SharedBuffer.from_handle(response.data) as view:
+                    shared.data = SharedBuffer.create(view).handle()
+            self._respond(follower, shared)
+
+    def submit_job(self, request: Dict[str, Any]) -> Job:
+        """Queue the request as a job, whose result is collected later."""
+        data = ReceivedData(json.dumps(request))
+        job = self.jobs.create(data.id)
+        LOGGER.debug('Submitted job %s.', job.id)
+        self._dispatch(_QueuedRequest(None, data, 'job', job=True))
+        return job
+
+    def _finish_job(self, job_id: str, response: Response) -> None:
+        self.jobs.finish(job_id, response)
+        get_metrics().increment('jobs_finished')
+        for waiter in list(self._job_waiters):
+            if self._jobs.done(waiter.job_ids):
+                self._release_waiter(waiter)
+
+    def _wait_jobs(self, request: _QueuedRequest) -> None:
+        args = request.data.args
+        waiter = _JobWaiter(request, job_ids(args))
+        self._job_waiters.append(waiter)
+
+        if self.jobs.done(waiter.job_ids):
+            self._release_waiter(waiter)
+            return
 
-        self._socket.write(output.encode('utf-8'))
+        try:
+            timeout = min(float(args.get('timeout') or MAX_JOB_WAIT), MAX_JOB_WAIT)
+        except (TypeError, ValueError):
+            timeout = MAX_JOB_WAIT
+        QTimer.singleShot(int(timeout * 1000), lambda: self._release_waiter(waiter))
+
+    def _release_waiter(self, waiter: _JobWaiter) -> None:
+        if waiter not in self._job_waiters:
+            # already replied to
+            return
+        self._job_waiters.remove(waiter)
+
+        data = waiter.request.data
+        reports = self._jobs.report(waiter.job_ids, output=True)
+        self._respond(waiter.request, Response(data.id, json.dumps(job_reply(data.args, reports))))
+
+    def _offload(self, request: _QueuedRequest) -> None:
+        """Run the request in a worker process. The reply is sent when it completes."""
+        data = request.data
+        if data.shm:
+            self._respond(request, Response(
+                data.id, error='SharedMemoryError: Worker requests cannot carry shared memory.'
+            ))
+            return
+
+        try:
+            with self._running(data):
+                self._resolve_text(data)
+            workers = self.workers
+        except (*_TEXT_ERRORS, WorkerError) as e:
+            self._respond(request, Response(data.id, error=f'{type(e).__name__}: {e}'))
+            return
+
+        timeout = data.timeout or self._editor.settings.get('execution_timeout', 0)
+        future = workers.submit(data.id, data.text, data.file or '<nss_worker>', timeout)
+        self._worker_futures[data.id] = future
+        future.add_done_callback(lambda future: self._worker_finished.emit(request, future))
+
+    @Slot(object, object)
+    def _on_worker_finished(self, request: _QueuedRequest, future: Future[str]) -> None:
+        self._worker_futures.pop(request.data.id, None)
+
+        response = Response(request.data.id)
+        if future.cancelled():
+            response.error = f'ExecutionCancelled: {ExecutionCancelled()}'
+        else:
+            try:
+                response.output = future.result()
+            except (ExecutionInterrupted, WorkerError) as e:
+                response.error = f'{type(e).__name__}: {e}'
+
+        response.elapsed = time.perf_counter() - request.queued_at
+        self._record(request, response.elapsed)
+        self._respond(request, response)
+
+    def _handle(self, request: _QueuedRequest) -> None:
+        response = self.execute(request.data)
+        response.elapsed = time.perf_counter() - request.queued_at
+        self._record(request, response.elapsed)
+        self._respond(request, response)
+
+    def _record(self, request: _QueuedRequest, latency: float) -> None:
+        """Append the request to the traffic record file, if recording is enabled."""
+        settings = self._editor.settings
+
+        if not settings.get('record_traffic'):
+            if self._recorder:
+                self._recorder.close()
+                self._recorder = None
+            return
+
+        if request.job:
+            # the submit command that queued the job is recorded instead
+            return
+
+        path = pathlib.Path(settings.get('record_file') or DEFAULT_RECORD_FILE)
+        if not self._recorder or self._recorder.path != path:
+            if self._recorder:
+                self._recorder.close()
+            self._recorder = TrafficRecorder(path)
+            LOGGER.info('Recording traffic to %s', path)
+
+        raw = request.data.raw
+        try:
+            self._recorder.record(
+                request.received_at,
+                latency,
+                request.client,
+                raw.encode('utf-8') if isinstance(raw, str) else raw
+            )
+        except OSError as e:
+            LOGGER.error('Failed to record traffic: %s', e)
+
+    def _respond(self, request: _QueuedRequest, response: Response) -> None:
+        if request.coalesce_key:
+            if request.followers and (response.error or '').startswith('ExecutionCancelled'):
+                # only the cancelled request is cancelled, not the identical ones
+                self._promote(request)
+            else:
+                self._respond_followers(request, response)
+
+        connection = request.connection
+        if request.job or not connection:
+            self._finish_job(request.data.id, response)
+            return
+
+        if not connection.framed:
+            if response.data:
+                # legacy clients cannot receive the handle
+                SharedBuffer.from_handle(response.data).unlink()
+            self._reply(connection, response.legacy_text())
+            return
+
+        response = self._conditional(request.data, response)
+
+        LOGGER.info('Writing response %s back to socket...', response.id)
+        connection.pending -= 1
+        connection.write(encode_frame(
+            response.to_bytes(), compress=bool(request.flags & FLAG_ACCEPT_COMPRESSED)
+        ))
+
+    def _conditional(self, data: ReceivedData, response: Response) -> Response:
+        """Drop the output, or send a delta of it, when the client has the previous one."""
+        if not (data.if_none_match or data.delta_reply) or not response.ok or response.data:
+            return response
+
+        digest = text_hash(response.output)
+        outputs = get_output_cache()
+        if data.delta_reply:
+            outputs.add(digest, response.output)
+
+        if digest == data.if_none_match:
+            get_metrics().increment('replies_unchanged')
+            return replace(response, output='', unchanged=True)
+
+        if data.delta_reply and data.if_none_match:
+            ops = outputs.delta(data.if_none_match, response.output)
+            if ops is not None:
+                get_metrics().increment('replies_delta')
+                return replace(response, output='', delta=ops)
+
+        return response
+
+    def _reply(self, connection: NssConnection, output: str) -> None:
+        LOGGER.info('Writing output to back socket...')
         LOGGER.debug('Output: %s', output.replace('\n', '\\n'))
 
-        self._socket.close()
-        LOGGER.debug('Socket closed.')
+        connection.write_and_close(output.encode('utf-8'))
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a queued or running request.
+
+        Return False if no request with that id is queued or running.
+
+        """
+        request = self._scheduler.remove(request_id)
+        if request:
+            LOGGER.info('Request %s cancelled before running.', request_id)
+            self._respond(
+                request, Response(request_id, error=f'ExecutionCancelled: {ExecutionCancelled()}')
+            )
+            return True
+
+        for leader in self._inflight.values():
+            for follower in leader.followers:
+                if follower.data.id == request_id:
+                    leader.followers.remove(follower)
+                    self._respond(follower, Response(
+                        request_id, error=f'ExecutionCancelled: {ExecutionCancelled()}'
+                    ))
+                    return True
+
+        future = self._worker_futures.get(request_id)
+        if future and (future.cancel() or self.workers.cancel(request_id)):
+            LOGGER.info('Worker request %s cancelled.', request_id)
+            return True
+
+        return cancel_execution(request_id)
+
+    def process(self, data: ReceivedData) -> str:
+        """Run a request and return its output as sent to legacy clients."""
+        response = self.execute(data)
+        return response.legacy_text()
+
+    def _resolve_text(self, data: ReceivedData) -> None:
+        """Set the text of the requests sent by path or as a delta."""
+        if data.delta:
+            data.text = get_delta_store().apply(data.session, data.file, data.delta)
+            LOGGER.debug('Rebuilt %s from a delta.', data.file)
+            return
+
+        if data.path and not data.text:
+            self._load_source(data)
+        elif data.session and data.file and data.text:
+            # base of the next delta request for the file
+            get_delta_store().remember(data.session, data.file, data.text)
 
+    def _load_source(self, data: ReceivedData) -> None:
+        """Read the script of a request sent by path, from the cache when unchanged."""
+        source = get_source_cache().load(data.path, data.mtime, data.digest)
+        LOGGER.debug('Loaded source %s (%s).', source.path, source.digest)
+        data.text = source.text
+        data.code = source.code()
+
+    def execute(self, data: ReceivedData) -> Response:
+        """Run a request and return its response.
+
+        Built-in commands are handled by the server, everything else is
+        executed by the editor under a watchdog that interrupts the code when
+        the request timeout expires or when the request is cancelled. Queued
+        commands run user code (e.g. stored procedures) and get the watchdog too.
+
+        """
+        with self._running(data):
+            return self._execute(data)
+
+    @contextlib.contextmanager
+    def _running(self, data: ReceivedData) -> Iterator[None]:
+        """Report the request to the stall detector while the block runs."""
+        previous, self._executing = self._executing, data
+        try:
+            yield
+        finally:
+            self._executing = previous
+
+    def _execute(self, data: ReceivedData) -> Response:
+        if data.command and not is_queued(self, data.command):
+            return Response(data.id, run_command(self, data))
+
+        timeout = data.timeout or self._editor.settings.get('execution_timeout', 0)
+
+        response = Response(data.id)
+        try:
+            channel = RequestChannel(data.shm)
+            self._resolve_text(data)
+        except _TEXT_ERRORS as e:
+            response.error = f'{type(e).__name__}: {e}'
+            return response
+
+        # the batch context is outside the watchdog, so an interruption never
+        # skips the restoration of the undo and UI state
+        batch = self._editor.batch(data.batch) if data.batch else contextlib.nullcontext()
+        watchdog = ExecutionWatchdog(data.id, timeout)
+        try:
+            with batch:
+                with watchdog, channel:
+                    if data.command:
+                        response.output = run_command(self, data)
+                    else:
+                        response.output = self._editor.execute(data)
+        except ExecutionInterrupted:
+            # the error is reported from `watchdog.interrupted_by`
+            pass
+
+        response.data = channel.reply_handle()
+
+        if watchdog.interrupted_by:
+            response.error = f'{watchdog.interrupted_by.__name__}: {watchdog.interrupted_by()}'
+            LOGGER.warning(
+                'Request %s interrupted: %s (timeout: %ss).',
+                data.id, watchdog.interrupted_by.__name__, timeout
+            )
+
+        return response
+
+    def _add_socket(self, socket: Socket) -> None:
+        socket.error.connect(lambda err: LOGGER.error('Socket error: %s', err))
+
+        connection = NssConnection(socket, self)
+
+        max_connections = self._editor.settings.get('max_connections', 0)
+        if max_connections and len(self._connections) >= max_connections:
+            self._reject(
+                connection, 'connections',
+                f'TooManyConnections: Limit of {max_connections} connections reached.'
+            )
+            return
+
+        self._connections.add(connection)
+        connection.destroyed.connect(lambda: self._connections.discard(connection))
+
+        LOGGER.debug('Socket connected.')
+        socket.readyRead.connect(lambda: self._on_socket_ready(connection))
+        connection.read_timed_out.connect(lambda: self._reject(
+            connection, 'incomplete', 'InvalidRequest: Incomplete json request.'
+        ))
+
+    @Slot()
     def _on_new_connection(self) -> None:
         LOGGER.debug('New connection.')
         while self.hasPendingConnections():
-
             LOGGER.debug('Pending connection.')
-            self._socket = self.nextPendingConnection()
-            self._socket.error.connect(lambda err: LOGGER.error('Socket error: %s', err))
+            self._add_socket(self.nextPendingConnection())
+
+    @Slot()
+    def _on_new_local_connection(self) -> None:
+        LOGGER.debug('New local connection.')
+        while self._local_server and self._local_server.hasPendingConnections():
+            LOGGER.debug('Pending local connection.')
+            self._add_socket(self._local_server.nextPendingConnection())
+
+    def _listen_local(self, port: int) -> bool:
+        name = local_server_name(port)
+
+        # a crashed session can leave a stale socket file behind on Unix
+        QLocalServer.removeServer(name)
+
+        self._local_server = QLocalServer(self)
+        self._local_server.newConnection.connect(self._on_new_local_connection)
+
+        if not self._local_server.listen(name):
+            self._error = self._local_server.errorString()
+            self._local_server = None
+            return False
+
+        LOGGER.debug('Local server: %s', self._local_server.fullServerName())
+        return True
+
+    def try_connect(self, port: int, transport: str = 'tcp') -> bool:
+        """Start listening on the given port.
+
+        Args:
+            port: The TCP port. The local socket name is derived from it.
+            transport: One of 'tcp', 'local' or 'both'.
+
+        """
+        LOGGER.debug('Trying to connect to port %s (%s)...', port, transport)
+        self._error = ''
+
+        if transport not in TRANSPORTS:
+            self._error = f'Invalid transport: {transport}'
+            return False
+
+        if transport in ('tcp', 'both') and not self.listen(QHostAddress.Any, port):
+            return False
+
+        if transport in ('local', 'both') and not self._listen_local(port):
+            super().close()
+            return False
+
+        # the main thread cannot read a cancel message while a script runs
+        self._cancel_listener.start('127.0.0.1' if transport == 'local' else '', port)
+        self._start_stall_detector()
+        return True
+
+    def _start_stall_detector(self) -> None:
+        threshold = self._editor.settings.get('stall_threshold', 0)
+        if not threshold:
+            return
+        if not self._stall_detector:
+            self._stall_detector = StallDetector(threshold, lambda: self._executing, self)
+        self._stall_detector.threshold = threshold
+        self._stall_detector.start()
+
+    def isListening(self) -> bool:
+        local_listening = bool(self._local_server and self._local_server.isListening())
+        return super().isListening() or local_listening
 
-            LOGGER.debug('Socket connected.')
-            self._socket.readyRead.connect(self._on_socket_ready)
+    def errorString(self) -> str:
+        return self._error or super().errorString()
 
-    def try_connect(self, port: int) -> bool:
-        LOGGER.debug('Trying to connect to port %s...', port)
-        return self.listen(QHostAddress.Any, port)
+    def close(self) -> None:
+        super().close()
+        self._cancel_listener.stop()
+        if self._stall_detector:
+            self._stall_detector.stop()
+        if self._workers:
+            self._workers.close()
+            self._workers = None
+        if self._recorder:
+            self._recorder.close()
+            self._recorder = None
+        if self._local_server:
+            self._local_server.close()
+            self._local_server = None
@@ -13,7 +13,21 @@
 class _NssSettings:
     defaults = {
         'port': 54321,
+        'transport': 'tcp',
         'server_timeout': 60000,
+        'execution_timeout': 0,
+        'max_connections': 100,
+        'max_payload_size': 50 * 1024 * 1024,
+        'rate_limit': 0,
+        'rate_limit_burst': 10,
+        'record_traffic': False,
+        'record_file': '',
+        'worker_processes': 0,
+        'worker_executable': '',
+        'job_ttl': 3600,
+        'max_jobs': 1000,
+        'max_job_result_size': 10 * 1024 * 1024,
+        'stall_threshold': 2,
         'mirror_script_editor': False,
         'clear_output': True,
         'format_output': '[%d NukeTools] %F%n%t',
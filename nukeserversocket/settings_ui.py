@@ -10,8 +10,10 @@
 from textwrap import dedent
 
 from PySide2.QtCore import Slot
-from PySide2.QtWidgets import (QWidget, QSpinBox, QCheckBox, QLineEdit,
-                               QFormLayout)
+from PySide2.QtWidgets import (QWidget, QSpinBox, QCheckBox, QComboBox,
+                               QLineEdit, QFormLayout)
+
+from .server import TRANSPORTS
 
 if TYPE_CHECKING:
     from .settings import _NssSettings
@@ -36,6 +38,21 @@ def __init__(self, parent: Optional[QWidget] = None):
         self.timeout = QSpinBox()
         self.timeout.setToolTip('Server timeout in minutes')
 
+        self.execution_timeout = QSpinBox()
+        self.execution_timeout.setRange(0, 86400)
+        self.execution_timeout.setToolTip(
+            'Interrupt the code of a request after this many seconds. 0 means no limit'
+        )
+
+        self.transport = QComboBox()
+        self.transport.addItems(TRANSPORTS)
+        self.transport.setToolTip(dedent('''
+        Connection type used when connecting:
+        - tcp: listen on the network port
+        - local: listen on a local socket only (same machine clients)
+        - both: listen on both
+        '''.strip()))
+
         self.format_output = QLineEdit()
         self.format_output.setToolTip(dedent('''
         Format output using the following placeholders:
@@ -54,6 +71,8 @@ def __init__(self, parent: Optional[QWidget] = None):
 
         form_layout = QFormLayout()
         form_layout.addRow('Server Timeout (min):', self.timeout)
+        form_layout.addRow('Execution Timeout (sec):', self.execution_timeout)
+        form_layout.addRow('Transport:', self.transport)
         form_layout.addRow('Mirror script editor:', self.mirror_script_editor)
         form_layout.addRow('Format output:', self.format_output)
         form_layout.addRow('Clear output:', self.clear_output)
@@ -67,6 +86,8 @@ def __init__(self, view: NssSettingsView, model: NssSettingsModel):
         self._model = model
 
         self._view.timeout.valueChanged.connect(self._on_timeout_changed)
+        self._view.execution_timeout.valueChanged.connect(self._on_execution_timeout_changed)
+        self._view.transport.currentTextChanged.connect(self._on_transport_changed)
         self._view.format_output.textChanged.connect(self._on_format_output_changed)
         self._view.mirror_script_editor.stateChanged.connect(self._on_mirror_script_editor_changed)
         self._view.clear_output.stateChanged.connect(self._on_clear_output_changed)
@@ -90,8 +111,18 @@ def _on_format_output_changed(self, text: str):
     def _on_timeout_changed(self, timeout: int):
         self._model.set('server_timeout', timeout * 60000)
 
+    @Slot(int)
+    def _on_execution_timeout_changed(self, timeout: int):
+        self._model.set('execution_timeout', timeout)
+
+    @Slot(str)
+    def _on_transport_changed(self, transport: str):
+        self._model.set('transport', transport)
+
     def init(self):
         self._view.timeout.setValue(self._model.get('server_timeout') / 60000)
+        self._view.execution_timeout.setValue(self._model.get('execution_timeout'))
+        self._view.transport.setCurrentText(self._model.get('transport'))
 
         mirror_script_editor_state = self._model.get('mirror_script_editor')
         self._view.mirror_script_editor.setChecked(mirror_script_editor_state)
@@ -0,0 +1,254 @@
+"""Shared-memory channel for bulk data between same-host clients and the server.
+
+Large payloads (pixels, point data) do not go through the socket as json
+text: they are written once to a memory-mapped segment and the request only
+carries its handle. Segments live in `/dev/shm` when available (so they never
+touch the disk), or in the temp directory otherwise.
+
+Client side:
+
+    with NssClient() as client:
+        response = client.execute(script, data=array.tobytes())
+
+        if response.data:
+            reply = SharedBuffer.from_handle(response.data)
+            with reply as view:
+                result = numpy.frombuffer(view, numpy.float32).copy()
+            reply.unlink()
+
+Script side, while the request runs:
+
+    from nukeserversocket.shm import request_data, reply_data
+
+    with request_data() as view:
+        reply_data((numpy.frombuffer(view, numpy.float32) * 2).tobytes())
+
+The memoryviews map the segment directly, without copies: leaving the `with`
+block releases the view and unmaps the segment. Objects still using the view
+(e.g. an array made with `numpy.frombuffer`) keep the segment mapped until
+they are deleted: copy what must outlive the block.
+Segments are created by the sender and unlinked by the receiver.
+
+This module has no Qt dependency.
+
+"""
+from __future__ import annotations
+
+import os
+import re
+import mmap
+import time
+import uuid
+import pathlib
+import tempfile
+from types import TracebackType
+from typing import Any, Dict, Type, Union, Optional
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _shm_dir() -> pathlib.Path:
+    root = pathlib.Path('/dev/shm')
+    if not root.is_dir():
+        root = pathlib.Path(tempfile.gettempdir())
+    return root / 'nukeserversocket'
+
+
+SHM_DIR = _shm_dir()
+
+# Segments older than this are considered leaked by a crashed process.
+STALE_AGE = 3600
+
+_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_cleaned = False
+
+
+class SharedMemoryError(Exception):
+    """The shared-memory segment does not exist or cannot be mapped."""
+
+
+def cleanup(max_age: float = STALE_AGE) -> int:
+    """Remove the segments older than `max_age` seconds. Return how many were removed."""
+    removed = 0
+    now = time.time()
+    for path in SHM_DIR.glob('*'):
+        try:
+            if now - path.stat().st_mtime > max_age:
+                path.unlink()
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class SharedBuffer:
+    """A named memory-mapped segment.
+
+    Use it as a context manager to map it: the `with` block returns a
+    memoryview of the segment, released and unmapped on exit.
+
+    """
+
+    def __init__(self, name: str, size: int):
+        if not _NAME_PATTERN.match(name):
+            raise SharedMemoryError(f'Invalid segment name: {name!r}')
+        self.name = name
+        self.size = size
+        self._mmap: Optional[mmap.mmap] = None
+        # view returned by `__enter__`, released by `__exit__`
+        self._view: Optional[memoryview] = None
+
+    @property
+    def path(self) -> pathlib.Path:
+        return SHM_DIR / self.name
+
+    @classmethod
+    def allocate(cls, size: int) -> SharedBuffer:
+        """Create an empty segment of `size` bytes, to be filled in place."""
+        global _cleaned
+        SHM_DIR.mkdir(parents=True, exist_ok=True)
+        if not _cleaned:
+            _cleaned = True
+            cleanup()
+
+        buffer = cls(uuid.uuid4().hex, size)
+        with buffer.path.open('wb') as f:
+            f.truncate(size)
+        return buffer
+
+    @classmethod
+    def create(cls, data: Buffer) -> SharedBuffer:
+        """Create a segment holding a copy of the data."""
+        view = memoryview(data).cast('B')
+        buffer = cls.allocate(view.nbytes)
+        with buffer.open(writable=True) as target:
+            target[:] = view
+        buffer.close()
+        return buffer
+
+    @classmethod
+    def from_handle(cls, handle: Dict[str, Any]) -> SharedBuffer:
+        try:
+            return cls(str(handle['name']), int(handle['size']))
+        except (KeyError, TypeError, ValueError) as e:
+            raise SharedMemoryError(f'Invalid segment handle: {handle!r}') from e
+
+    def handle(self) -> Dict[str, Any]:
+        """Return the json handle sent in place of the data."""
+        return {'name': self.name, 'size': self.size}
+
+    def open(self, writable: bool = False) -> memoryview:
+        """Map the segment and return a memoryview of it."""
+        if not self.size:
+            return memoryview(bytearray() if writable else b'')
+
+        if self._mmap is None:
+            try:
+                with self.path.open('r+b' if writable else 'rb') as f:
+                    self._mmap = mmap.mmap(
+                        f.fileno(), self.size,
+                        access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+                    )
+            except (OSError, ValueError) as e:
+                raise SharedMemoryError(f'Cannot map segment {self.name}: {e}') from e
+
+        return memoryview(self._mmap)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # a memoryview is still alive: the mapping goes away with it
+                pass
+            self._mmap = None
+
+    def unlink(self) -> None:
+        """Remove the segment. Existing mappings stay valid on Unix."""
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> memoryview:
+        self._view = self.open()
+        return self._view
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                # still exported (e.g. by a numpy array): closed with it
+                pass
+            self._view = None
+        self.close()
+
+
+class RequestChannel:
+    """Shared-memory data of the request being executed.
+
+    The server activates the channel of a request while its code runs, so that
+    the code can read the request data and attach reply data.
+
+    """
+
+    def __init__(self, handle: Optional[Dict[str, Any]] = None):
+        self.input = SharedBuffer.from_handle(handle) if handle else None
+        self.reply: Optional[SharedBuffer] = None
+
+    def __enter__(self) -> RequestChannel:
+        global _current
+        _current = self
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        global _current
+        _current = None
+        if self.input:
+            self.input.close()
+
+    def reply_handle(self) -> Optional[Dict[str, Any]]:
+        return self.reply.handle() if self.reply else None
+
+
+_current: Optional[RequestChannel] = None
+
+
+def _channel() -> RequestChannel:
+    if _current is None:
+        raise SharedMemoryError('No request is running.')
+    return _current
+
+
+def request_data() -> SharedBuffer:
+    """Return the shared-memory data sent with the running request.
+
+    Raises:
+        SharedMemoryError: if the request has no data.
+
+    """
+    channel = _channel()
+    if not channel.input:
+        raise SharedMemoryError('The request has no shared-memory data.')
+    return channel.input
+
+
+def reply_data(data: Buffer) -> Dict[str, Any]:
+    """Send the data back with the reply of the running request, and return its handle.
+
+    The client receives the handle in `Response.data` and unlinks the segment.
+
+    """
+    channel = _channel()
+    if channel.reply:
+        channel.reply.unlink()
+    channel.reply = SharedBuffer.create(data)
+    return channel.reply.handle()
@@ -0,0 +1,119 @@
+"""Scripts read by the server from a path on shared storage.
+
+Instead of sending the full `text`, a client that shares a file system with
+the server can send only the path of the script:
+
+    {"path": "/shared/tools/build_comp.py", "mtime": 1718000000.5}
+
+The server reads the file and caches its source (and compiled code) keyed by
+path and modification time, so the file is read again only after it changes.
+The optional `mtime` and `hash` (sha1 of the source) keys make the server
+check that it sees the same version of the file as the client: on mismatch
+the request fails with `SourceMismatch` and the client can send the text.
+
+"""
+from __future__ import annotations
+
+import os
+import hashlib
+from types import CodeType
+from typing import Tuple, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .utils import cache
+from .metrics import get_metrics
+
+# Modification times sent by clients are floats: allow for rounding.
+MTIME_TOLERANCE = 0.001
+
+
+class SourceMismatch(Exception):
+    """The server sees a different version of the file than the client."""
+
+
+@dataclass
+class Source:
+    path: str
+    text: str
+    digest: str
+    mtime: float
+    _code: Optional[CodeType] = None
+    _error: Optional[SyntaxError] = None
+
+    def code(self) -> CodeType:
+        """Return the compiled source. Compiled once, on first use.
+
+        Raises:
+            SyntaxError: if the source does not compile. The error is cached
+                too, until the file changes.
+
+        """
+        if self._error is not None:
+            raise self._error.with_traceback(None)
+        if self._code is None:
+            try:
+                self._code = compile(self.text, self.path, 'exec')
+            except SyntaxError as e:
+                self._error = e
+                raise
+        return self._code
+
+
+class SourceCache:
+    """Least recently used cache of the files read by the server."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._sources: OrderedDict[str, Tuple[Tuple[int, int], Source]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def clear(self) -> None:
+        self._sources.clear()
+
+    def load(
+        self, path: str, mtime: Optional[float] = None, digest: Optional[str] = None
+    ) -> Source:
+        """Return the source of the file, read again only if it changed.
+
+        Raises:
+            OSError: if the file cannot be read.
+            SourceMismatch: if `mtime` or `digest` do not match the file.
+
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._sources.get(path)
+        if cached and cached[0] == key:
+            self._sources.move_to_end(path)
+            get_metrics().increment('source_cache_hits')
+            source = cached[1]
+        else:
+            get_metrics().increment('source_cache_misses')
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            source = Source(
+                path, text, hashlib.sha1(text.encode('utf-8')).hexdigest(), stat.st_mtime
+            )
+            self._sources[path] = (key, source)
+            self._sources.move_to_end(path)
+            while len(self._sources) > self.max_entries:
+                self._sources.popitem(last=False)
+
+        if mtime is not None and abs(source.mtime - mtime) > MTIME_TOLERANCE:
+            raise SourceMismatch(
+                f'{path} was modified at {source.mtime} on the server, {mtime} on the client.'
+            )
+        if digest and digest != source.digest:
+            raise SourceMismatch(f'{path} has different content on the server.')
+
+        return source
+
+
+@cache('sources')
+def get_source_cache() -> SourceCache:
+    return SourceCache()
@@ -0,0 +1,173 @@
+"""Detection of the stalls of the main thread event loop.
+
+A heartbeat timer on the main thread records when the event loop last ran. A
+watchdog thread checks it and, when the loop did not run for longer than the
+`stall_threshold` setting, samples the stack of the main thread and logs it
+with the id and source of the request being executed, if any:
+
+    Event loop stalled for 2.0 s while running request 3f2a... (tool.py):
+    ->   12 for node in nuke.allNodes():
+         13     node['disable'].setValue(False)
+    Main thread stack (most recent call last): ...
+
+Without a request, the freeze comes from something else (the application, a
+callback, another plugin) and the stack tells what.
+
+Each stall is logged once, when it crosses the threshold, and its total
+duration when the loop runs again. Stalls are counted in the
+`event_loop_stalls` metric and their duration in `event_loop_stall_seconds`.
+
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import threading
+import traceback
+from typing import Any, Dict, List, Callable, Optional
+
+from PySide2.QtCore import Slot, QTimer, QObject
+
+from .logger import get_logger
+from .metrics import get_metrics
+from .received_data import ReceivedData
+
+LOGGER = get_logger()
+
+HEARTBEAT_INTERVAL = 0.1
+
+# lines of the request source shown around the current line
+SNIPPET_CONTEXT = 2
+
+
+def source_snippet(data: ReceivedData, stack: List[traceback.FrameSummary]) -> str:
+    """Return the lines of the request source around the line being executed.
+
+    The current line is the innermost frame of the request source in the stack;
+    when the request code is not on the stack, the first lines are returned.
+
+    """
+    lines = data.text.splitlines()
+    if not lines:
+        return data.command or data.path
+
+    filenames = {data.file, os.path.abspath(data.path) if data.path else data.file}
+    lineno = next(
+        (frame.lineno for frame in reversed(stack) if frame.filename in filenames), None
+    )
+    if not lineno or lineno > len(lines):
+        return '\n'.join(lines[:SNIPPET_CONTEXT * 2 + 1])
+
+    first = max(lineno - SNIPPET_CONTEXT, 1)
+    last = min(lineno + SNIPPET_CONTEXT, len(lines))
+    return '\n'.join(
+        f'{"->" if number == lineno else "  "} {number:4} {lines[number - 1]}'
+        for number in range(first, last + 1)
+    )
+
+
+class StallDetector(QObject):
+    """Log the main thread stack when its event loop stops running.
+
+    Must be created on the main thread. `current` returns the request being
+    executed, it is called from the watchdog thread.
+
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        current: Callable[[], Optional[ReceivedData]],
+        parent: Optional[QObject] = None
+    ):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.last_stall: Optional[Dict[str, Any]] = None
+
+        self._current = current
+        self._main_thread_id = threading.get_ident()
+
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        self._stalled = False
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(HEARTBEAT_INTERVAL * 1000))
+        self._timer.timeout.connect(self._heartbeat)
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread:
+            return
+
+        with self._lock:
+            self._beat = time.monotonic()
+            self._stalled = False
+        self._stop.clear()
+        self._timer.start()
+
+        self._thread = threading.Thread(
+            target=self._watch, name='nss-stall-detector', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    @Slot()
+    def _heartbeat(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stalled, self._stalled = self._stalled, False
+            seconds = now - self._beat
+            self._beat = now
+
+        if stalled:
+            get_metrics().increment('event_loop_stall_seconds', seconds)
+            LOGGER.warning('Event loop resumed after %.1f s.', seconds)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                seconds = time.monotonic() - self._beat
+                if self._stalled or seconds < self.threshold:
+                    continue
+                self._stalled = True
+            self._report(seconds)
+
+    def _report(self, seconds: float) -> None:
+        frame = sys._current_frames().get(self._main_thread_id)
+        stack = traceback.extract_stack(frame) if frame else traceback.StackSummary()
+        data = self._current()
+
+        get_metrics().increment('event_loop_stalls')
+        self.last_stall = {
+            'seconds': seconds,
+            'request': data.id if data else None,
+            'snippet': source_snippet(data, stack) if data else '',
+            'stack': ''.join(stack.format()),
+        }
+
+        if data:
+            LOGGER.warning(
+                'Event loop stalled for %.1f s while running request %s (%s):\n%s\n'
+                'Main thread stack (most recent call last):\n%s',
+                seconds, data.id, data.file or data.command or '<text>',
+                self.last_stall['snippet'], self.last_stall['stack']
+            )
+        else:
+            LOGGER.warning(
+                'Event loop stalled for %.1f s, no request running.\n'
+                'Main thread stack (most recent call last):\n%s',
+                seconds, self.last_stall['stack']
+            )
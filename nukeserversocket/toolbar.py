@@ -1,10 +1,6 @@
 from __future__ import annotations
 
-import os
-import sysconfig
-import webbrowser
-from typing import Dict, Optional
-from platform import python_version
+from typing import Dict, Union, Callable, Optional
 
 from PySide2 import __version__ as PySide2_version
 from PySide2.QtCore import Slot
@@ -16,6 +12,9 @@
 
 def about() -> Dict[str, str]:
     """Return a dictionary with information about the application."""
+    import sysconfig
+    from platform import python_version
+
     return {
         'version': __version__,
         'python': python_version(),
@@ -46,6 +45,8 @@ def _button_builder(self, text: str) -> QPushButton:
 
     @Slot(str)
     def _on_open_link(self, link: str):
+        import webbrowser
+
         gitrepo = 'https://github.com/sisoe24/nukeserversocket'
         links = {
             'issues': f'{gitrepo}/issues',
@@ -66,6 +67,9 @@ def _show_window(widget: QWidget) -> None:
     widget.raise_()
 
 
+WidgetFactory = Callable[[], QWidget]
+
+
 class ToolBar(QToolBar):
     """Custom QToolBar class."""
 
@@ -74,11 +78,24 @@ def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
         self.setMovable(False)
         self.setStyleSheet('color: white;')
-        self.add_widget(title='Help', widget=HelpWidget(self))
+        self._widgets: Dict[str, QWidget] = {}
+        self.add_widget(title='Help', widget=lambda: HelpWidget(self))
+
+    def get_widget(self, title: str, widget: Union[QWidget, WidgetFactory]) -> QWidget:
+        """Return the widget of an action, building it on first use if needed."""
+        if title not in self._widgets:
+            self._widgets[title] = widget if isinstance(widget, QWidget) else widget()
+            self._widgets[title].setWindowTitle(title)
+        return self._widgets[title]
+
+    def add_widget(self, title: str, widget: Union[QWidget, WidgetFactory]) -> QAction:
+        """Add an action that shows a widget.
+
+        The widget can be a factory function, in which case the widget is
+        created only the first time the action is triggered.
 
-    def add_widget(self, title: str, widget: QWidget) -> QAction:
-        widget.setWindowTitle(title)
+        """
         action = QAction(title, self)
-        action.triggered.connect(lambda: _show_window(widget))
+        action.triggered.connect(lambda: _show_window(self.get_widget(title, widget)))
         self.addAction(action)
         return action
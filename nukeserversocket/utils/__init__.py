@@ -1,2 +1,4 @@
 from .cache import cache, clear_cache
+from .stats import percentile
 from .exec_code import stdoutIO, exec_code
+from .stopwatch import Stopwatch
@@ -4,7 +4,8 @@
 import sys
 import traceback
 import contextlib
-from typing import Any, List, Generator
+from types import CodeType
+from typing import Any, List, Optional, Generator
 
 
 @contextlib.contextmanager
@@ -24,15 +25,21 @@ def stdoutIO(stdout: Any = None) -> Generator[Any, Any, None]:
     if stdout is None:
         stdout = io.StringIO()
     sys.stdout = stdout
-    yield stdout
-    sys.stdout = old
+    try:
+        yield stdout
+    finally:
+        sys.stdout = old
 
 
-def exec_code(input_text: str, filename: str = '<user_code>') -> str:
+def exec_code(
+    input_text: str, filename: str = '<user_code>', code_object: Optional[CodeType] = None
+) -> str:
     """Execute code with exec and returns its output.
 
     Accepts an optional filename argument for the source file is executing if
-    there is an exception.
+    there is an exception, and an optional `code_object` with the already
+    compiled text. The interruptions of an `ExecutionWatchdog` are not
+    caught: they propagate to the caller.
 
     ```
     result = exec_code("print('hello'.upper())")
@@ -41,7 +48,8 @@ def exec_code(input_text: str, filename: str = '<user_code>') -> str:
     """
     with stdoutIO() as s:
         try:
-            code_object = compile(input_text, filename, 'exec')
+            if code_object is None:
+                code_object = compile(input_text, filename, 'exec')
             exec(code_object, globals())
         except Exception:
             exc_type, exc_value, exc_traceback = sys.exc_info()
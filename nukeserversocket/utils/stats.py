@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the percentile of the values using the nearest-rank method.
+
+    >>> percentile([1, 2, 3, 4], 50)
+    >>> 2
+
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import time
+import contextlib
+from typing import Dict, Generator
+
+
+class Stopwatch:
+    """Measure the duration of named steps.
+
+    ```
+    stopwatch = Stopwatch()
+    with stopwatch.measure('settings'):
+        load_settings()
+    print(stopwatch.summary())
+    ```
+
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def measure(self, name: str) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total(self) -> float:
+        """Return the total time in seconds of all the steps."""
+        return sum(self.steps.values())
+
+    def summary(self) -> str:
+        """Return the steps durations in milliseconds as a single line."""
+        return ', '.join(f'{name}: {secs * 1000:.1f} ms' for name, secs in self.steps.items())
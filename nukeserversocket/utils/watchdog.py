@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import ctypes
+import threading
+from types import TracebackType
+from typing import Dict, Type, Optional
+
+_RUNNING: Dict[str, 'ExecutionWatchdog'] = {}
+_RUNNING_LOCK = threading.Lock()
+
+
+class ExecutionInterrupted(BaseException):
+    """Base class of the exceptions raised inside interrupted code.
+
+    Like `KeyboardInterrupt`, it is not an `Exception`: an `except Exception`
+    in the user code does not stop the interruption.
+
+    """
+
+
+class ExecutionTimeout(ExecutionInterrupted):
+    def __init__(self, *args: object):
+        super().__init__(*(args or ('Execution exceeded its time limit.',)))
+
+
+class ExecutionCancelled(ExecutionInterrupted):
+    def __init__(self, *args: object):
+        super().__init__(*(args or ('Execution was cancelled.',)))
+
+
+def _set_async_exc(thread_id: int, exc_type: Optional[Type[BaseException]]) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc_type) if exc_type else None
+    )
+
+
+class ExecutionWatchdog:
+    """Interrupt the code running in the current thread on timeout or cancellation.
+
+    The interruption is done by raising an asynchronous exception in the
+    thread that entered the watchdog, so the code gets an `ExecutionTimeout` or
+    `ExecutionCancelled` exception at the next Python instruction. Code stuck
+    inside a C call (e.g. a long `time.sleep`) is interrupted only when the
+    call returns.
+
+    ```
+    with ExecutionWatchdog('request-id', timeout=5):
+        exec_code(text)
+    ```
+
+    """
+
+    def __init__(self, request_id: str, timeout: float = 0):
+        self.request_id = request_id
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._thread_id = 0
+        self._timer: Optional[threading.Timer] = None
+        self._finished = False
+        self.interrupted_by: Optional[Type[ExecutionInterrupted]] = None
+
+    def __enter__(self) -> ExecutionWatchdog:
+        self._thread_id = threading.get_ident()
+
+        with _RUNNING_LOCK:
+            _RUNNING[self.request_id] = self
+
+        if self.timeout > 0:
+            self._timer = threading.Timer(self.timeout, self._interrupt, (ExecutionTimeout,))
+            self._timer.daemon = True
+            self._timer.start()
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        with self._lock:
+            self._finished = True
+            if self._timer:
+                self._timer.cancel()
+            if self.interrupted_by:
+                # the exception might still be pending if the code finished
+                # right after the interruption: clear it.
+                _set_async_exc(self._thread_id, None)
+
+        with _RUNNING_LOCK:
+            if _RUNNING.get(self.request_id) is self:
+                del _RUNNING[self.request_id]
+
+    def _interrupt(self, exc_type: Type[ExecutionInterrupted]) -> bool:
+        with self._lock:
+            if self._finished or self.interrupted_by:
+                return False
+            self.interrupted_by = exc_type
+            _set_async_exc(self._thread_id, exc_type)
+            return True
+
+    def cancel(self) -> bool:
+        """Cancel the execution. Return False if it was already finished."""
+        return self._interrupt(ExecutionCancelled)
+
+
+def cancel_execution(request_id: str) -> bool:
+    """Cancel the running execution of a request.
+
+    Can be called from any thread. Return False if no execution with that id
+    is running.
+
+    """
+    with _RUNNING_LOCK:
+        watchdog = _RUNNING.get(request_id)
+    return bool(watchdog and watchdog.cancel())
+
+
+def is_running(request_id: str) -> bool:
+    with _RUNNING_LOCK:
+        return request_id in _RUNNING
@@ -0,0 +1,235 @@
+"""Pool of worker processes for CPU-heavy requests.
+
+A request with `"worker": true` is not executed on the main thread of the
+host application: its code runs in a separate Python process, so the
+application stays responsive and several requests use several cores.
+
+    {"text": "import hashlib; print(hashlib.sha1(open(path, 'rb').read()).hexdigest())",
+     "worker": true}
+
+Workers are plain Python interpreters started with `multiprocessing` (spawn),
+on demand and reused between requests. They cannot access the host
+application (no `nuke` or `hou` module), only files and standard modules.
+The interpreter can be set with the `worker_executable` setting, e.g. a
+standalone Python matching the application version; it defaults to the
+current interpreter outside of Nuke and Houdini. It only applies to the
+processes of the pool: other users of `multiprocessing` in the application
+keep their own interpreter.
+
+A request that times out or is cancelled kills its worker, which is replaced
+on the next request.
+
+"""
+from __future__ import annotations
+
+import os
+import sys
+import queue
+import threading
+import contextlib
+import multiprocessing
+from typing import Any, Dict, Iterator
+from multiprocessing import spawn
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+from .logger import get_logger
+from .metrics import get_metrics
+from .utils.watchdog import ExecutionTimeout, ExecutionCancelled
+from .utils.exec_code import exec_code
+
+LOGGER = get_logger()
+
+
+def _worker_main(connection: Connection) -> None:
+    """Loop of a worker process: execute the code received and send back its output."""
+    while True:
+        try:
+            task = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if task is None:
+            return
+
+        text, filename = task
+        connection.send(exec_code(text, filename))
+
+
+class WorkerError(Exception):
+    """The worker process died or cannot be started."""
+
+
+# `multiprocessing` has a single, global interpreter for spawned processes
+_SPAWN_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def _spawn_executable(executable: str) -> Iterator[None]:
+    """Spawn the processes started in the block with the interpreter, if any."""
+    if not executable:
+        yield
+        return
+
+    with _SPAWN_LOCK:
+        previous = spawn.get_executable()
+        spawn.set_executable(executable)
+        try:
+            yield
+        finally:
+            spawn.set_executable(previous)
+
+
+class _Worker:
+    def __init__(self, context: Any, executable: str = ''):
+        self._connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        with _spawn_executable(executable):
+            self.process.start()
+        child.close()
+        self.cancelled = False
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def run(self, text: str, filename: str, timeout: float) -> str:
+        try:
+            self._connection.send((text, filename))
+            if not self._connection.poll(timeout or None):
+                self.kill()
+                self._connection.close()
+                raise ExecutionTimeout()
+            return self._connection.recv()
+        except (EOFError, OSError) as e:
+            # the process was killed by `cancel`, or crashed
+            self.kill()
+            self._connection.close()
+            if self.cancelled:
+                raise ExecutionCancelled() from e
+            raise WorkerError(
+                f'The worker process exited with code {self.process.exitcode}.'
+            ) from e
+
+    def kill(self) -> None:
+        """Kill the process. A thread waiting for its reply gets an `EOFError`."""
+        self.process.kill()
+        self.process.join(1)
+
+    def stop(self) -> None:
+        try:
+            self._connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+
+
+class WorkerPool:
+    """Up to `size` worker processes, started on demand.
+
+    Each running request blocks a thread of the pool waiting for its worker,
+    never the caller: `submit` returns a future.
+
+    """
+
+    def __init__(self, size: int = 0, executable: str = ''):
+        self.size = size or os.cpu_count() or 1
+
+        self.executable = executable
+        self._context = multiprocessing.get_context('spawn')
+
+        self._idle: queue.SimpleQueue[_Worker] = queue.SimpleQueue()
+        self._running: Dict[str, _Worker] = {}
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(self.size, thread_name_prefix='nss-worker')
+
+    def _checkout(self) -> _Worker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.alive():
+                return worker
+
+        try:
+            worker = _Worker(self._context, self.executable)
+        except Exception as e:
+            raise WorkerError(f'Cannot start a worker process: {e}') from e
+
+        get_metrics().increment('workers_started')
+        LOGGER.debug('Started worker process %s.', worker.process.pid)
+        return worker
+
+    def _run(self, request_id: str, text: str, filename: str, timeout: float) -> str:
+        worker = self._checkout()
+        with self._lock:
+            self._running[request_id] = worker
+        try:
+            return worker.run(text, filename, timeout)
+        finally:
+            with self._lock:
+                self._running.pop(request_id, None)
+            if worker.alive() and not worker.cancelled:
+                self._idle.put(worker)
+
+    def submit(self, request_id: str, text: str, filename: str, timeout: float = 0) -> Future[str]:
+        """Run the code in a worker. The future raises `ExecutionTimeout`,
+        `ExecutionCancelled` or `WorkerError` when the code did not complete."""
+        get_metrics().increment('worker_requests')
+        return self._threads.submit(self._run, request_id, text, filename, timeout)
+
+    def cancel(self, request_id: str) -> bool:
+        """Kill the worker running the request. Return False if it is not running."""
+        with self._lock:
+            worker = self._running.get(request_id)
+        if not worker:
+            return False
+
+        worker.cancelled = True
+        worker.kill()
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            running = list(self._running.values())
+        for worker in running:
+            worker.cancelled = True
+            worker.kill()
+
+        self._threads.shutdown(wait=True)
+
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+def default_executable() -> str:
+    """Return the interpreter of the workers when the `worker_executable` setting is empty.
+
+    Inside Nuke and Houdini, `sys.executable` is the application binary: the
+    interpreter found next to it is used instead, the bundled `python` for
+    Nuke and `hython` for Houdini.
+
+    Raises:
+        WorkerError: if no interpreter is found next to the application binary.
+
+    """
+    if 'nuke' in sys.modules:
+        names = ('python.exe', 'python3', 'python')
+    elif 'hou' in sys.modules:
+        names = ('hython.exe', 'hython')
+    else:
+        return ''
+
+    folder = os.path.dirname(sys.executable)
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            return path
+
+    raise WorkerError(
+        f'No Python interpreter found in {folder}: set the worker_executable setting.'
+    )
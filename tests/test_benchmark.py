@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import socket
+import threading
+from types import ModuleType
+from pathlib import Path
+
+import pytest
+from pytestqt.qtbot import QtBot
+
+PORT = 55604
+
+
+@pytest.fixture()
+def benchmark(monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    monkeypatch.syspath_prepend(str(Path(__file__).parent.parent / 'tools'))
+    import benchmark
+    return benchmark
+
+
+@pytest.fixture()
+def listener() -> socket.socket:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        s.listen()
+        yield s
+
+
+def test_make_payload(benchmark: ModuleType):
+    payload, expected = benchmark.make_payload(1024)
+    assert abs(len(payload) - 1024) < 64
+    assert expected == b'984\n'
+
+
+def test_run_benchmark(qtbot: QtBot, benchmark: ModuleType):
+    result = benchmark.run_benchmark(clients=2, requests=5, payload_sizes=[64, 1024], port=PORT)
+
+    assert result.errors == 0
+    assert len(result.latencies) == 10
+    assert result.summary()['requests_per_second'] > 0
+
+
+def test_send_request_timeout(benchmark: ModuleType, listener: socket.socket):
+    # the connection is accepted by the backlog but never answered
+    with pytest.raises(socket.timeout):
+        benchmark.send_request(listener.getsockname()[1], b'{}', b'', timeout=0.2)
+
+
+def test_run_client_counts_bad_replies(benchmark: ModuleType, listener: socket.socket):
+    def serve() -> None:
+        for _ in range(2):
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(65536)
+                connection.sendall(b'Traceback\n')
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    latencies = benchmark.run_client(listener.getsockname()[1], [(b'{}', b'1\n')], 2)
+    thread.join()
+
+    assert latencies == [None, None]
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import sys
+import types
+
+import pytest
+
+from nukeserversocket.blink import (KernelCache, kernel_name, push_kernels,
+                                    get_kernel_cache)
+
+
+class FakeKnob:
+    def __init__(self):
+        self.text = ''
+        self.executed = 0
+
+    def getText(self):
+        return self.text
+
+    def setText(self, text):
+        self.text = text
+
+    def setValue(self, value):
+        self.text = value
+
+    def execute(self):
+        self.executed += 1
+
+
+class FakeBlinkNode:
+    def __init__(self, name: str):
+        self._name = name
+        self.deleted = False
+        self._knobs = {k: FakeKnob() for k in ('kernelSource', 'kernelSourceFile', 'recompile')}
+
+    def name(self):
+        if self.deleted:
+            raise ValueError('A PythonObject is not attached to a node')
+        return self._name
+
+    def knobs(self):
+        return self._knobs
+
+    @property
+    def compiles(self) -> int:
+        return self._knobs['recompile'].executed
+
+
+@pytest.fixture()
+def fake_nuke(monkeypatch: pytest.MonkeyPatch):
+    nodes = {}
+    module = types.ModuleType('nuke')
+    module.lookups = 0
+
+    def to_node(name):
+        module.lookups += 1
+        return nodes.get(name)
+
+    def create_node(node_class, knobs):
+        name = knobs.split()[1]
+        nodes[name] = FakeBlinkNode(name)
+        return nodes[name]
+
+    module.toNode = to_node
+    module.createNode = create_node
+    module.nodes = nodes
+    monkeypatch.setitem(sys.modules, 'nuke', module)
+    get_kernel_cache().clear()
+    return module
+
+
+def test_kernel_name():
+    assert kernel_name('/path/to/Blur.blink') == 'Blur'
+
+
+def test_kernel_cache_skips_unchanged_source(fake_nuke):
+    cache = KernelCache()
+
+    result = cache.push('Blur', 'kernel A', 'Blur.blink')
+    assert result.compiled
+    assert 'compiled in' in str(result)
+
+    result = cache.push('Blur', 'kernel A')
+    assert not result.compiled
+    assert 'skipped' in str(result)
+
+    assert cache.push('Blur', 'kernel B').compiled
+
+    node = fake_nuke.nodes['Blur']
+    assert node.compiles == 2
+    assert node.knobs()['kernelSource'].text == 'kernel B'
+    assert fake_nuke.lookups == 1
+
+
+def test_kernel_cache_source_edited_in_node(fake_nuke):
+    cache = KernelCache()
+    cache.push('Blur', 'kernel A')
+    fake_nuke.nodes['Blur'].knobs()['kernelSource'].setText('edited')
+
+    assert cache.push('Blur', 'kernel A').compiled
+
+
+def test_kernel_cache_deleted_node(fake_nuke):
+    cache = KernelCache()
+    cache.push('Blur', 'kernel A')
+
+    fake_nuke.nodes.pop('Blur').deleted = True
+
+    assert cache.push('Blur', 'kernel A').compiled
+    assert fake_nuke.nodes['Blur'].compiles == 1
+
+
+def test_push_kernels(fake_nuke):
+    result = push_kernels({'kernels': [
+        {'file': 'path/Blur.blink', 'text': 'kernel Blur'},
+        {'name': 'Sharpen', 'text': 'kernel Sharpen'},
+    ]})
+
+    assert [(k['name'], k['compiled']) for k in result['kernels']] == [
+        ('Blur', True), ('Sharpen', True)
+    ]
+
+    with pytest.raises(ValueError):
+        push_kernels({'kernels': [{'text': 'kernel'}]})
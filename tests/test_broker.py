@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import socket
+import asyncio
+import threading
+from typing import Any, Callable
+
+import pytest
+from pytestqt.qtbot import QtBot
+
+from nukeserversocket.broker import Broker, parse_address
+from nukeserversocket.client import NssClient
+from nukeserversocket.headless import start_server
+from nukeserversocket.settings import _NssSettings
+
+PORT = 55562
+BACKEND_PORTS = (55563, 55564)
+
+
+class BrokerThread:
+    """Run a broker event loop in a background thread."""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(broker.start('127.0.0.1', PORT))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait(5)
+
+    def call(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def stop(self) -> None:
+        self.call(self.broker.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+@pytest.fixture()
+def backends(qtbot: QtBot, mock_settings: _NssSettings):
+    servers = [start_server(port, 'tcp') for port in BACKEND_PORTS]
+
+    yield servers
+
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture()
+def broker(backends) -> BrokerThread:
+    broker = BrokerThread(Broker(
+        [f'127.0.0.1:{port}' for port in BACKEND_PORTS], health_interval=60
+    ))
+
+    yield broker
+
+    broker.stop()
+
+
+def wait(qtbot: QtBot, func: Callable[..., Any], *args: Any) -> Any:
+    """Run the call in a thread while the backends event loop is running."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)), daemon=True)
+    thread.start()
+    qtbot.waitUntil(lambda: not thread.is_alive(), timeout=5000)
+    return result[0]
+
+
+def test_parse_address():
+    assert parse_address('host:1234') == ('host', 1234)
+    assert parse_address(':1234') == ('127.0.0.1', 1234)
+
+    with pytest.raises(ValueError):
+        parse_address('host')
+
+
+def test_broker_choose_least_outstanding():
+    broker = Broker(['127.0.0.1:1', '127.0.0.1:2'], sticky=False)
+    first, second = broker.backends
+
+    first.outstanding = 2
+    assert broker.choose('client') is second
+
+    second.healthy = False
+    assert broker.choose('client') is first
+
+    first.healthy = False
+    assert broker.choose('client') is None
+
+
+def test_broker_choose_sticky():
+    broker = Broker(['127.0.0.1:1', '127.0.0.1:2'])
+    first, second = broker.backends
+
+    assert broker.choose('a') is first
+    first.outstanding = 5
+    assert broker.choose('a') is first
+    assert broker.choose('b') is second
+
+    # an unhealthy backend loses its clients
+    first.healthy = False
+    assert broker.choose('a') is second
+
+
+def test_broker_forwards_across_backends(qtbot: QtBot, broker: BrokerThread):
+    requests = [{'text': 'print(1)', 'session': str(i)} for i in range(4)]
+
+    with NssClient(port=PORT) as client:
+        responses = wait(qtbot, client.pipeline, requests)
+
+    assert [r.output for r in responses] == ['1\n'] * 4
+    assert [b.served for b in broker.broker.backends] == [2, 2]
+
+
+@pytest.mark.parametrize('text, expected', [
+    (f"print(len('{'x' * 200_000}'))", b'200000\n'),
+    ('x = 1', b''),
+])
+def test_broker_legacy_client(qtbot: QtBot, broker: BrokerThread, text: str, expected: bytes):
+    def request() -> bytes:
+        with socket.create_connection(('127.0.0.1', PORT)) as s:
+            s.sendall(json.dumps({'text': text}).encode('utf-8'))
+            return b''.join(iter(lambda: s.recv(65536), b''))
+
+    assert wait(qtbot, request) == expected
+
+
+def test_broker_commands(qtbot: QtBot, broker: BrokerThread):
+    with NssClient(port=PORT) as client:
+        registered = wait(qtbot, lambda: client.command('broker.register', port=55565).json())
+        status = wait(qtbot, lambda: client.command('broker.backends').json())
+        unregistered = wait(qtbot, lambda: client.command('broker.unregister', port=55565).json())
+
+    assert registered == {'registered': '127.0.0.1:55565'}
+    assert [b['address'] for b in status['backends']][-1] == '127.0.0.1:55565'
+    assert unregistered == {'unregistered': True}
+
+
+def test_broker_health_check(qtbot: QtBot, broker: BrokerThread):
+    broker.broker.add_backend('127.0.0.1', 55565)
+
+    wait(qtbot, broker.call, broker.broker.check_health())
+
+    assert [b.healthy for b in broker.broker.backends] == [True, True, False]
+
+
+def test_broker_no_backend(qtbot: QtBot, broker: BrokerThread):
+    # removed rather than marked unhealthy: a health check could be in flight
+    for port in BACKEND_PORTS:
+        broker.call(broker.broker.remove_backend('127.0.0.1', port))
+
+    with NssClient(port=PORT) as client:
+        response = wait(qtbot, client.execute, 'print(1)')
+
+    assert response.error.startswith('NoBackendAvailable')
+
+
+def test_broker_broadcast(qtbot: QtBot, broker: BrokerThread):
+    with NssClient(port=PORT) as client:
+        result = wait(qtbot, lambda: client.command(
+            'broker.broadcast', request={'text': 'print(1)'}, timeout=5
+        ).json())
+
+    assert result['summary'] == {'targets': 2, 'ok': 2, 'error': 0, 'timeout': 0, 'unreachable': 0}
+    assert [r['output'] for r in result['results'].values()] == ['1\n', '1\n']
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import array
+
+from nukeserversocket.bulk import load, pack
+
+
+def test_pack_base64():
+    result = pack([1.0, 2.0, 3.0, 4.0], [2, 2])
+
+    assert result['dtype'][1:] == 'f8'
+    assert result['shape'] == [2, 2]
+    assert array.array('d', load(result)).tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_pack_shared_memory():
+    result = pack(array.array('f', [0.5] * 10), [10], use_shm=True)
+
+    assert 'data' not in result
+    assert array.array('f', load(result)).tolist() == [0.5] * 10
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import os
+import time
+import socket
+import asyncio
+from typing import Any, Callable
+from unittest.mock import ANY
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pytestqt.qtbot import QtBot
+
+from nukeserversocket.shm import SharedBuffer
+from nukeserversocket.delta import get_delta_store
+from nukeserversocket.client import (NssClient, AsyncNssClient, broadcast,
+                                     make_request)
+from nukeserversocket.server import NssServer
+from nukeserversocket.headless import start_server
+from nukeserversocket.settings import _NssSettings
+from nukeserversocket.utils.watchdog import is_running
+
+PORT = 55561
+
+
+@pytest.fixture()
+def server(qtbot: QtBot, mock_settings: _NssSettings) -> NssServer:
+    server = start_server(PORT, 'tcp')
+
+    yield server
+
+    server.close()
+
+
+def run(qtbot: QtBot, func: Callable[..., Any], *args: Any) -> Any:
+    """Run the client call in a thread while the server event loop is running."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(func, *args)
+        qtbot.waitUntil(future.done, timeout=5000)
+        return future.result()
+
+
+def test_client_execute(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT) as client:
+        response = run(qtbot, client.execute, "print('hello')")
+
+    assert response.ok
+    assert response.output == 'hello\n'
+    assert response.elapsed > 0
+
+
+def test_client_reuses_connection(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT, pool_size=1) as client:
+        for i in range(3):
+            assert run(qtbot, client.execute, f'print({i})').output == f'{i}\n'
+
+        assert len(server._connections) == 1
+
+
+def test_client_pipeline(qtbot: QtBot, server: NssServer):
+    requests = [make_request(f'print({i})', priority='bulk') for i in range(5)]
+    requests.append(make_request('print("first")', priority='interactive'))
+
+    with NssClient(port=PORT) as client:
+        responses = run(qtbot, client.pipeline, requests)
+
+    assert [r.id for r in responses] == [r['id'] for r in requests]
+    assert [r.output for r in responses] == [f'{i}\n' for i in range(5)] + ['first\n']
+
+
+def test_client_large_request_and_reply(qtbot: QtBot, server: NssServer):
+    # larger than a single socket read
+    code = f"print(len('{'x' * 1_000_000}') * 'y')"
+
+    with NssClient(port=PORT) as client:
+        response = run(qtbot, client.execute, code)
+
+    assert response.output == 'y' * 1_000_000 + '\n'
+
+
+def test_client_command(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT, compress=False) as client:
+        response = run(qtbot, lambda: client.command('cancel', id='missing'))
+
+    assert response.json() == {'id': 'missing', 'cancelled': False}
+
+
+def test_client_execute_file(qtbot: QtBot, server: NssServer, tmp_path):
+    script = tmp_path / 'tool.py'
+    script.write_text('print(6 * 7)')
+
+    with NssClient(port=PORT) as client:
+        assert run(qtbot, client.execute_file, str(script)).output == '42\n'
+
+        response = run(qtbot, lambda: client.execute_file(str(script), mtime=0))
+        assert response.error.startswith('SourceMismatch')
+
+        response = run(qtbot, client.execute_file, str(tmp_path / 'missing.py'))
+        assert response.error.startswith('FileNotFoundError')
+
+
+def test_client_execute_delta(qtbot: QtBot, server: NssServer):
+    get_delta_store().clear()
+    padding = ''.join(f'# line {i}\n' for i in range(100))
+
+    with NssClient(port=PORT) as client:
+        assert run(qtbot, client.execute_delta, padding + 'print(1)', 'tool.py').output == '1\n'
+
+        sent = []
+        send = client.send
+        client.send = lambda request: sent.append(request) or send(request)
+
+        assert run(qtbot, client.execute_delta, padding + 'print(2)', 'tool.py').output == '2\n'
+        assert 'delta' in sent[-1] and 'text' not in sent[-1]
+
+        # the server lost the base: the full text is sent again
+        get_delta_store().clear()
+        assert run(qtbot, client.execute_delta, padding + 'print(3)', 'tool.py').output == '3\n'
+        assert 'delta' in sent[-2] and sent[-1]['text'] == padding + 'print(3)'
+
+
+def test_client_worker_request(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT) as client:
+        request = {'text': 'import os\nprint(os.getpid())', 'worker': True}
+        response = run(qtbot, client.send, request)
+        assert response.ok
+        assert int(response.output) != os.getpid()
+
+        response = run(qtbot, lambda: client.send(
+            {'text': 'while True: pass', 'worker': True, 'timeout': 0.5}
+        ))
+        assert response.error.startswith('ExecutionTimeout')
+
+
+def test_client_cancel_worker_request(qtbot: QtBot, server: NssServer):
+    def cancel(client: NssClient) -> None:
+        while not client.command('cancel', id='w').json()['cancelled']:
+            time.sleep(0.05)
+
+    with NssClient(port=PORT) as client, ThreadPoolExecutor(max_workers=1) as executor:
+        request = {'id': 'w', 'text': 'while True: pass', 'worker': True}
+        future = executor.submit(client.send, request)
+        run(qtbot, cancel, client)
+        qtbot.waitUntil(future.done, timeout=5000)
+
+        assert future.result().error.startswith('ExecutionCancelled')
+
+
+def test_client_cancel(qtbot: QtBot, server: NssServer):
+    def cancel(client: NssClient) -> bool:
+        deadline = time.monotonic() + 3
+        while not is_running('r') and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return client.cancel('r')
+
+    with NssClient(port=PORT, timeout=5) as client, ThreadPoolExecutor(max_workers=1) as executor:
+        # the timeout only stops the script if the cancellation fails
+        request = {'id': 'r', 'text': 'while True: pass', 'timeout': 4}
+        future = executor.submit(client.send, request)
+        with NssClient(port=PORT, timeout=0.5) as canceller:
+            assert run(qtbot, cancel, canceller)
+        qtbot.waitUntil(future.done, timeout=5000)
+
+        assert future.result().error.startswith('ExecutionCancelled')
+        assert not run(qtbot, client.cancel, 'r')
+
+
+def test_client_jobs(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT) as client:
+        code = 'import time\ntime.sleep(0.2)\nprint(1)'
+        slow = run(qtbot, lambda: client.submit(code, id='slow'))
+        fast = run(qtbot, client.submit, 'print(2)')
+        assert slow == 'slow'
+
+        # the client can disconnect and collect the results later
+        client.close()
+
+    with NssClient(port=PORT) as client:
+        assert run(qtbot, lambda: client.command('status', job='missing').json()) == {
+            'job': 'missing', 'status': 'unknown'
+        }
+
+        reply = run(qtbot, lambda: client.command('wait', jobs=[slow, fast], timeout=5).json())
+        assert [(job['status'], job['output']) for job in reply['jobs']] == [
+            ('done', '1\n'), ('done', '2\n')
+        ]
+        assert run(qtbot, lambda: client.command('result', job=fast).json())['output'] == '2\n'
+
+
+def test_client_wait_timeout(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT) as client:
+        # a worker job does not block the server while it runs
+        request = {'id': 'job', 'text': 'import time\ntime.sleep(1)', 'worker': True}
+        assert run(qtbot, lambda: client.command('submit', request=request).json()) == {
+            'job': 'job', 'status': 'pending', 'created': ANY, 'finished': None
+        }
+
+        reply = run(qtbot, lambda: client.command('wait', job='job', timeout=0.1).json())
+        assert reply['status'] == 'pending'
+
+        reply = run(qtbot, lambda: client.command('wait', job='job', timeout=4).json())
+        assert reply['status'] == 'done'
+
+
+def test_client_poll(qtbot: QtBot, server: NssServer):
+    code = 'print("\\n".join(f"node {i}" for i in range(100)))\nprint(nss_state)'
+
+    with NssClient(port=PORT) as client:
+        replies = []
+        send = client.send
+        client.send = lambda request: replies.append(send(request)) or replies[-1]
+
+        def poll(state: str, delta: bool = False):
+            run(qtbot, client.execute, f'import builtins\nbuiltins.nss_state = {state!r}')
+            return run(qtbot, lambda: client.poll(code, delta=delta))
+
+        assert poll('a').output.endswith('node 99\na\n')
+        assert not replies[-1].unchanged
+
+        assert poll('a').output.endswith('node 99\na\n')
+        assert replies[-1].unchanged and replies[-1].output == ''
+
+        # without delta the changed output is sent in full
+        assert poll('b').output.endswith('node 99\nb\n')
+        assert replies[-1].delta is None and replies[-1].output
+
+        poll('b', delta=True)
+        assert poll('c', delta=True).output.endswith('node 99\nc\n')
+        assert replies[-1].delta == [100, -1, ['c\n']] and replies[-1].output == ''
+
+
+def test_client_error_response(qtbot: QtBot, server: NssServer):
+    with NssClient(port=PORT) as client:
+        response = run(qtbot, lambda: client.execute('while True: pass', timeout=0.2))
+
+    assert response.error.startswith('ExecutionTimeout')
+
+
+def test_client_retries_closed_connection(qtbot: QtBot, server: NssServer):
+    client = NssClient(port=PORT, pool_size=1)
+    assert run(qtbot, client.execute, 'print(1)').output == '1\n'
+
+    for connection in list(server._connections):
+        connection.socket.close()
+    qtbot.waitUntil(lambda: not server._connections)
+
+    assert run(qtbot, client.execute, 'print(2)').output == '2\n'
+    client.close()
+
+
+def test_client_duplicate_ids():
+    with pytest.raises(ValueError):
+        NssClient(port=PORT).pipeline([{'text': '', 'id': '1'}, {'text': '', 'id': '1'}])
+
+
+def test_async_client(qtbot: QtBot, server: NssServer):
+    async def main():
+        async with AsyncNssClient(port=PORT, pool_size=2) as client:
+            single = await client.execute('print(1)')
+            gathered = await asyncio.gather(*(client.execute(f'print({i})') for i in range(4)))
+            pipelined = await client.pipeline([{'text': 'print("a")'}, {'text': 'print("b")'}])
+            return single, gathered, pipelined
+
+    single, gathered, pipelined = run(qtbot, asyncio.run, main())
+
+    assert single.output == '1\n'
+    assert [r.output for r in gathered] == [f'{i}\n' for i in range(4)]
+    assert [r.output for r in pipelined] == ['a\n', 'b\n']
+
+
+def test_broadcast(qtbot: QtBot, server: NssServer):
+    # accepts connections but never replies
+    silent = socket.create_server(('127.0.0.1', 0))
+    silent_address = f'127.0.0.1:{silent.getsockname()[1]}'
+
+    targets = [f'127.0.0.1:{PORT}', silent_address, '127.0.0.1:1']
+    try:
+        result = run(qtbot, lambda: broadcast(targets, 'print(1)', timeout=0.5))
+    finally:
+        silent.close()
+
+    assert result.status == {
+        f'127.0.0.1:{PORT}': 'ok', silent_address: 'timeout', '127.0.0.1:1': 'unreachable'
+    }
+    assert result.responses[f'127.0.0.1:{PORT}'].output == '1\n'
+    assert result.summary() == {'targets': 3, 'ok': 1, 'error': 0, 'timeout': 1, 'unreachable': 1}
+    assert not result.ok
+
+
+def test_client_shared_memory_data(qtbot: QtBot, server: NssServer):
+    code = (
+        'from nukeserversocket.shm import request_data, reply_data\n'
+        'with request_data() as view:\n'
+        '    reply_data(bytes(view)[::-1])\n'
+        "print('done')"
+    )
+
+    with NssClient(port=PORT) as client:
+        response = run(qtbot, lambda: client.execute(code, data=b'0123456789' * 100_000))
+
+    assert response.output == 'done\n', response
+    reply = SharedBuffer.from_handle(response.data)
+    with reply as view:
+        assert bytes(view[:10]) == b'9876543210'
+        assert len(view) == 1_000_000
+    reply.unlink()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import pytest
+
+from nukeserversocket.delta import (DeltaStore, OutputCache, DeltaMismatch,
+                                    text_hash, make_delta, apply_delta)
+
+BASE = ''.join(f'line {i}\n' for i in range(2000))
+
+
+@pytest.mark.parametrize('text', [
+    BASE,
+    BASE.replace('line 1000\n', 'line 1000!\n'),
+    'first\n' + BASE,
+    BASE + 'last',
+    BASE.replace('line 5\n', ''),
+    '',
+])
+def test_delta_roundtrip(text: str):
+    assert apply_delta(BASE, make_delta(BASE, text)) == text
+
+
+def test_delta_is_compact():
+    ops = make_delta(BASE, BASE.replace('line 1000\n', 'line 1000!\n'))
+    assert ops == [1000, -1, ['line 1000!\n'], 999]
+
+
+@pytest.mark.parametrize('ops', [[2001], [10], [1999, 'x'], [True]])
+def test_delta_malformed(ops):
+    with pytest.raises(ValueError):
+        apply_delta(BASE, ops)
+
+
+def test_delta_store():
+    store = DeltaStore()
+    store.remember('a', 'tool.py', BASE)
+    text = BASE + 'print(1)\n'
+    delta = {'base': text_hash(BASE), 'ops': make_delta(BASE, text), 'hash': text_hash(text)}
+
+    assert store.apply('a', 'tool.py', delta) == text
+
+    # the rebuilt text is the base of the next delta
+    with pytest.raises(DeltaMismatch):
+        store.apply('a', 'tool.py', delta)
+
+
+def test_delta_store_mismatch():
+    store = DeltaStore()
+    store.remember('a', 'tool.py', BASE)
+    delta = {'base': text_hash(BASE), 'ops': make_delta(BASE, BASE)}
+
+    with pytest.raises(DeltaMismatch):
+        store.apply('b', 'tool.py', delta)
+    with pytest.raises(DeltaMismatch):
+        store.apply('a', 'other.py', delta)
+    with pytest.raises(DeltaMismatch):
+        store.apply('a', 'tool.py', dict(delta, hash='0' * 40))
+
+
+def test_delta_store_eviction():
+    store = DeltaStore(max_entries=2)
+    for file in ('a.py', 'b.py', 'c.py'):
+        store.remember('a', file, BASE)
+
+    assert len(store) == 2
+
+
+def test_output_cache_delta():
+    outputs = OutputCache()
+    outputs.add(text_hash(BASE), BASE)
+    text = BASE.replace('line 7\n', 'line 7!\n')
+
+    assert apply_delta(BASE, outputs.delta(text_hash(BASE), text)) == text
+    assert outputs.delta(text_hash(text), text) is None
+    # a delta larger than the output is not worth it
+    assert outputs.delta(text_hash(BASE), 'short') is None
+
+
+def test_output_cache_max_size():
+    outputs = OutputCache(max_size=10)
+    outputs.add('a', '123456')
+    outputs.add('b', '123456')
+    outputs.add('c', 'x' * 11)
+
+    assert len(outputs) == 1
+    assert outputs.delta('a', '123456') is None
+    assert outputs.delta('b', '123456') == [1]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+from pytestqt.qtbot import QtBot
+
+from nukeserversocket.headless import HeadlessController, main, start_server
+from nukeserversocket.settings import _NssSettings
+from nukeserversocket.received_data import ReceivedData
+
+PORT = 55560
+
+
+def test_headless_controller_execute():
+    data = ReceivedData(json.dumps({'text': "print('hello'.upper())"}))
+    assert HeadlessController().execute(data) == 'HELLO\n'
+
+
+def test_headless_start_server(qtbot: QtBot, mock_settings: _NssSettings):
+    server = start_server(PORT, 'tcp')
+    try:
+        assert server.isListening()
+    finally:
+        server.close()
+
+
+def test_headless_start_server_error(qtbot: QtBot, mock_settings: _NssSettings):
+    with pytest.raises(RuntimeError):
+        start_server(PORT, 'udp')
+
+
+def test_headless_main_port_in_use(qtbot: QtBot, mock_settings: _NssSettings):
+    server = start_server(PORT, 'tcp')
+    try:
+        assert main(['--port', str(PORT), '--transport', 'tcp']) == 1
+    finally:
+        server.close()
+
+
+def test_headless_does_not_import_widgets(mock_settings: _NssSettings):
+    code = (
+        'import sys; import nukeserversocket.headless; '
+        "print('PySide2.QtWidgets' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, env=os.environ.copy()
+    )
+    assert result.stdout.strip() == 'False', result.stderr
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from nukeserversocket.jobs import (JobStore, JobLimitExceeded, job_ids,
+                                   job_reply)
+from nukeserversocket.protocol import Response
+
+
+def test_job_store_lifecycle():
+    store = JobStore()
+    job = store.create('a')
+    assert job.status == 'pending'
+    assert not store.done(['a'])
+
+    store.finish('a', Response('a', 'hello\n', elapsed=0.5))
+
+    assert store.done(['a'])
+    assert store.report(['a', 'b'], output=True) == [
+        {'job': 'a', 'status': 'done', 'created': job.created, 'finished': job.finished,
+         'output': 'hello\n', 'error': None, 'elapsed': 0.5, 'data': None},
+        {'job': 'b', 'status': 'unknown'},
+    ]
+    assert 'output' not in store.report(['a'], output=False)[0]
+
+
+def test_job_store_failed():
+    store = JobStore()
+    store.create('a')
+    store.finish('a', Response('a', error='ExecutionTimeout: too long'))
+
+    assert store.get('a').status == 'failed'
+
+
+def test_job_store_duplicate_id():
+    store = JobStore()
+    store.create('a')
+    with pytest.raises(ValueError):
+        store.create('a')
+
+
+def test_job_store_ttl():
+    store = JobStore(ttl=0.01)
+    store.create('a')
+    store.create('b')
+    store.finish('a', Response('a'))
+    time.sleep(0.05)
+
+    assert store.get('a') is None
+    # pending jobs do not expire
+    assert store.get('b') is not None
+
+
+def test_job_store_max_jobs():
+    store = JobStore(max_jobs=2)
+    store.create('a')
+    store.create('b')
+    with pytest.raises(JobLimitExceeded):
+        store.create('c')
+
+    store.finish('b', Response('b'))
+    store.create('c')
+    assert store.get('b') is None
+    assert len(store) == 2
+
+
+def test_job_store_max_result_size():
+    store = JobStore(max_result_size=10)
+    store.create('a')
+    store.finish('a', Response('a', 'x' * 11))
+
+    assert store.get('a').response.error.startswith('ResultTooLarge')
+
+
+def test_job_args():
+    assert job_ids({'job': 'a'}) == ['a']
+    assert job_ids({'jobs': ['a', 'b']}) == ['a', 'b']
+    assert job_reply({'job': 'a'}, [{'job': 'a'}]) == {'job': 'a'}
+    assert job_reply({'jobs': ['a']}, [{'job': 'a'}]) == {'jobs': [{'job': 'a'}]}
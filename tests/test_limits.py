@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import List
+
+from nukeserversocket.limits import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+    assert bucket.consume()
+    assert bucket.consume()
+    assert not bucket.consume()
+
+    clock.now = 0.5
+    assert bucket.consume()
+    assert not bucket.consume()
+
+    # never refills above the burst
+    clock.now = 100
+    assert bucket.tokens == 2
+
+
+def test_rate_limiter_per_client():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=2, clock=clock)
+
+    results: List[bool] = [limiter.allow('a') for _ in range(3)]
+    assert results == [True, True, False]
+
+    # other clients have their own bucket
+    assert limiter.allow('b')
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(rate=0)
+    assert all(limiter.allow('a') for _ in range(1000))
+
+
+def test_rate_limiter_configure_resets_buckets():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=1, clock=clock)
+
+    assert limiter.allow('a')
+    assert not limiter.allow('a')
+
+    limiter.configure(rate=1, burst=5)
+    assert limiter.allow('a')
@@ -44,7 +44,7 @@ class MockServer(QObject):
     def __init__(self, editor: MockEditorController, parent: Optional[QWidget] = None):
         super().__init__(parent)
 
-    def try_connect(self, port: int) -> bool:
+    def try_connect(self, port: int, transport: str = 'tcp') -> bool:
         return True
 
     def isListening(self) -> bool:
@@ -110,3 +110,8 @@ def test_main_controller_on_data_received(controller: Controller):
     controller._on_data_received()
 
     assert controller._timer.isActive() is True
+
+
+def test_main_controller_ip_lookup(qtbot: QtBot, controller: Controller, view: View):
+    qtbot.waitUntil(lambda: view.ip_label.text() != '...')
+    assert view.ip_label.text().count('.') == 3
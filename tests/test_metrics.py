@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from nukeserversocket.metrics import NssMetrics, get_metrics
+
+
+def test_metrics_increment():
+    metrics = NssMetrics()
+    metrics.increment('requests')
+    metrics.increment('requests')
+    metrics.increment('bytes', 1.5)
+
+    assert metrics.get('requests') == 2
+    assert metrics.get('bytes') == 1.5
+    assert metrics.get('missing') == 0
+    assert metrics.snapshot() == {'requests': 2, 'bytes': 1.5}
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_get_metrics_singleton():
+    assert get_metrics() is get_metrics()
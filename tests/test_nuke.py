@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import sys
 import json
+import math
+import array
+import types
 from textwrap import dedent
 
 import pytest
 from pytestqt.qtbot import QtBot
-from PySide2.QtWidgets import QTextEdit, QPushButton, QPlainTextEdit
+from PySide2.QtWidgets import QWidget, QTextEdit, QPushButton, QPlainTextEdit
 
+from nukeserversocket.bulk import load
+from nukeserversocket.server import NssServer
+from nukeserversocket.commands import is_queued
 from nukeserversocket.settings import _NssSettings
 from nukeserversocket.received_data import ReceivedData
-from nukeserversocket.controllers.nuke import NukeController, NukeScriptEditor
+from nukeserversocket.controllers.nuke import (NukeController,
+                                               NukeScriptEditor, read_knobs,
+                                               batch_context, sample_pixels)
 
 
 class MockNukeEditor(NukeScriptEditor):
@@ -53,9 +62,171 @@ def test_nuke_blinkscript(qtbot: QtBot, mock_settings: _NssSettings, file: str,
     editor.execute(data)
 
     assert editor.editor.input_editor.toPlainText() == dedent(f"""
-    node = nuke.toNode("test") or nuke.createNode('BlinkScript', 'name test')
-    knobs = node.knobs()
-    knobs['kernelSourceFile'].setValue('{file}')
-    knobs['kernelSource'].setText("{text}")
-    knobs['recompile'].execute()
+    from nukeserversocket.blink import push_kernel
+    print(push_kernel("test", "{text}", "{file}"))
     """).strip()
+
+
+class FakeKnob:
+    def __init__(self, value):
+        self._value = value
+
+    def getValue(self, index=0):
+        if isinstance(self._value, str):
+            raise TypeError('not an array knob')
+        return self._value[index] if isinstance(self._value, list) else self._value
+
+    def value(self):
+        return self._value
+
+
+class FakeNode:
+    def __init__(self, name: str, knobs: dict):
+        self._name = name
+        self._knobs = {k: FakeKnob(v) for k, v in knobs.items()}
+
+    def fullName(self):
+        return self._name
+
+    def knob(self, name):
+        return self._knobs.get(name)
+
+    def width(self):
+        return 3
+
+    def height(self):
+        return 2
+
+    def sample(self, channel, x, y, *args):
+        return {'rgba.red': x, 'rgba.green': y}[channel]
+
+
+class FakeUndo:
+    def __init__(self):
+        self.calls = []
+        self.is_disabled = False
+
+    def begin(self, name):
+        self.calls.append('begin')
+
+    def end(self):
+        self.calls.append('end')
+
+    def disable(self):
+        self.calls.append('disable')
+        self.is_disabled = True
+
+    def enable(self):
+        self.calls.append('enable')
+        self.is_disabled = False
+
+    def disabled(self):
+        return self.is_disabled
+
+
+@pytest.fixture()
+def fake_nuke(monkeypatch: pytest.MonkeyPatch):
+    nodes = {
+        'Blur1': FakeNode('Blur1', {'size': 10.0, 'filter': 'gaussian'}),
+        'Transform1': FakeNode('Transform1', {'translate': [1.0, 2.0]}),
+    }
+    module = types.ModuleType('nuke')
+    module.allNodes = lambda: list(nodes.values())
+    module.toNode = nodes.get
+    module.Undo = FakeUndo()
+    monkeypatch.setitem(sys.modules, 'nuke', module)
+    return module
+
+
+def test_nuke_read_knobs(fake_nuke):
+    result = read_knobs({'knobs': ['size', 'filter', 'translate'], 'index': 1})
+
+    assert result['nodes'] == ['Blur1', 'Transform1']
+    assert result['shape'] == [2, 3]
+
+    values = array.array('d', load(result)).tolist()
+    assert values[0] == 10.0
+    assert values[5] == 2.0
+    # non numeric and missing knobs
+    assert all(math.isnan(v) for v in values[1:5])
+
+
+def test_nuke_sample_pixels(fake_nuke):
+    result = sample_pixels({'node': 'Blur1', 'channels': ['rgba.red', 'rgba.green'], 'shm': True})
+
+    assert result['dtype'][1:] == 'f4'
+    assert result['shape'] == [2, 3, 2]
+    values = array.array('f', load(result)).tolist()
+    # first row, second pixel
+    assert values[2:4] == [1.5, 0.5]
+
+
+def test_nuke_sample_pixels_missing_node(fake_nuke):
+    with pytest.raises(ValueError):
+        sample_pixels({'node': 'Missing'})
+
+
+def test_nuke_controller_commands(qtbot: QtBot, mock_settings: _NssSettings):
+    editor = NukeController(MockNukeEditor())
+    assert set(editor.commands()) == {'knobs', 'sample', 'blink'}
+
+    # they run host code: queued and executed under the watchdog like scripts
+    server = NssServer(editor)
+    assert all(is_queued(server, name) for name in editor.commands())
+    server.close()
+
+
+@pytest.mark.parametrize('mode, expected', (
+    ('group', ['begin', 'end']),
+    ('no_undo', ['disable', 'enable']),
+))
+def test_nuke_batch(qtbot: QtBot, fake_nuke, mode: str, expected: list):
+    graph = QWidget()
+    graph.setObjectName('DAG.1')
+
+    with batch_context(mode):
+        assert not graph.updatesEnabled()
+
+    assert graph.updatesEnabled()
+    assert fake_nuke.Undo.calls == expected
+
+
+def test_nuke_batch_restores_on_error(qtbot: QtBot, fake_nuke):
+    graph = QWidget()
+    graph.setObjectName('DAG.1')
+
+    with pytest.raises(RuntimeError):
+        with batch_context('group'):
+            raise RuntimeError('boom')
+
+    assert graph.updatesEnabled()
+    assert fake_nuke.Undo.calls == ['begin', 'end']
+
+
+def test_nuke_batch_keeps_undo_disabled(qtbot: QtBot, fake_nuke):
+    fake_nuke.Undo.is_disabled = True
+
+    with batch_context('no_undo'):
+        pass
+
+    assert fake_nuke.Undo.disabled()
+    assert fake_nuke.Undo.calls == []
+
+
+def test_nuke_batch_restores_on_setup_error(
+    qtbot: QtBot, fake_nuke, monkeypatch: pytest.MonkeyPatch
+):
+    graph = QWidget()
+    graph.setObjectName('DAG.1')
+
+    def begin(name):
+        raise RuntimeError('no undo')
+
+    monkeypatch.setattr(fake_nuke.Undo, 'begin', begin)
+
+    with pytest.raises(RuntimeError):
+        with batch_context('group'):
+            pass
+
+    assert graph.updatesEnabled()
+    assert fake_nuke.Undo.calls == []
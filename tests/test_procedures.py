@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import pytest
+
+from nukeserversocket.procedures import ProcedureRegistry
+
+
+@pytest.fixture()
+def registry() -> ProcedureRegistry:
+    return ProcedureRegistry()
+
+
+def test_procedure_invoke(registry: ProcedureRegistry):
+    registry.register('add', 'print(args["a"])\nresult = args["a"] + args["b"]')
+
+    assert registry.invoke('add', {'a': 1, 'b': 2}) == {'name': 'add', 'output': '1\n', 'result': 3}
+    assert registry.invoke('add', {'a': 5, 'b': 5})['result'] == 10
+    assert registry.get('add').calls == 2
+
+
+def test_procedure_fresh_namespace(registry: ProcedureRegistry):
+    registry.register('counter', 'count = globals().get("count", 0) + 1\nresult = count')
+
+    assert registry.invoke('counter')['result'] == 1
+    assert registry.invoke('counter')['result'] == 1
+
+
+def test_procedure_register_compiles_once(registry: ProcedureRegistry):
+    code = registry.register('noop', 'pass').code
+    assert registry.register('noop', 'pass').code is code
+    assert registry.register('noop', 'x = 1').code is not code
+
+
+def test_procedure_register_syntax_error(registry: ProcedureRegistry):
+    with pytest.raises(SyntaxError):
+        registry.register('bad', 'def')
+    assert registry.names() == []
+
+
+def test_procedure_unknown(registry: ProcedureRegistry):
+    with pytest.raises(ValueError, match='Unknown procedure: missing'):
+        registry.invoke('missing')
+
+
+def test_procedure_unregister(registry: ProcedureRegistry):
+    registry.register('a', 'pass')
+    registry.register('b', 'pass')
+
+    assert registry.names() == ['a', 'b']
+    assert registry.unregister('a')
+    assert not registry.unregister('a')
+    assert registry.names() == ['b']
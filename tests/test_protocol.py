@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import zlib
+
+import pytest
+
+from nukeserversocket.protocol import (MAGIC, HEADER, FLAG_COMPRESSED,
+                                       FLAG_ACCEPT_COMPRESSED, Response,
+                                       FrameDecoder, FrameTooLarge,
+                                       ProtocolError, is_framed, encode_frame)
+
+
+def test_frame_round_trip_partial_reads():
+    stream = encode_frame(b'first', FLAG_ACCEPT_COMPRESSED) + encode_frame(b'second')
+    decoder = FrameDecoder()
+
+    frames = []
+    for i in range(len(stream)):
+        frames += decoder.feed(stream[i:i + 1])
+
+    assert frames == [(FLAG_ACCEPT_COMPRESSED, b'first'), (0, b'second')]
+    assert len(decoder) == 0
+
+
+def test_frame_compression():
+    body = b'x' * 10_000
+    frame = encode_frame(body, compress=True)
+
+    assert len(frame) < len(body)
+    assert FrameDecoder().feed(frame) == [(FLAG_COMPRESSED, body)]
+
+    # small bodies are not compressed
+    assert FrameDecoder().feed(encode_frame(b'small', compress=True)) == [(0, b'small')]
+
+
+def test_frame_too_large():
+    with pytest.raises(FrameTooLarge):
+        FrameDecoder(max_size=10).feed(encode_frame(b'x' * 11))
+
+
+def test_frame_compressed_too_large():
+    body = zlib.compress(b'x' * 1_000_000)
+    frame = HEADER.pack(MAGIC, FLAG_COMPRESSED, len(body)) + body
+
+    with pytest.raises(FrameTooLarge):
+        FrameDecoder(max_size=10_000).feed(frame)
+
+
+def test_frame_invalid():
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(b'XXXX' + b'\0' * HEADER.size)
+
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(HEADER.pack(MAGIC, FLAG_COMPRESSED, 3) + b'bad')
+
+
+@pytest.mark.parametrize('head, expected', [
+    (b'', None),
+    (b'NS', None),
+    (MAGIC, True),
+    (MAGIC + b'\0', True),
+    (b'{"text"', False),
+])
+def test_is_framed(head: bytes, expected):
+    assert is_framed(head) is expected
+
+
+def test_response_round_trip():
+    response = Response('1', 'output', 'ExecutionTimeout: timed out', 0.5)
+    assert Response.from_bytes(response.to_bytes()) == response
+    assert not response.ok
+
+    with pytest.raises(ProtocolError):
+        Response.from_bytes(b'{"output": ""}')
+
+
+def test_response_legacy_text():
+    assert Response('1', 'output').legacy_text() == 'output'
+    assert Response('1').legacy_text() == ''
+
+    response = Response('1', error='ExecutionTimeout: timed out')
+    assert response.legacy_text() == 'ExecutionTimeout: timed out\n'
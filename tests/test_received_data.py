@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from typing import Dict
 from dataclasses import dataclass
 
@@ -76,3 +77,46 @@ def test_received_data(data: ReceivedTestData):
     assert received.text == data.text
     assert received.file == data.file
     assert received.format_text == data.format_text
+
+
+def test_received_data_request_options():
+    received = ReceivedData(
+        '{"text": "", "id": "abc", "timeout": "2.5", "command": "cancel", "args": {"id": "x"}}'
+    )
+
+    assert received.id == 'abc'
+    assert received.timeout == 2.5
+    assert received.command == 'cancel'
+    assert received.args == {'id': 'x'}
+
+
+def test_received_data_request_options_defaults():
+    received = ReceivedData('{"text": "Hello World", "timeout": "never"}')
+
+    assert len(received.id) == 32
+    assert received.timeout == 0
+    assert received.command == ''
+    assert received.args == {}
+
+
+@pytest.mark.parametrize('priority, expected', [
+    ('interactive', 'interactive'),
+    ('bulk', 'bulk'),
+    ('', 'normal'),
+    ('urgent', 'normal'),
+])
+def test_received_data_priority(priority: str, expected: str):
+    received = ReceivedData(f'{{"text": "Hello World", "priority": "{priority}"}}')
+    assert received.priority == expected
+
+
+@pytest.mark.parametrize('batch, expected', [
+    (True, 'group'),
+    ('group', 'group'),
+    ('no_undo', 'no_undo'),
+    (False, ''),
+    ('everything', 'group'),
+])
+def test_received_data_batch(batch, expected: str):
+    received = ReceivedData(json.dumps({'text': 'Hello World', 'batch': batch}))
+    assert received.batch == expected
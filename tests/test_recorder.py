@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+from nukeserversocket.recorder import (MAGIC, Record, TrafficRecorder,
+                                       read_records)
+
+
+def test_recorder_round_trip(tmp_path: pathlib.Path):
+    path = tmp_path / 'traffic.nssrec'
+
+    recorder = TrafficRecorder(path)
+    recorder.record(10.0, 0.5, '127.0.0.1', b'{"text": "print(1)"}')
+    recorder.close()
+
+    # reopening appends without a second header
+    recorder = TrafficRecorder(path)
+    recorder.record(11.0, 0.25, 'local', b'')
+    recorder.close()
+
+    assert list(read_records(path)) == [
+        Record(10.0, 0.5, '127.0.0.1', b'{"text": "print(1)"}'),
+        Record(11.0, 0.25, 'local', b''),
+    ]
+
+
+def test_recorder_truncated_record(tmp_path: pathlib.Path):
+    path = tmp_path / 'traffic.nssrec'
+
+    recorder = TrafficRecorder(path)
+    recorder.record(10.0, 0.5, 'local', b'first')
+    recorder.record(11.0, 0.5, 'local', b'second')
+    recorder.close()
+
+    path.write_bytes(path.read_bytes()[:-3])
+
+    assert [r.payload for r in read_records(path)] == [b'first']
+
+
+def test_recorder_bad_magic(tmp_path: pathlib.Path):
+    path = tmp_path / 'traffic.nssrec'
+    path.write_bytes(b'not a record' + MAGIC)
+
+    with pytest.raises(ValueError):
+        list(read_records(path))
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import os
+import sys
+import importlib
+
+import pytest
+
+from nukeserversocket.reloader import ModuleReloader
+
+
+def touch(path, text: str) -> None:
+    path.write_text(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+
+
+@pytest.fixture()
+def package(tmp_path, monkeypatch):
+    root = tmp_path / 'nss_reload_pkg'
+    root.mkdir()
+    (root / '__init__.py').write_text('')
+    (root / 'base.py').write_text('VALUE = 1\n')
+    (root / 'middle.py').write_text('from nss_reload_pkg import base\n')
+    (root / 'top.py').write_text(
+        'from nss_reload_pkg.middle import base\n'
+        'def value():\n'
+        '    return base.VALUE\n'
+    )
+    (root / 'other.py').write_text('OTHER = 1\n')
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    for name in ('top', 'other'):
+        importlib.import_module(f'nss_reload_pkg.{name}')
+
+    yield root
+
+    for name in list(sys.modules):
+        if name.startswith('nss_reload_pkg'):
+            del sys.modules[name]
+
+
+def test_reloader_reloads_changed_module_and_importers(package):
+    reloader = ModuleReloader()
+    assert reloader.reload(['nss_reload_pkg'])['reloaded'] == []
+
+    touch(package / 'base.py', 'VALUE = 2\n')
+    report = reloader.reload(['nss_reload_pkg'])
+
+    assert report['changed'] == ['nss_reload_pkg.base']
+    assert report['reloaded'] == [
+        'nss_reload_pkg.base', 'nss_reload_pkg.middle', 'nss_reload_pkg.top'
+    ]
+    assert report['errors'] == {}
+    assert sys.modules['nss_reload_pkg.top'].value() == 2
+
+    # up to date now
+    assert reloader.reload(['nss_reload_pkg'])['reloaded'] == []
+
+
+def test_reloader_forced_modules_and_dry_run(package):
+    reloader = ModuleReloader()
+    report = reloader.reload(['nss_reload_pkg'], modules=['nss_reload_pkg.base'], dry_run=True)
+
+    assert report['changed'] == ['nss_reload_pkg.base']
+    assert report['reloaded'] == [
+        'nss_reload_pkg.base', 'nss_reload_pkg.middle', 'nss_reload_pkg.top'
+    ]
+    assert sys.modules['nss_reload_pkg.top'].value() == 1
+
+
+def test_reloader_first_seen_changed_module(package, monkeypatch):
+    # the bytecode of `other` was compiled from an older version of the file
+    monkeypatch.setattr(
+        'nukeserversocket.reloader._bytecode_mtime',
+        lambda module: 0 if module.__name__ == 'nss_reload_pkg.other' else None
+    )
+    reloader = ModuleReloader()
+
+    for _ in range(2):
+        report = reloader.reload(['nss_reload_pkg'], dry_run=True)
+        assert report['changed'] == ['nss_reload_pkg.other']
+
+    touch(package / 'other.py', 'raise ValueError("broken")\n')
+    for _ in range(2):
+        report = reloader.reload(['nss_reload_pkg'])
+        assert list(report['errors']) == ['nss_reload_pkg.other']
+
+    touch(package / 'other.py', 'OTHER = 2\n')
+    assert reloader.reload(['nss_reload_pkg'])['reloaded'] == ['nss_reload_pkg.other']
+    assert reloader.reload(['nss_reload_pkg'])['reloaded'] == []
+
+
+def test_reloader_reports_errors(package):
+    reloader = ModuleReloader()
+    reloader.reload(['nss_reload_pkg'])
+
+    touch(package / 'other.py', 'raise ValueError("broken")\n')
+    report = reloader.reload(['nss_reload_pkg'])
+
+    assert report['reloaded'] == []
+    assert report['errors'] == {'nss_reload_pkg.other': 'ValueError: broken'}
+
+
+def test_reloader_skips_own_package():
+    reloader = ModuleReloader()
+    report = reloader.reload(
+        ['nukeserversocket'], modules=['nukeserversocket.server'], dry_run=True
+    )
+
+    assert report['scanned'] == 0
+    assert report['reloaded'] == []
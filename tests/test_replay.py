@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import time
+from typing import List, Tuple
+
+import pytest
+
+from nukeserversocket import replay
+from nukeserversocket.recorder import Record
+
+
+def test_replay_sorts_records_by_timestamp(monkeypatch: pytest.MonkeyPatch):
+    sent: List[Tuple[bytes, float]] = []
+
+    def send_payload(host: str, port: int, payload: bytes) -> float:
+        sent.append((payload, time.perf_counter()))
+        return 0.01
+
+    monkeypatch.setattr(replay, 'send_payload', send_payload)
+
+    # a slow request received first is recorded after a fast one
+    records = [
+        Record(100.3, 0.05, '127.0.0.1', b'fast'),
+        Record(100.0, 0.5, '127.0.0.1', b'slow'),
+    ]
+    result = replay.replay(records, speed=1, workers=1)
+
+    assert [payload for payload, _ in sent] == [b'slow', b'fast']
+    assert sent[1][1] - sent[0][1] >= 0.25
+    assert result.original == [0.5, 0.05]
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from nukeserversocket.scheduler import RequestScheduler
+
+
+def test_scheduler_fifo_single_lane():
+    scheduler: RequestScheduler[str] = RequestScheduler()
+    scheduler.push('1', 'a')
+    scheduler.push('2', 'b')
+
+    assert len(scheduler) == 2
+    assert scheduler.pop() == 'a'
+    assert scheduler.pop() == 'b'
+    assert scheduler.pop() is None
+
+
+def test_scheduler_weighted_lanes():
+    scheduler: RequestScheduler[str] = RequestScheduler()
+    for i in range(10):
+        scheduler.push(f'bulk{i}', 'bulk', 'bulk')
+        scheduler.push(f'normal{i}', 'normal', 'normal')
+        scheduler.push(f'interactive{i}', 'interactive', 'interactive')
+
+    served = [scheduler.pop() for _ in range(10)]
+
+    assert served.count('interactive') == 6
+    assert served.count('normal') == 3
+    assert served.count('bulk') == 1
+    assert served[0] == 'interactive'
+
+
+def test_scheduler_interactive_jumps_ahead_of_bulk():
+    scheduler: RequestScheduler[str] = RequestScheduler()
+    for i in range(5):
+        scheduler.push(f'bulk{i}', 'bulk', 'bulk')
+
+    assert scheduler.pop() == 'bulk'
+
+    scheduler.push('tweak', 'interactive', 'interactive')
+    assert scheduler.pop() == 'interactive'
+
+
+def test_scheduler_remove():
+    scheduler: RequestScheduler[str] = RequestScheduler()
+    scheduler.push('1', 'a', 'bulk')
+    scheduler.push('2', 'b', 'normal')
+
+    assert scheduler.remove('1') == 'a'
+    assert scheduler.remove('1') is None
+    assert scheduler.pending() == {'interactive': 0, 'normal': 1, 'bulk': 0}
+
+
+def test_scheduler_invalid_priority():
+    with pytest.raises(ValueError):
+        RequestScheduler().push('1', 'a', 'urgent')
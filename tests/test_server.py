@@ -1,16 +1,32 @@
 
 from __future__ import annotations
 
+import sys
 import json
+import time
 import socket
+import contextlib
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from PySide2.QtCore import QEvent, QCoreApplication
 from pytestqt.qtbot import QtBot
+from PySide2.QtNetwork import QTcpSocket
 from PySide2.QtWidgets import QTextEdit, QPlainTextEdit
 
 from nukeserversocket.utils import exec_code
-from nukeserversocket.server import NssServer
+from nukeserversocket.client import send_cancel
+from nukeserversocket.replay import replay
+from nukeserversocket.server import (NssServer, _QueuedRequest,
+                                     local_server_name)
+from nukeserversocket.metrics import get_metrics
+from nukeserversocket.commands import COMMANDS, is_queued
+from nukeserversocket.recorder import read_records
 from nukeserversocket.settings import _NssSettings
+from nukeserversocket.connection import NssConnection
+from nukeserversocket.procedures import get_procedures
+from nukeserversocket.received_data import ReceivedData
 from nukeserversocket.controllers.base import EditorController
 
 PORT = 55559
@@ -61,14 +77,23 @@ def server(editor: MockEditorController) -> NssServer:
     server.close()
 
 
+DATA = {
+    'text': "print('hello world'.upper())",
+    'file': 'path/file.py'
+}
+
+
 def send_data(port: int):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect(('127.0.0.1', port))
-    data = {
-        'text': "print('hello world'.upper())",
-        'file': 'path/file.py'
-    }
-    s.sendall(bytes(json.dumps(data), encoding='utf-8'))
+    s.sendall(bytes(json.dumps(DATA), encoding='utf-8'))
+    s.close()
+
+
+def send_local_data(path: str):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.connect(path)
+    s.sendall(bytes(json.dumps(DATA), encoding='utf-8'))
     s.close()
 
 
@@ -101,3 +126,479 @@ def test_server_on_new_connection_mirror_editor(qtbot: QtBot, server: NssServer)
 
     assert server._editor.output_editor.toPlainText().strip() == 'HELLO WORLD'
     assert server._editor.input_editor.toPlainText() == "print('hello world'.upper())"
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Unix domain sockets only')
+def test_server_local_transport(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', True)
+    server._editor.settings.set('format_output', '')
+    server._editor.settings.set('clear_output', True)
+
+    assert server.try_connect(PORT, 'local')
+    assert server.isListening()
+    assert server.local_server.serverName() == local_server_name(PORT)
+
+    send_local_data(server.local_server.fullServerName())
+
+    qtbot.wait(100)
+
+    assert server._editor.output_editor.toPlainText().strip() == 'HELLO WORLD'
+
+    # the tcp port is not exposed when using only the local transport
+    with pytest.raises(ConnectionRefusedError):
+        send_data(PORT)
+
+
+def test_server_invalid_transport(server: NssServer):
+    assert not server.try_connect(PORT, 'udp')
+    assert not server.isListening()
+    assert 'Invalid transport' in server.errorString()
+
+
+def request(port: int, data: Dict[str, str]) -> bytes:
+    """Send the data and read the response until the server closes the socket."""
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        s.sendall(bytes(json.dumps(data), encoding='utf-8'))
+        chunks: List[bytes] = []
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+
+def test_connection_write_after_delete(qtbot: QtBot):
+    connection = NssConnection(QTcpSocket())
+    connection._delete()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    # the socket is gone: the late reply is dropped instead of raising
+    connection.write(b'late reply')
+    connection.write_and_close(b'late reply')
+
+
+def test_server_large_response_is_not_truncated(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    get_metrics().reset()
+
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(request, PORT, {'text': "print('x' * 5_000_000)"})
+        qtbot.waitUntil(future.done, timeout=5000)
+        response = future.result()
+
+    assert len(response) == 5_000_001
+    assert get_metrics().get('responses_written') == 1
+    assert get_metrics().get('bytes_written') == 5_000_001
+
+
+def send_in_parts(port: int, parts: List[bytes]) -> bytes:
+    """Send the request in several writes and read the response until the socket closes."""
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        for part in parts:
+            s.sendall(part)
+            time.sleep(0.1)
+        return b''.join(iter(lambda: s.recv(65536), b''))
+
+
+def test_server_request_split_in_several_reads(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    server.try_connect(PORT)
+
+    payload = json.dumps({'text': f"x = '{'x' * 3_000_000}'\nprint(len(x))"}).encode('utf-8')
+    parts = [payload[i:i + 1_000_000] for i in range(0, len(payload), 1_000_000)]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(send_in_parts, PORT, parts)
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert future.result() == b'3000000\n'
+
+
+def test_server_incomplete_request(
+    qtbot: QtBot, server: NssServer, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr('nukeserversocket.connection.READ_TIMEOUT', 200)
+    get_metrics().reset()
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(send_in_parts, PORT, [b'{"text": "print(1)"'])
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert future.result() == b'InvalidRequest: Incomplete json request.\n'
+
+    assert get_metrics().get('rejected_incomplete') == 1
+
+
+def test_server_request_timeout(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(request, PORT, {'text': 'while True: pass', 'timeout': 0.2})
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert b'ExecutionTimeout' in future.result()
+
+        # the server keeps serving other clients
+        future = executor.submit(request, PORT, {'text': 'print(1 + 1)'})
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert future.result() == b'2\n'
+
+
+def test_server_cancel_running_script(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    server.try_connect(PORT)
+
+    def cancel() -> bool:
+        # the main thread is busy running the script: only the datagram is read
+        for _ in range(100):
+            if send_cancel('127.0.0.1', PORT, 'runaway', timeout=0.1):
+                return True
+        return False
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # the timeout only stops the script if the cancellation fails
+        future = executor.submit(
+            request, PORT, {'id': 'runaway', 'text': 'while True: pass', 'timeout': 10}
+        )
+        cancelled = executor.submit(cancel)
+        qtbot.waitUntil(future.done, timeout=5000)
+
+        assert cancelled.result()
+        assert b'ExecutionCancelled' in future.result()
+
+
+def test_server_cancel_listener_stops_on_close(server: NssServer):
+    server.try_connect(PORT)
+    assert server._cancel_listener.is_running()
+
+    server.close()
+    assert not server._cancel_listener.is_running()
+    assert not send_cancel('127.0.0.1', PORT, 'x', timeout=0.1)
+
+
+def test_server_execution_timeout_setting(server: NssServer):
+    server._editor.settings.set('execution_timeout', 0.2)
+    output = server.process(ReceivedData(json.dumps({'text': 'while True: pass'})))
+    assert 'ExecutionTimeout' in output
+
+
+def test_server_timeout_of_code_catching_exceptions(server: NssServer):
+    server._editor.settings.set('execution_timeout', 0.2)
+    text = 'while True:\n    try:\n        pass\n    except Exception:\n        pass'
+    output = server.process(ReceivedData(json.dumps({'text': text})))
+    assert output.startswith('ExecutionTimeout')
+
+    # the script editor is restored
+    assert server._editor.input_editor.toPlainText() != text
+
+
+def test_server_cancel_command(server: NssServer):
+    output = server.process(ReceivedData(json.dumps({'command': 'cancel', 'args': {'id': 'x'}})))
+    assert json.loads(output) == {'id': 'x', 'cancelled': False}
+
+
+def test_server_unknown_command(server: NssServer):
+    output = server.process(ReceivedData(json.dumps({'command': 'unknown'})))
+    assert json.loads(output) == {'error': 'Unknown command: unknown'}
+
+
+def test_server_path_syntax_error(server: NssServer, tmp_path):
+    script = tmp_path / 'tool.py'
+    script.write_text('print(')
+
+    for _ in range(2):
+        output = server.process(ReceivedData(json.dumps({'path': str(script)})))
+        assert output.startswith('SyntaxError:')
+
+
+def test_server_controller_command_timeout(server: NssServer, monkeypatch: pytest.MonkeyPatch):
+    def spin(args: Dict[str, str]) -> Dict[str, str]:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            pass
+        return {}
+
+    monkeypatch.setattr(server._editor, 'commands', lambda: {'spin': spin}, raising=False)
+    assert is_queued(server, 'spin')
+
+    output = server.process(ReceivedData(json.dumps({'command': 'spin', 'timeout': 0.2})))
+    assert output.startswith('ExecutionTimeout')
+
+
+def test_server_batch_request(server: NssServer, monkeypatch: pytest.MonkeyPatch):
+    calls: List[str] = []
+
+    @contextlib.contextmanager
+    def batch(mode: str):
+        calls.append(f'enter {mode}')
+        try:
+            yield
+        finally:
+            calls.append('exit')
+
+    monkeypatch.setattr(server._editor, 'batch', batch, raising=False)
+
+    server.process(ReceivedData(json.dumps({'text': 'print(1)'})))
+    assert calls == []
+
+    server.process(ReceivedData(json.dumps({'text': 'while True: pass', 'timeout': 0.2,
+                                            'batch': 'no_undo'})))
+    # restored after the interruption
+    assert calls == ['enter no_undo', 'exit']
+
+
+def test_server_stall_detector(server: NssServer):
+    server._editor.settings.set('stall_threshold', 1)
+    assert server.try_connect(PORT)
+    assert server._stall_detector.is_running()
+
+    server.close()
+    assert not server._stall_detector.is_running()
+
+
+def test_server_executing_request(server: NssServer, monkeypatch: pytest.MonkeyPatch):
+    seen: List[str] = []
+    resolve_text = server._resolve_text
+
+    def spy(data: ReceivedData) -> None:
+        seen.append(server._executing.id)
+        resolve_text(data)
+
+    monkeypatch.setattr(server, '_resolve_text', spy)
+    monkeypatch.setitem(
+        COMMANDS, 'executing', lambda server, data: {'id': server._executing.id}
+    )
+
+    server.process(ReceivedData(json.dumps({'text': 'print(1)', 'id': 'text'})))
+    output = server.process(ReceivedData(json.dumps({'command': 'executing', 'id': 'cmd'})))
+
+    # commands handled right away are reported too
+    assert seen == ['text']
+    assert json.loads(output) == {'id': 'cmd'}
+    assert server._executing is None
+
+
+def test_server_stored_procedure(server: NssServer):
+    server._editor.settings.set('execution_timeout', 0.2)
+    get_procedures().clear()
+
+    def command(command: str, **args) -> Dict:
+        data = ReceivedData(json.dumps({'command': command, 'args': args}))
+        return json.loads(server.process(data))
+
+    assert command('register', name='double', text='result = args["x"] * 2')['registered']
+    assert command('register', name='loop', text='while True: pass')['registered']
+    assert command('register', name='bad', text='def') == {
+        'error': 'SyntaxError: invalid syntax (<procedure bad>, line 1)'
+    }
+    assert command('procedures') == {'procedures': ['double', 'loop']}
+
+    assert command('invoke', name='double', args={'x': 21})['result'] == 42
+    assert command('invoke', name='missing')['error'] == 'ValueError: Unknown procedure: missing'
+
+    # procedures run under the watchdog like scripts
+    data = ReceivedData(json.dumps({'command': 'invoke', 'args': {'name': 'loop'}}))
+    output = server.process(data)
+    assert 'ExecutionTimeout' in output
+
+
+class MockConnection:
+    def __init__(self):
+        self.busy = False
+        self.framed = False
+        self.output = b''
+
+    def write_and_close(self, payload: bytes) -> None:
+        self.output = payload
+
+
+def test_server_priority_lanes(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+
+    for priority in ('bulk', 'bulk', 'normal', 'interactive'):
+        data = ReceivedData(json.dumps({'text': f'print("{priority}")', 'priority': priority}))
+        request = _QueuedRequest(MockConnection(), data, 'test')
+        server.scheduler.push(data.id, request, data.priority)
+
+    served: List[str] = []
+    execute = server.execute
+    server.execute = lambda data: served.append(data.priority) or execute(data)
+
+    server._schedule_next()
+    qtbot.waitUntil(lambda: len(served) == 4)
+
+    assert served == ['interactive', 'normal', 'bulk', 'bulk']
+
+
+def test_server_coalesce_identical_requests(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    coalesced = get_metrics().get('requests_coalesced')
+
+    executed: List[str] = []
+    execute = server.execute
+    server.execute = lambda data: executed.append(data.id) or execute(data)
+
+    connections = [MockConnection() for _ in range(4)]
+    for i, connection in enumerate(connections):
+        data = ReceivedData(json.dumps({
+            'text': 'print("query")', 'id': str(i), 'coalesce': i < 3
+        }))
+        server._dispatch(_QueuedRequest(connection, data, 'test'))
+
+    # a follower can be cancelled alone
+    assert server.cancel('2')
+
+    qtbot.waitUntil(lambda: all(connection.output for connection in connections))
+
+    assert executed == ['0', '3']
+    assert [connection.output for connection in connections] == [
+        b'query\n', b'query\n', b'ExecutionCancelled: Execution was cancelled.\n', b'query\n'
+    ]
+    assert get_metrics().get('requests_coalesced') == coalesced + 2
+    assert not server._inflight
+
+
+def test_server_coalesce_keys(server: NssServer):
+    base = {'session': 's', 'file': 'tool.py', 'coalesce': True}
+    for options in (
+        {'delta': {'base': 'a', 'ops': [[0, 1, ['x = 1']]]}},
+        {'delta': {'base': 'a', 'ops': [[0, 1, ['x = 2']]]}},
+        {'delta': {'base': 'a', 'ops': [[0, 1, ['x = 2']]]}, 'session': 't'},
+        {'text': 'print(1)'},
+        {'text': 'print(1)', 'timeout': 5},
+    ):
+        data = ReceivedData(json.dumps({**base, **options}))
+        assert not server._coalesce(_QueuedRequest(MockConnection(), data, 'test'))
+
+    data = ReceivedData(json.dumps({**base, 'text': 'print(1)', 'if_none_match': 'abc'}))
+    assert server._coalesce(_QueuedRequest(MockConnection(), data, 'test'))
+
+
+def test_server_cancel_coalesced_leader(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+
+    connections = [MockConnection() for _ in range(3)]
+    for i, connection in enumerate(connections):
+        data = ReceivedData(json.dumps({'text': 'print("query")', 'id': str(i), 'coalesce': True}))
+        server._dispatch(_QueuedRequest(connection, data, 'test'))
+
+    # the first follower runs in place of the cancelled leader
+    assert server.cancel('0')
+    assert connections[0].output.startswith(b'ExecutionCancelled')
+    assert connections[1].output == b''
+
+    qtbot.waitUntil(lambda: all(connection.output for connection in connections))
+    assert [connection.output for connection in connections[1:]] == [b'query\n', b'query\n']
+    assert not server._inflight
+
+
+def test_server_cancel_queued_request(server: NssServer):
+    connection = MockConnection()
+    data = ReceivedData(json.dumps({'text': 'print(1)', 'id': 'queued'}))
+    server.scheduler.push(data.id, _QueuedRequest(connection, data, 'test'), data.priority)
+
+    cancel = ReceivedData(json.dumps({'command': 'cancel', 'args': {'id': 'queued'}}))
+    output = server.process(cancel)
+
+    assert json.loads(output) == {'id': 'queued', 'cancelled': True}
+    assert connection.output.startswith(b'ExecutionCancelled')
+    assert len(server.scheduler) == 0
+
+
+def test_server_worker_request_with_shared_memory(server: NssServer):
+    connection = MockConnection()
+    data = ReceivedData(json.dumps({
+        'text': 'print(1)', 'worker': True, 'shm': {'name': '0' * 32, 'size': 4}
+    }))
+    server._offload(_QueuedRequest(connection, data, 'test'))
+
+    assert connection.output.startswith(b'SharedMemoryError')
+    assert server._workers is None
+
+
+def test_server_rate_limit(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('rate_limit', 0.001)
+    server._editor.settings.set('rate_limit_burst', 1)
+    get_metrics().reset()
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for expected in (b'2\n', b'RateLimitExceeded: Too many requests.\n'):
+            future = executor.submit(request, PORT, {'text': 'print(1 + 1)'})
+            qtbot.waitUntil(future.done, timeout=5000)
+            assert future.result() == expected
+
+    assert get_metrics().get('rejected_rate_limit') == 1
+
+
+def test_server_legacy_reply_without_output(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('mirror_script_editor', False)
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(request, PORT, {'text': 'x = 1'})
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert future.result() == b''
+
+
+def test_server_max_payload_size(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('max_payload_size', 100)
+    get_metrics().reset()
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(request, PORT, {'text': f'print("{"x" * 200}")'})
+        qtbot.waitUntil(future.done, timeout=5000)
+        assert future.result().startswith(b'PayloadTooLarge')
+
+    assert get_metrics().get('rejected_payload_size') == 1
+
+
+def test_server_max_connections(qtbot: QtBot, server: NssServer):
+    server._editor.settings.set('max_connections', 1)
+    get_metrics().reset()
+    server.try_connect(PORT)
+
+    idle = socket.create_connection(('127.0.0.1', PORT))
+    try:
+        qtbot.waitUntil(lambda: len(server._connections) == 1)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(request, PORT, {'text': 'print(1)'})
+            qtbot.waitUntil(future.done, timeout=5000)
+            assert future.result().startswith(b'TooManyConnections')
+    finally:
+        idle.close()
+
+    assert get_metrics().get('rejected_connections') == 1
+
+
+def test_server_record_and_replay(qtbot: QtBot, server: NssServer, tmp_path):
+    record_file = tmp_path / 'traffic.nssrec'
+    server._editor.settings.set('mirror_script_editor', False)
+    server._editor.settings.set('record_traffic', True)
+    server._editor.settings.set('record_file', str(record_file))
+    server.try_connect(PORT)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for data in ({'text': 'print(1)'}, {'command': 'cancel', 'args': {'id': 'x'}}):
+            future = executor.submit(request, PORT, data)
+            qtbot.waitUntil(future.done, timeout=5000)
+
+    records = list(read_records(record_file))
+    assert [json.loads(r.payload) for r in records] == [
+        {'text': 'print(1)'}, {'command': 'cancel', 'args': {'id': 'x'}}
+    ]
+    assert records[0].client.endswith('127.0.0.1')
+
+    server._editor.settings.set('record_traffic', False)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(replay, records, '127.0.0.1', PORT, 0)
+        qtbot.waitUntil(future.done, timeout=5000)
+        result = future.result()
+
+    assert result.errors == 0
+    assert len(result.replayed) == 2
+    assert len(list(read_records(record_file))) == 2
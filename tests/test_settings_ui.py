@@ -35,27 +35,37 @@ def test_settings(controller: Controller, model: Model, view: View):
 
     # default values
     assert model.settings.data['server_timeout'] == 60000
+    assert model.settings.data['execution_timeout'] == 0
+    assert model.settings.data['transport'] == 'tcp'
     assert model.settings.data['mirror_script_editor'] is False
     assert model.settings.data['clear_output'] is True
     assert model.settings.data['format_output'] == '[%d NukeTools] %F%n%t'
 
     assert controller._view.timeout.value() == 1
+    assert controller._view.execution_timeout.value() == 0
+    assert controller._view.transport.currentText() == 'tcp'
     assert controller._view.mirror_script_editor.isChecked() is False
     assert controller._view.clear_output.isChecked() is True
     assert controller._view.format_output.text() == '[%d NukeTools] %F%n%t'
 
     # change values
     view.timeout.setValue(2)
+    view.execution_timeout.setValue(30)
+    view.transport.setCurrentText('both')
     view.mirror_script_editor.setChecked(True)
     view.clear_output.setChecked(False)
     view.format_output.setText('nuketools')
 
     assert model.settings.data['server_timeout'] == 120000
+    assert model.settings.data['execution_timeout'] == 30
+    assert model.settings.data['transport'] == 'both'
     assert model.settings.data['mirror_script_editor'] is True
     assert model.settings.data['clear_output'] is False
     assert model.settings.data['format_output'] == 'nuketools'
 
     assert controller._view.timeout.value() == 2
+    assert controller._view.execution_timeout.value() == 30
+    assert controller._view.transport.currentText() == 'both'
     assert controller._view.mirror_script_editor.isChecked() is True
     assert controller._view.clear_output.isChecked() is False
     assert controller._view.format_output.text() == 'nuketools'
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from nukeserversocket.shm import (SharedBuffer, RequestChannel,
+                                  SharedMemoryError, cleanup, reply_data,
+                                  request_data)
+
+
+def test_shared_buffer_round_trip():
+    buffer = SharedBuffer.create(b'hello world')
+    try:
+        reader = SharedBuffer.from_handle(buffer.handle())
+        with reader as view:
+            assert view[:5] == b'hello'
+            assert len(view) == 11
+    finally:
+        buffer.unlink()
+
+    assert not buffer.path.exists()
+
+
+def test_shared_buffer_unmapped_after_with():
+    buffer = SharedBuffer.create(b'hello world')
+    try:
+        with buffer as view:
+            mapping = buffer._mmap
+            assert bytes(view[:5]) == b'hello'
+
+        assert mapping.closed
+        assert buffer._mmap is None
+        with pytest.raises(ValueError):
+            view[0]
+    finally:
+        buffer.unlink()
+
+
+def test_shared_buffer_empty():
+    buffer = SharedBuffer.create(b'')
+    with buffer as view:
+        assert view == b''
+    buffer.unlink()
+
+
+def test_shared_buffer_invalid_handle():
+    with pytest.raises(SharedMemoryError):
+        SharedBuffer.from_handle({'name': '../../etc/passwd', 'size': 1})
+
+    with pytest.raises(SharedMemoryError):
+        SharedBuffer.from_handle({'size': 1})
+
+    with pytest.raises(SharedMemoryError):
+        SharedBuffer('0' * 32, 10).open()
+
+
+def test_request_channel():
+    buffer = SharedBuffer.create(b'input')
+
+    with pytest.raises(SharedMemoryError):
+        request_data()
+
+    try:
+        with RequestChannel(buffer.handle()) as channel:
+            with request_data() as view:
+                reply_data(bytes(view).upper())
+
+        with channel.reply as view:
+            assert view == b'INPUT'
+    finally:
+        buffer.unlink()
+        channel.reply.unlink()
+
+
+def test_cleanup():
+    buffer = SharedBuffer.create(b'old')
+    os.utime(buffer.path, (time.time() - 10_000, time.time() - 10_000))
+
+    assert cleanup(max_age=3600) >= 1
+    assert not buffer.path.exists()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import hashlib
+
+import pytest
+
+from nukeserversocket.metrics import get_metrics
+from nukeserversocket.sources import SourceCache, SourceMismatch
+
+
+@pytest.fixture()
+def script(tmp_path):
+    path = tmp_path / 'tool.py'
+    path.write_text('print(1)')
+    return path
+
+
+def test_source_cache_reads_once(script):
+    cache = SourceCache()
+    source = cache.load(str(script))
+
+    assert source.text == 'print(1)'
+    assert source.digest == hashlib.sha1(b'print(1)').hexdigest()
+    assert cache.load(str(script)) is source
+    assert source.code() is source.code()
+
+
+def test_source_syntax_error_is_cached(script, monkeypatch: pytest.MonkeyPatch):
+    script.write_text('print(')
+    calls = []
+
+    def counting_compile(*args):
+        calls.append(args)
+        return compile(*args)
+
+    monkeypatch.setattr('nukeserversocket.sources.compile', counting_compile, raising=False)
+    source = SourceCache().load(str(script))
+
+    for _ in range(2):
+        with pytest.raises(SyntaxError):
+            source.code()
+    assert len(calls) == 1
+
+
+def test_source_cache_reloads_modified_file(script):
+    cache = SourceCache()
+    source = cache.load(str(script))
+
+    script.write_text('print(22)')
+    stat = os.stat(script)
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert cache.load(str(script)).text == 'print(22)'
+    assert cache.load(str(script)) is not source
+
+
+def test_source_cache_metrics(script):
+    metrics = get_metrics()
+    hits, misses = metrics.get('source_cache_hits'), metrics.get('source_cache_misses')
+
+    cache = SourceCache()
+    cache.load(str(script))
+    cache.load(str(script))
+
+    assert metrics.get('source_cache_misses') == misses + 1
+    assert metrics.get('source_cache_hits') == hits + 1
+
+
+def test_source_cache_verification(script):
+    cache = SourceCache()
+    mtime = os.stat(script).st_mtime
+
+    assert cache.load(str(script), mtime=mtime, digest=hashlib.sha1(b'print(1)').hexdigest())
+
+    with pytest.raises(SourceMismatch):
+        cache.load(str(script), mtime=mtime - 10)
+    with pytest.raises(SourceMismatch):
+        cache.load(str(script), digest='0' * 40)
+
+
+def test_source_cache_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SourceCache().load(str(tmp_path / 'missing.py'))
+
+
+def test_source_cache_eviction(tmp_path):
+    cache = SourceCache(max_entries=2)
+    for name in 'abc':
+        path = tmp_path / f'{name}.py'
+        path.write_text('pass')
+        cache.load(str(path))
+
+    assert len(cache) == 2
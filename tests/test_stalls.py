@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import time
+import traceback
+
+from pytestqt.qtbot import QtBot
+
+from nukeserversocket.stalls import StallDetector, source_snippet
+from nukeserversocket.metrics import get_metrics
+from nukeserversocket.received_data import ReceivedData
+
+TEXT = '\n'.join(f'line{n}' for n in range(1, 11))
+
+
+def test_source_snippet_current_line():
+    data = ReceivedData(json.dumps({'text': TEXT, 'file': 'tool.py'}))
+    stack = [traceback.FrameSummary('tool.py', 5, '<module>'),
+             traceback.FrameSummary('other.py', 1, 'helper')]
+
+    assert source_snippet(data, stack).splitlines() == [
+        '      3 line3',
+        '      4 line4',
+        '->    5 line5',
+        '      6 line6',
+        '      7 line7',
+    ]
+
+
+def test_source_snippet_not_on_stack():
+    data = ReceivedData(json.dumps({'text': TEXT, 'file': 'tool.py'}))
+    assert source_snippet(data, []) == 'line1\nline2\nline3\nline4\nline5'
+
+
+def test_source_snippet_command():
+    data = ReceivedData(json.dumps({'command': 'reload'}))
+    assert source_snippet(data, []) == 'reload'
+
+
+def test_stall_detector(qtbot: QtBot):
+    get_metrics().reset()
+    data = ReceivedData(json.dumps({'text': TEXT, 'id': 'abc'}))
+    detector = StallDetector(0.2, lambda: data)
+    detector.start()
+    try:
+        qtbot.wait(300)
+        assert detector.last_stall is None
+
+        # block the event loop
+        time.sleep(0.6)
+        qtbot.waitUntil(lambda: get_metrics().get('event_loop_stall_seconds') > 0)
+    finally:
+        detector.stop()
+
+    assert not detector.is_running()
+    assert detector.last_stall['request'] == 'abc'
+    assert detector.last_stall['snippet'].startswith('line1')
+    assert 'test_stall_detector' in detector.last_stall['stack']
+    assert get_metrics().get('event_loop_stalls') == 1
+    assert get_metrics().get('event_loop_stall_seconds') >= 0.5
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from nukeserversocket.utils import Stopwatch
+
+
+def test_stopwatch_measure():
+    stopwatch = Stopwatch()
+
+    with stopwatch.measure('first'):
+        pass
+
+    with stopwatch.measure('second'):
+        pass
+
+    assert list(stopwatch.steps) == ['first', 'second']
+    assert stopwatch.total == sum(stopwatch.steps.values())
+    assert 'first: ' in stopwatch.summary()
+    assert stopwatch.summary().endswith(' ms')
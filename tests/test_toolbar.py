@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from pytestqt.qtbot import QtBot
+from PySide2.QtWidgets import QWidget
+
+from nukeserversocket.toolbar import ToolBar
+
+
+def test_toolbar_lazy_widget(qtbot: QtBot):
+    toolbar = ToolBar()
+    qtbot.addWidget(toolbar)
+
+    created = []
+
+    def factory() -> QWidget:
+        created.append(QWidget())
+        return created[-1]
+
+    action = toolbar.add_widget(title='Lazy', widget=factory)
+    assert created == []
+
+    action.trigger()
+    action.trigger()
+
+    assert len(created) == 1
+    assert created[0].windowTitle() == 'Lazy'
+    assert created[0].isVisible()
+
+    created[0].close()
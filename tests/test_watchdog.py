@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import time
+import threading
+
+import pytest
+
+from nukeserversocket.utils import exec_code
+from nukeserversocket.utils.watchdog import (ExecutionTimeout,
+                                             ExecutionWatchdog,
+                                             ExecutionCancelled, is_running,
+                                             cancel_execution)
+
+INFINITE_LOOP = 'while True: pass'
+
+
+def test_watchdog_timeout():
+    start = time.perf_counter()
+    with pytest.raises(ExecutionTimeout):
+        with ExecutionWatchdog('timeout', timeout=0.2) as watchdog:
+            exec_code(INFINITE_LOOP)
+
+    assert time.perf_counter() - start < 2
+    assert watchdog.interrupted_by is ExecutionTimeout
+    assert not is_running('timeout')
+
+
+def test_watchdog_cancel_from_another_thread():
+    threading.Timer(0.2, cancel_execution, ('cancel',)).start()
+
+    with pytest.raises(ExecutionCancelled):
+        with ExecutionWatchdog('cancel') as watchdog:
+            assert is_running('cancel')
+            exec_code(INFINITE_LOOP)
+
+    assert watchdog.interrupted_by is ExecutionCancelled
+
+
+def test_watchdog_interrupts_code_catching_exceptions():
+    code = 'while True:\n    try:\n        pass\n    except Exception:\n        pass'
+    with pytest.raises(ExecutionTimeout):
+        with ExecutionWatchdog('catch', timeout=0.2) as watchdog:
+            exec_code(code)
+
+    assert watchdog.interrupted_by is ExecutionTimeout
+
+
+def test_watchdog_finished_execution_is_not_interrupted():
+    with ExecutionWatchdog('finished', timeout=0.1) as watchdog:
+        result = exec_code("print('done')")
+
+    time.sleep(0.2)
+
+    assert result == 'done\n'
+    assert watchdog.interrupted_by is None
+    assert cancel_execution('finished') is False
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sys
+import time
+from multiprocessing import spawn
+
+import pytest
+
+from nukeserversocket.workers import (WorkerPool, WorkerError,
+                                      _spawn_executable, default_executable)
+from nukeserversocket.utils.watchdog import (ExecutionTimeout,
+                                             ExecutionCancelled)
+
+
+@pytest.fixture()
+def pool() -> WorkerPool:
+    pool = WorkerPool(2)
+
+    yield pool
+
+    pool.close()
+
+
+def test_worker_pool_runs_code(pool: WorkerPool):
+    futures = [
+        pool.submit(str(i), f'import os\nprint({i}, os.getpid())', '<test>') for i in range(4)
+    ]
+    outputs = [future.result(timeout=30) for future in futures]
+
+    assert [output.split()[0] for output in outputs] == ['0', '1', '2', '3']
+    # the workers are reused
+    assert len({output.split()[1] for output in outputs}) <= 2
+
+
+def test_worker_pool_traceback(pool: WorkerPool):
+    output = pool.submit('x', '1 / 0', '<test>').result(timeout=30)
+    assert 'ZeroDivisionError' in output
+
+
+def test_worker_pool_timeout(pool: WorkerPool):
+    with pytest.raises(ExecutionTimeout):
+        pool.submit('x', 'while True: pass', '<test>', timeout=0.5).result(timeout=30)
+
+    # the killed worker is replaced
+    assert pool.submit('y', 'print(1)', '<test>').result(timeout=30) == '1\n'
+
+
+def test_worker_pool_cancel(pool: WorkerPool):
+    future = pool.submit('x', 'while True: pass', '<test>')
+    deadline = time.time() + 30
+    while not pool.cancel('x'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    with pytest.raises(ExecutionCancelled):
+        future.result(timeout=30)
+    assert not pool.cancel('x')
+
+
+def test_worker_pool_crash(pool: WorkerPool):
+    with pytest.raises(WorkerError):
+        pool.submit('x', 'import os\nos._exit(3)', '<test>').result(timeout=30)
+
+
+def test_worker_pool_executable():
+    previous = spawn.get_executable()
+    with _spawn_executable('/opt/python/bin/python3'):
+        assert spawn.get_executable() == '/opt/python/bin/python3'
+    assert spawn.get_executable() == previous
+
+    pool = WorkerPool(1, sys.executable)
+    try:
+        assert pool.submit('x', 'print(1)', '<test>').result(timeout=30) == '1\n'
+    finally:
+        pool.close()
+
+    # other users of multiprocessing keep their interpreter
+    assert spawn.get_executable() == previous
+
+
+def test_default_executable_houdini(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(sys.modules, 'hou', object())
+    monkeypatch.setattr(sys, 'executable', str(tmp_path / 'houdini'))
+
+    with pytest.raises(WorkerError):
+        default_executable()
+
+    (tmp_path / 'hython').touch()
+    assert default_executable() == str(tmp_path / 'hython')
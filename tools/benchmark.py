@@ -0,0 +1,211 @@
+"""Load-testing benchmark for the NukeServerSocket server.
+
+Runs an `NssServer` backed by the `LocalController` in this process and drives
+it with concurrent clients sending requests of mixed sizes. Reports
+requests/sec, latency percentiles and memory growth. Requests that time out
+or get an unexpected reply are counted in `errors`.
+
+Runs without a display:
+
+    QT_QPA_PLATFORM=offscreen python tools/benchmark.py --clients 8 --requests 200
+
+Save the results of a release and compare another run against them:
+
+    python tools/benchmark.py --output baseline.json
+    python tools/benchmark.py --compare baseline.json
+
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+from typing import Any, Dict, List, Tuple, Optional
+from pathlib import Path
+from dataclasses import field, asdict, dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from nukeserversocket.utils.stats import percentile  # noqa: E402
+
+# seconds without data before a request is counted as failed
+REQUEST_TIMEOUT = 10.0
+
+
+@dataclass
+class BenchmarkResult:
+    clients: int
+    requests: int
+    payload_sizes: List[int]
+    errors: int = 0
+    duration: float = 0.0
+    memory_growth: int = 0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def requests_per_second(self) -> float:
+        return len(self.latencies) / self.duration if self.duration else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop('latencies')
+        data.update({
+            'requests_per_second': self.requests_per_second,
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p95_ms': percentile(self.latencies, 95) * 1000,
+            'p99_ms': percentile(self.latencies, 99) * 1000,
+        })
+        return data
+
+
+def make_payload(size: int) -> Tuple[bytes, bytes]:
+    """Return a request of roughly `size` bytes and its expected reply."""
+    padding = 'x' * max(size - 40, 0)
+    payload = json.dumps({'text': f"print(len('{padding}'))", 'formatText': '0'})
+    return payload.encode('utf-8'), f'{len(padding)}\n'.encode('utf-8')
+
+
+def send_request(
+    port: int, payload: bytes, expected: bytes, timeout: float = REQUEST_TIMEOUT
+) -> float:
+    """Send a request and return its latency in seconds.
+
+    Raise `socket.timeout` if the server stops replying, and `ValueError` if
+    the reply is not the expected one.
+
+    """
+    start = time.perf_counter()
+    with socket.create_connection(('127.0.0.1', port), timeout) as s:
+        s.sendall(payload)
+        reply = b''.join(iter(lambda: s.recv(65536), b''))
+    latency = time.perf_counter() - start
+
+    if reply != expected:
+        raise ValueError(f'Unexpected reply: {reply[:80]!r}')
+    return latency
+
+
+def run_client(
+    port: int, payloads: List[Tuple[bytes, bytes]], requests: int
+) -> List[Optional[float]]:
+    """Send the requests and return their latencies, None for failed requests."""
+    latencies: List[Optional[float]] = []
+    for payload, expected in itertools.islice(itertools.cycle(payloads), requests):
+        try:
+            latencies.append(send_request(port, payload, expected))
+        except (OSError, ValueError):
+            latencies.append(None)
+    return latencies
+
+
+def run_benchmark(
+    clients: int = 4,
+    requests: int = 100,
+    payload_sizes: Optional[List[int]] = None,
+    port: int = 55600
+) -> BenchmarkResult:
+    """Run the benchmark. `requests` is the number of requests of each client."""
+    from PySide2.QtWidgets import QApplication
+
+    from nukeserversocket.server import NssServer
+    from nukeserversocket.settings import _NssSettings
+    from nukeserversocket.controllers.local import LocalController
+
+    payload_sizes = payload_sizes or [64, 1024, 16384]
+    payloads = [make_payload(size) for size in payload_sizes]
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    settings_file = Path(tempfile.mkdtemp()) / 'nukeserversocket.json'
+    settings_file.write_text(json.dumps({
+        'max_connections': 0,
+        'max_payload_size': 0,
+        'rate_limit': 0,
+    }))
+
+    editor = LocalController()
+    editor.settings = _NssSettings(settings_file)
+
+    server = NssServer(editor)
+    if not server.try_connect(port):
+        raise RuntimeError(f'Failed to listen on {port}: {server.errorString()}')
+
+    result = BenchmarkResult(clients, requests, payload_sizes)
+
+    tracemalloc.start()
+    memory_start = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures: List[Future[List[Optional[float]]]] = [
+            executor.submit(run_client, port, payloads, requests) for _ in range(clients)
+        ]
+        while not all(future.done() for future in futures):
+            app.processEvents()
+
+    result.duration = time.perf_counter() - start
+    result.memory_growth = tracemalloc.get_traced_memory()[0] - memory_start
+    tracemalloc.stop()
+
+    for future in futures:
+        for latency in future.result():
+            if latency is None:
+                result.errors += 1
+            else:
+                result.latencies.append(latency)
+
+    server.close()
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for key in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'memory_growth'):
+        before, after = baseline.get(key, 0), current[key]
+        change = (after - before) / before * 100 if before else 0.0
+        lines.append(f'{key:<20} {before:>14.2f} -> {after:>14.2f} ({change:+.1f}%)')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='NukeServerSocket - Benchmark')
+    parser.add_argument('--clients', type=int, default=4,
+                        help='Number of concurrent clients. Default is 4.')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='Number of requests of each client. Default is 100.')
+    parser.add_argument('--sizes', type=str, default='64,1024,16384',
+                        help='Comma separated request sizes in bytes. Default is 64,1024,16384.')
+    parser.add_argument('--port', type=int, default=55600,
+                        help='Port of the benchmark server. Default is 55600.')
+    parser.add_argument('--output', type=Path, help='Save the results to a json file.')
+    parser.add_argument('--compare', type=Path, help='Compare with a previous json result.')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    result = run_benchmark(
+        args.clients, args.requests, [int(size) for size in args.sizes.split(',')], args.port
+    )
+    summary = result.summary()
+
+    print(json.dumps(summary, indent=4))
+
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=4))
+
+    if args.compare:
+        print(compare(summary, json.loads(args.compare.read_text())))
+
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())